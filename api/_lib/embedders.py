@@ -0,0 +1,276 @@
+import functools
+import hashlib
+import io
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from api._lib import embedding_cache
+
+GEMINI_MODEL = "text-embedding-004"
+# Embedder recorded for collections created before embedders were recorded.
+LEGACY_EMBEDDER = f"gemini:{GEMINI_MODEL}"
+KINDS = ("gemini", "hashing", "onnx")
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class EmbedderError(Exception):
+    """The memory store cannot embed with the requested backend.
+
+    ``status_code`` is what a handler should answer with: 409 when the
+    collection was built by a different embedder, 500 for configuration
+    problems such as a missing API key or model.
+    """
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Embedder:
+    """Turns texts into vectors for the lore collection.
+
+    ``name`` identifies the backend and its parameters and is recorded in
+    the collection metadata; vectors from embedders with different names
+    are not comparable and must never share a collection.
+    """
+
+    name = ""
+    dimensions: Optional[int] = None
+
+    def embed(self, texts: Sequence[str]) -> Tuple[List[Optional[List[float]]], int]:
+        """One vector per text (None on failure) and the number of cache hits."""
+        raise NotImplementedError
+
+
+class GeminiEmbedder(Embedder):
+    """Gemini embeddings, optionally at a reduced ``output_dimensionality``."""
+
+    def __init__(self, client, model: str = GEMINI_MODEL, dimensions: Optional[int] = None):
+        self.client = client
+        self.model = model
+        self.reduced = dimensions
+        self.dimensions = dimensions or 768
+        self.name = f"gemini:{model}@{dimensions}" if dimensions else f"gemini:{model}"
+
+    def embed(self, texts: Sequence[str]) -> Tuple[List[Optional[List[float]]], int]:
+        return embedding_cache.embed(self.client, self.model, texts, self.reduced)
+
+
+@functools.lru_cache(maxsize=65536)
+def _feature_hash(feature: str) -> int:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class HashingEmbedder(Embedder):
+    """Deterministic signed feature hashing of word unigrams and bigrams.
+
+    No model, no network and identical output on every machine, so it suits
+    tests and offline development. It only matches shared words, not
+    meaning.
+    """
+
+    def __init__(self, dimensions: Optional[int] = None):
+        self.dimensions = dimensions or _env_int("MEMORY_HASH_DIMENSIONS", 768)
+        self.name = f"hashing:{self.dimensions}"
+
+    def embed(self, texts: Sequence[str]) -> Tuple[List[Optional[List[float]]], int]:
+        rows: List[int] = []
+        hashes: List[int] = []
+        for row, text in enumerate(texts):
+            tokens = _TOKEN.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            rows.extend([row] * len(features))
+            hashes.extend(_feature_hash(feature) for feature in features)
+
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        if hashes:
+            codes = np.asarray(hashes, dtype=np.uint64)
+            columns = (codes % np.uint64(self.dimensions)).astype(np.int64)
+            signs = np.where(codes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix, (np.asarray(rows), columns), signs)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+        return matrix.tolist(), 0
+
+
+class OnnxEmbedder(Embedder):
+    """Sentence-embedding model run on CPU with onnxruntime.
+
+    ``model_dir`` holds ``model.onnx`` and a Hugging Face ``tokenizer.json``,
+    e.g. an ONNX export of all-MiniLM-L6-v2. Texts are sorted by length and
+    run in batches so padding stays small; token states are mean-pooled over
+    the attention mask and L2-normalized in NumPy. Results go through the
+    embedding cache like Gemini vectors.
+    """
+
+    def __init__(self, model_dir: str, batch_size: Optional[int] = None):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise EmbedderError(
+                "The onnx embedder needs the onnxruntime and tokenizers packages"
+            ) from e
+        model_path = os.path.join(model_dir, "model.onnx")
+        if not os.path.isfile(model_path):
+            raise EmbedderError(f"No model.onnx in MEMORY_ONNX_MODEL ({model_dir})")
+
+        self.batch_size = batch_size or _env_int("MEMORY_ONNX_BATCH", 32)
+        self.max_tokens = _env_int("MEMORY_ONNX_MAX_TOKENS", 256)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_tokens)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        threads = _env_int("MEMORY_ONNX_THREADS", 0)
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.dimensions = self.session.get_outputs()[0].shape[-1]
+        self.name = f"onnx:{os.path.basename(os.path.normpath(model_dir))}"
+
+    def _run(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.asarray([encoding.ids for encoding in encodings], dtype=np.int64)
+        mask = np.asarray([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds: Dict[str, Any] = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        feeds = {key: value for key, value in feeds.items() if key in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def _compute(self, texts: List[str]) -> List[Optional[List[float]]]:
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for index, vector in zip(batch, self._run([texts[index] for index in batch])):
+                vectors[index] = vector.tolist()
+        return vectors
+
+    def embed(self, texts: Sequence[str]) -> Tuple[List[Optional[List[float]]], int]:
+        return embedding_cache.embed_with(self.name, texts, self._compute)
+
+
+def fit_projection(vectors: np.ndarray, dimensions: int) -> Dict[str, np.ndarray]:
+    """PCA projection of ``vectors`` onto their top ``dimensions`` components."""
+    vectors = np.asarray(vectors, dtype=np.float64)
+    if not 0 < dimensions <= vectors.shape[1]:
+        raise ValueError(f"dimensions must be between 1 and {vectors.shape[1]}")
+    mean = vectors.mean(axis=0)
+    centered = vectors - mean
+    # Eigen-decomposition of the d x d covariance; cheaper than an SVD of n x d.
+    eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered / max(len(vectors) - 1, 1))
+    order = np.argsort(eigenvalues)[::-1][:dimensions]
+    return {
+        "mean": mean.astype(np.float32),
+        "components": eigenvectors[:, order].T.astype(np.float32),
+        "explained": (eigenvalues[order].sum() / max(eigenvalues.sum(), 1e-12)).astype(np.float32),
+    }
+
+
+def save_projection(path: str, projection: Dict[str, np.ndarray]) -> None:
+    with open(path, "wb") as projection_file:
+        np.savez(projection_file, **projection)
+
+
+def load_projection(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as projection_file:
+        raw = projection_file.read()
+    with np.load(io.BytesIO(raw)) as data:
+        projection: Dict[str, Any] = {key: data[key] for key in data.files}
+    # The digest ties a collection to this exact projection.
+    projection["digest"] = hashlib.sha256(raw).hexdigest()[:8]
+    return projection
+
+
+def project(vectors: np.ndarray, projection: Dict[str, Any]) -> np.ndarray:
+    centered = np.asarray(vectors, dtype=np.float32) - projection["mean"]
+    reduced = centered @ projection["components"].T
+    return reduced / np.maximum(np.linalg.norm(reduced, axis=1, keepdims=True), 1e-12)
+
+
+def _projected_name(base: str, projection: Dict[str, Any]) -> str:
+    return f"{base}|pca{len(projection['components'])}-{projection['digest']}"
+
+
+class ProjectedEmbedder(Embedder):
+    """A local embedder followed by a fitted PCA projection.
+
+    The full-size vectors are cached as usual; the projection is a single
+    matrix multiply on top, so changing it never re-runs the model.
+    """
+
+    def __init__(self, base: Embedder, projection: Dict[str, Any]):
+        self.base = base
+        self.projection = projection
+        self.dimensions = len(projection["components"])
+        self.name = _projected_name(base.name, projection)
+
+    def embed(self, texts: Sequence[str]) -> Tuple[List[Optional[List[float]]], int]:
+        vectors, hits = self.base.embed(texts)
+        present = [index for index, vector in enumerate(vectors) if vector is not None]
+        projected: List[Optional[List[float]]] = [None] * len(vectors)
+        if present:
+            reduced = project(np.asarray([vectors[index] for index in present]), self.projection)
+            for index, vector in zip(present, reduced):
+                projected[index] = vector.tolist()
+        return projected, hits
+
+
+def configured_kind() -> Optional[str]:
+    """The backend requested by MEMORY_EMBEDDER, or None to follow the collection."""
+    kind = os.getenv("MEMORY_EMBEDDER", "").strip().lower() or None
+    if kind is not None and kind not in KINDS:
+        raise EmbedderError(f"MEMORY_EMBEDDER must be one of {', '.join(KINDS)}")
+    return kind
+
+
+def configured_projection() -> Optional[Dict[str, Any]]:
+    """The PCA projection in MEMORY_PCA_PATH for local embedders, if set."""
+    path = os.getenv("MEMORY_PCA_PATH")
+    if not path:
+        return None
+    try:
+        return load_projection(path)
+    except (OSError, ValueError, KeyError) as e:
+        raise EmbedderError(f"Cannot load MEMORY_PCA_PATH ({path}): {e}") from e
+
+
+def default_name(kind: Optional[str]) -> str:
+    """Embedder name a new collection records for ``kind``.
+
+    Storage settings are part of the name: MEMORY_EMBED_DIMENSIONS for
+    Gemini, MEMORY_PCA_PATH for local embedders.
+    """
+    if kind in ("hashing", "onnx"):
+        if kind == "hashing":
+            name = HashingEmbedder().name
+        else:
+            model_dir = os.getenv("MEMORY_ONNX_MODEL")
+            if not model_dir:
+                raise EmbedderError("MEMORY_ONNX_MODEL not set")
+            name = f"onnx:{os.path.basename(os.path.normpath(model_dir))}"
+        projection = configured_projection()
+        return _projected_name(name, projection) if projection else name
+    dimensions = _env_int("MEMORY_EMBED_DIMENSIONS", 0)
+    return f"{LEGACY_EMBEDDER}@{dimensions}" if dimensions else LEGACY_EMBEDDER
@@ -0,0 +1,249 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CACHE_HEADER = "X-Embedding-Cache"
+# Texts per embed_content call; the Gemini batch embedding limit.
+EMBED_BATCH_SIZE = 100
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Embeddings keyed by (model, content hash): memory LRU over SQLite.
+
+    Vectors are stored as float32 blobs (3 KB for a 768-dim embedding), which
+    is well within embedding precision. The disk tier is bounded by entry
+    count and evicts least recently used rows.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_entries: Optional[int] = None,
+        disk_entries: Optional[int] = None,
+    ):
+        self.path = path or os.getenv("EMBED_CACHE_PATH", "./.embedding-cache.sqlite3")
+        self.memory_limit = (
+            memory_entries
+            if memory_entries is not None
+            else _env_int("EMBED_CACHE_MEMORY_ENTRIES", 4096)
+        )
+        self.disk_limit = (
+            disk_entries if disk_entries is not None else _env_int("EMBED_CACHE_DISK_ENTRIES", 200000)
+        )
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_count: Optional[int] = None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self.disk_limit <= 0:
+            return None
+        if self._db is None:
+            try:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+                )
+                db.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings(last_used)")
+            except sqlite3.Error:
+                self.disk_limit = 0
+                return None
+            self._db = db
+            self._disk_count = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return self._db
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        if self.memory_limit <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_limit:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self._stats["memory_hits"] += len(found)
+
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            db = self._connect() if missing else None
+            if db is not None:
+                try:
+                    rows = []
+                    for start in range(0, len(missing), 500):
+                        chunk = missing[start:start + 500]
+                        rows += db.execute(
+                            "SELECT key, vector FROM embeddings WHERE key IN (%s)"
+                            % ",".join("?" * len(chunk)),
+                            chunk,
+                        ).fetchall()
+                    if rows:
+                        db.executemany(
+                            "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                            [(time.time(), key) for key, _ in rows],
+                        )
+                except sqlite3.Error:
+                    rows = []
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+                self._stats["disk_hits"] += len(rows)
+            self._stats["misses"] += sum(1 for key in missing if key not in found)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            db = self._connect()
+            if db is None or not items:
+                return
+            now = time.time()
+            try:
+                db.execute("BEGIN")
+                db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    [
+                        (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                        for key, vector in items.items()
+                    ],
+                )
+                db.execute("COMMIT")
+                self._disk_count = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                if self._disk_count > self.disk_limit:
+                    self._evict(db)
+            except sqlite3.Error:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        # Trim to 90% of the limit so eviction does not run on every write.
+        excess = self._disk_count - int(self.disk_limit * 0.9)
+        db.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._disk_count -= excess
+        self._stats["evictions"] += excess
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot["memory_entries"] = len(self._memory)
+            snapshot["disk_entries"] = self._disk_count
+        hits = snapshot["memory_hits"] + snapshot["disk_hits"]
+        lookups = hits + snapshot["misses"]
+        snapshot["hit_ratio"] = round(hits / lookups, 4) if lookups else 0.0
+        return snapshot
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+def stats() -> Dict[str, Any]:
+    return get_cache().stats()
+
+
+def embed_with(
+    model: str, texts: Sequence[str], compute: Callable[[List[str]], List[Optional[List[float]]]]
+) -> Tuple[List[Optional[List[float]]], int]:
+    """Embed texts, calling ``compute`` only for texts not already cached.
+
+    Returns one vector per text in order (None if ``compute`` returned none
+    for it) and how many were served from the cache. ``compute`` receives
+    distinct texts, at most EMBED_BATCH_SIZE at a time. Fresh vectors are
+    rounded to float32 so a cached and an uncached lookup of the same text
+    are identical.
+    """
+    cache = get_cache()
+    keys = [cache_key(model, text) for text in texts]
+    vectors = cache.get_many(keys)
+
+    pending: Dict[str, str] = {}
+    for key, text, vector in zip(keys, texts, vectors):
+        if vector is None:
+            pending.setdefault(key, text)
+
+    fetched: Dict[str, List[float]] = {}
+    pending_keys = list(pending)
+    for start in range(0, len(pending_keys), EMBED_BATCH_SIZE):
+        batch = pending_keys[start:start + EMBED_BATCH_SIZE]
+        for key, values in zip(batch, compute([pending[key] for key in batch])):
+            if values is not None:
+                fetched[key] = np.asarray(values, dtype=np.float32).tolist()
+    if fetched:
+        cache.put_many(fetched)
+    hits = sum(1 for vector in vectors if vector is not None)
+    return [
+        vector if vector is not None else fetched.get(key) for key, vector in zip(keys, vectors)
+    ], hits
+
+
+def embed(
+    client, model: str, texts: Sequence[str], dimensions: Optional[int] = None
+) -> Tuple[List[Optional[List[float]]], int]:
+    """embed_with() backed by a google-genai client's embed_content.
+
+    With ``dimensions``, the API is asked for a reduced
+    ``output_dimensionality``; those vectors are re-normalized to unit
+    length and cached separately from full-size ones.
+    """
+    config = {"output_dimensionality": dimensions} if dimensions else None
+
+    def compute(batch: List[str]) -> List[Optional[List[float]]]:
+        response = client.models.embed_content(model=model, contents=batch, config=config)
+        vectors = [embedding.values for embedding in response.embeddings or []]
+        if not dimensions:
+            return vectors
+        return [
+            None if values is None else (np.asarray(values) / (np.linalg.norm(values) or 1.0))
+            for values in vectors
+        ]
+
+    return embed_with(f"{model}@{dimensions}" if dimensions else model, texts, compute)
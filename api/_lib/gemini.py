@@ -0,0 +1,73 @@
+import json
+from typing import Any, Dict, List, Optional, Union
+
+DEFAULT_TEXT_MODEL = "gemini-3-flash-preview"
+DEFAULT_IMAGE_MODEL = "gemini-3.1-flash-image-preview"
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+
+
+def text_payload(prompt: Optional[str], contents: Optional[List[Any]]) -> Dict[str, Any]:
+    return {"contents": contents if contents else [{"parts": [{"text": prompt}]}]}
+
+
+def image_payload(prompt: str) -> Dict[str, Any]:
+    return {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {"responseMimeType": "image/png"},
+    }
+
+
+def speech_payload(text: str, voice_name: str) -> Dict[str, Any]:
+    return {
+        "contents": [{"parts": [{"text": text}]}],
+        "generationConfig": {
+            "responseModalities": ["AUDIO"],
+            "speechConfig": {
+                "voiceConfig": {"prebuiltVoiceConfig": {"voiceName": voice_name}}
+            },
+        },
+    }
+
+
+def first_inline_data(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    candidates = result.get("candidates", [])
+    if candidates:
+        parts = candidates[0].get("content", {}).get("parts", [])
+        if parts and "inlineData" in parts[0]:
+            return parts[0]["inlineData"]
+    return None
+
+
+def text_delta(result: Dict[str, Any], final: Dict[str, Any]) -> str:
+    """Text of one streamGenerateContent chunk; usage and finish reason go into ``final``.
+
+    Later chunks overwrite earlier values, so after the last chunk ``final``
+    holds the totals Gemini reports at the end of the stream.
+    """
+    if result.get("usageMetadata"):
+        final["usageMetadata"] = result["usageMetadata"]
+    if result.get("modelVersion"):
+        final["modelVersion"] = result["modelVersion"]
+    candidates = result.get("candidates") or []
+    if not candidates:
+        return ""
+    if candidates[0].get("finishReason"):
+        final["finishReason"] = candidates[0]["finishReason"]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts if not part.get("thought"))
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_json(line: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+    # streamGenerateContent?alt=sse sends one JSON object per "data:" line.
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    if not line.startswith("data:"):
+        return None
+    payload = line[len("data:"):].strip()
+    if not payload:
+        return None
+    return json.loads(payload)
@@ -0,0 +1,246 @@
+import asyncio
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from api._lib import gemini
+
+MAX_JOBS = 20
+KINDS = ("text", "image")
+NDJSON_MIME_TYPE = "application/x-ndjson"
+
+_JOB_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# {{job_id}} in a prompt is replaced by that job's generated text.
+_PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z0-9_-]+)\s*\}\}")
+
+Job = Dict[str, Any]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# Upper bound on jobs running at once; a request may ask for fewer.
+BATCH_CONCURRENCY = max(1, _env_int("GEMINI_BATCH_CONCURRENCY", 4))
+
+
+def parse_jobs(data: Dict[str, Any]) -> Tuple[List[Job], int]:
+    """Validate a batch request body; returns the jobs and the concurrency.
+
+    Every job has an ``id``, a ``type`` (``text`` or ``image``), a
+    ``prompt`` and optionally a ``model``. ``depends_on`` lists jobs that
+    must succeed first; jobs referenced as ``{{id}}`` in the prompt are added
+    to it. Raises ValueError with a client-facing message.
+    """
+    jobs = data.get("jobs")
+    if not isinstance(jobs, list) or not jobs:
+        raise ValueError("jobs must be a non-empty list")
+    if len(jobs) > MAX_JOBS:
+        raise ValueError(f"At most {MAX_JOBS} jobs per request")
+
+    parsed: List[Job] = []
+    for index, job in enumerate(jobs):
+        if not isinstance(job, dict):
+            raise ValueError(f"jobs[{index}] must be an object")
+        job_id = job.get("id", str(index))
+        if not isinstance(job_id, str) or not _JOB_ID.match(job_id):
+            raise ValueError(f"jobs[{index}]: id must be 1-64 letters, digits, '-' or '_'")
+        kind = job.get("type", "text")
+        if kind not in KINDS:
+            raise ValueError(f"jobs[{index}]: type must be one of {', '.join(KINDS)}")
+        prompt = job.get("prompt")
+        if not isinstance(prompt, str) or not prompt:
+            raise ValueError(f"jobs[{index}]: prompt is required")
+        depends_on = job.get("depends_on", [])
+        if not isinstance(depends_on, list) or not all(isinstance(dep, str) for dep in depends_on):
+            raise ValueError(f"jobs[{index}]: depends_on must be a list of job ids")
+        default_model = gemini.DEFAULT_TEXT_MODEL if kind == "text" else gemini.DEFAULT_IMAGE_MODEL
+        parsed.append(
+            {
+                "id": job_id,
+                "type": kind,
+                "model": job.get("model") or default_model,
+                "prompt": prompt,
+                "depends_on": list(dict.fromkeys(depends_on + _PLACEHOLDER.findall(prompt))),
+            }
+        )
+
+    by_id = {job["id"]: job for job in parsed}
+    if len(by_id) != len(parsed):
+        raise ValueError("job ids must be unique")
+    for job in parsed:
+        for dep in job["depends_on"]:
+            if dep not in by_id:
+                raise ValueError(f"{job['id']}: unknown dependency {dep}")
+            if dep in _PLACEHOLDER.findall(job["prompt"]) and by_id[dep]["type"] != "text":
+                raise ValueError(f"{job['id']}: only text jobs can be used in {{{{{dep}}}}}")
+    _check_acyclic(by_id)
+
+    concurrency = data.get("concurrency", BATCH_CONCURRENCY)
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1:
+        raise ValueError("concurrency must be a positive integer")
+    return parsed, min(concurrency, BATCH_CONCURRENCY)
+
+
+def _check_acyclic(by_id: Dict[str, Job]) -> None:
+    done: Set[str] = set()
+    for start in by_id:
+        path: List[str] = []
+        stack = [(start, False)]
+        while stack:
+            job_id, leaving = stack.pop()
+            if leaving:
+                path.pop()
+                done.add(job_id)
+                continue
+            if job_id in done:
+                continue
+            if job_id in path:
+                raise ValueError(f"dependency cycle: {' -> '.join(path + [job_id])}")
+            path.append(job_id)
+            stack.append((job_id, True))
+            stack.extend((dep, False) for dep in by_id[job_id]["depends_on"])
+
+
+class _Schedule:
+    """Dependency bookkeeping shared by the thread and event-loop runners."""
+
+    def __init__(self, jobs: List[Job]):
+        self.pending = list(jobs)
+        self.texts: Dict[str, str] = {}
+        self.failed: Set[str] = set()
+        self.counts = {"ok": 0, "error": 0, "skipped": 0}
+        self.started = time.perf_counter()
+
+    def ready(self, slots: int) -> Tuple[List[Tuple[Job, str]], List[Dict[str, Any]]]:
+        """Jobs to start now, with rendered prompts, and lines for skipped jobs."""
+        start: List[Tuple[Job, str]] = []
+        skipped: List[Dict[str, Any]] = []
+        progress = True
+        while progress:
+            progress = False
+            for job in list(self.pending):
+                failed = [dep for dep in job["depends_on"] if dep in self.failed]
+                if failed:
+                    self.pending.remove(job)
+                    result = {"error": f"dependency {failed[0]} failed"}
+                    skipped.append(self.finish(job, result, None))
+                    progress = True
+                elif len(start) < slots and all(dep in self.texts for dep in job["depends_on"]):
+                    self.pending.remove(job)
+                    start.append((job, self.render(job["prompt"])))
+        return start, skipped
+
+    def render(self, prompt: str) -> str:
+        return _PLACEHOLDER.sub(lambda match: self.texts[match.group(1)], prompt)
+
+    def finish(self, job: Job, result: Dict[str, Any], ms: Optional[float]) -> Dict[str, Any]:
+        # ms is None for jobs skipped without running.
+        if "error" in result:
+            self.failed.add(job["id"])
+            status = "skipped" if ms is None else "error"
+        else:
+            self.texts[job["id"]] = result.get("text", "")
+            status = "ok"
+        self.counts[status] += 1
+        line: Dict[str, Any] = {"id": job["id"], "type": job["type"], "status": status}
+        if ms is not None:
+            line["ms"] = round(ms, 1)
+        line.update(result)
+        return line
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = (time.perf_counter() - self.started) * 1000
+        return dict({"done": True, "ms": round(elapsed, 1)}, **self.counts)
+
+
+def _error_result(error: Exception) -> Dict[str, Any]:
+    return {"error": f"Gemini API error: {error}"}
+
+
+def run(
+    jobs: List[Job], concurrency: int, execute: Callable[[Job, str], Dict[str, Any]]
+) -> Iterator[Dict[str, Any]]:
+    """Run jobs on a thread pool; yields one line per job as it completes, then a summary.
+
+    ``execute(job, prompt)`` returns the result fields (``text`` for text
+    jobs) or raises; a failed job's dependents are skipped, not run.
+    """
+    schedule = _Schedule(jobs)
+    running: Dict[Future, Tuple[Job, float]] = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            start, skipped = schedule.ready(concurrency - len(running))
+            yield from skipped
+            for job, prompt in start:
+                running[pool.submit(execute, job, prompt)] = (job, time.perf_counter())
+            if not running:
+                break
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                job, started = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as error:
+                    result = _error_result(error)
+                yield schedule.finish(job, result, (time.perf_counter() - started) * 1000)
+    yield schedule.summary()
+
+
+async def arun(
+    jobs: List[Job], concurrency: int, execute: Callable[[Job, str], Awaitable[Dict[str, Any]]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """run() on the event loop, with ``execute`` a coroutine function."""
+    schedule = _Schedule(jobs)
+    running: Dict["asyncio.Task", Tuple[Job, float]] = {}
+    try:
+        while True:
+            start, skipped = schedule.ready(concurrency - len(running))
+            for line in skipped:
+                yield line
+            for job, prompt in start:
+                task = asyncio.ensure_future(execute(job, prompt))
+                running[task] = (job, time.perf_counter())
+            if not running:
+                break
+            finished, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                job, started = running.pop(task)
+                try:
+                    result = task.result()
+                except Exception as error:
+                    result = _error_result(error)
+                yield schedule.finish(job, result, (time.perf_counter() - started) * 1000)
+        yield schedule.summary()
+    finally:
+        # The client went away: do not leave upstream calls running.
+        for task in running:
+            task.cancel()
+
+
+def text_result(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Result fields of a text job from a generateContent response."""
+    return {"text": gemini.text_delta(body, {}), "response": body}
+
+
+def image_result(body: Dict[str, Any]) -> Dict[str, Any]:
+    inline_data = gemini.first_inline_data(body)
+    if not inline_data or not inline_data.get("mimeType", "").startswith("image/"):
+        raise RuntimeError("No image data received from API")
+    return {"imageData": inline_data.get("data"), "mimeType": inline_data["mimeType"]}
@@ -0,0 +1,38 @@
+import base64
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+
+from api._lib import media
+
+Body = Union[str, bytes]
+
+
+def make_event(
+    body: bytes, headers: Mapping[str, str], query: Optional[Mapping[str, str]] = None
+) -> Dict[str, Any]:
+    """Serverless event for a request received by proxy.py or proxy_asgi.py."""
+    return {
+        "body": body.decode("utf-8"),
+        "headers": dict(headers),
+        "queryStringParameters": dict(query or {}),
+        media.RAW_BODY_KEY: True,
+    }
+
+
+def response_parts(result: Dict[str, Any]) -> Tuple[Body, int, Dict[str, str]]:
+    """Body, status and headers of a handler result for the proxy's response.
+
+    Serialized JSON text and the bytes media.binary_response returns for
+    make_event's events are passed through untouched; a base64 body
+    (``isBase64Encoded``) is decoded, as a serverless platform would.
+    Access-Control-* headers are dropped because each proxy's CORS
+    middleware sets them, exposed headers included.
+    """
+    headers = {
+        name: value
+        for name, value in (result.get("headers") or {}).items()
+        if not name.lower().startswith("access-control-")
+    }
+    body = result["body"]
+    if result.get("isBase64Encoded"):
+        body = base64.b64decode(body)
+    return body, result["statusCode"], headers
@@ -0,0 +1,174 @@
+import asyncio
+import io
+import os
+import re
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+SEGMENT_CONCURRENCY = int(os.getenv("TTS_SEGMENT_CONCURRENCY", 4))
+# Segments are packed up to this many characters; tiny sentences are merged so
+# per-request overhead does not dominate, and long ones are split at commas.
+SEGMENT_MAX_CHARS = int(os.getenv("TTS_SEGMENT_MAX_CHARS", 400))
+
+_SENTENCE_END = re.compile(r"(?:(?<=[.!?…。！？])|(?<=[.!?…。！？][\"')\]]))\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+# A segment with no letter or digit has nothing for a TTS engine to pronounce.
+_SPEAKABLE = re.compile(r"\w")
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    if len(sentence) <= max_chars:
+        return [sentence]
+    pieces: List[str] = []
+    for clause in _CLAUSE_END.split(sentence):
+        while len(clause) > max_chars:
+            cut = clause.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if clause:
+            pieces.append(clause)
+    return pieces
+
+
+def split_sentences(text: str, max_chars: int = SEGMENT_MAX_CHARS) -> List[str]:
+    """Split text at sentence boundaries into segments of at most max_chars.
+
+    Segments with nothing to pronounce (whitespace or punctuation only) are
+    dropped, so the result is empty when the text has no speakable content.
+    """
+    segments: List[str] = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text.strip()):
+        for sentence in _SENTENCE_END.split(paragraph.strip()):
+            for piece in _split_long(" ".join(sentence.split()), max_chars):
+                if current and len(current) + 1 + len(piece) > max_chars:
+                    segments.append(current)
+                    current = piece
+                else:
+                    current = f"{current} {piece}" if current else piece
+        # Never merge across paragraphs; the pause between them is meaningful.
+        if current:
+            segments.append(current)
+            current = ""
+    return [segment for segment in segments if _SPEAKABLE.search(segment)]
+
+
+def is_speakable(text: Any) -> bool:
+    """True when text is a string with at least one segment worth synthesizing."""
+    return isinstance(text, str) and bool(_SPEAKABLE.search(text))
+
+
+class ByteBudget:
+    """Size cap shared by every segment of one long-text request.
+
+    Segments are synthesized concurrently on one event loop, so the running
+    total needs no lock; exceeding it fails the whole request rather than
+    a single segment.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+
+    def take(self, size: int) -> None:
+        self.used += size
+        if self.used > self.max_bytes:
+            raise ValueError(f"Synthesized audio exceeds {self.max_bytes} bytes")
+
+
+def _timing(index: int, segment: str, started: float) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "chars": len(segment),
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def map_bounded(
+    fn: Callable[[str], T], segments: Sequence[str], concurrency: int = SEGMENT_CONCURRENCY
+) -> Tuple[List[T], List[Dict[str, Any]]]:
+    """Run fn over segments on a bounded thread pool, preserving order."""
+
+    def run(item):
+        index, segment = item
+        started = time.perf_counter()
+        result = fn(segment)
+        return result, _timing(index, segment, started)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(segments)))) as pool:
+        outcomes = list(pool.map(run, enumerate(segments)))
+    return [result for result, _ in outcomes], [timing for _, timing in outcomes]
+
+
+async def gather_bounded(
+    fn: Callable[[str], Awaitable[T]],
+    segments: Sequence[str],
+    concurrency: int = SEGMENT_CONCURRENCY,
+) -> Tuple[List[T], List[Dict[str, Any]]]:
+    """Async counterpart of map_bounded using a semaphore."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index, segment):
+        async with semaphore:
+            started = time.perf_counter()
+            result = await fn(segment)
+            return result, _timing(index, segment, started)
+
+    outcomes = await asyncio.gather(
+        *(run(index, segment) for index, segment in enumerate(segments))
+    )
+    return [result for result, _ in outcomes], [timing for _, timing in outcomes]
+
+
+def _strip_id3(clip: bytes) -> bytes:
+    # ID3v2 header: "ID3", version (2), flags (1), syncsafe size (4).
+    if clip[:3] == b"ID3" and len(clip) >= 10:
+        size = 0
+        for byte in clip[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        clip = clip[10 + size:]
+    # ID3v1 trailer is a fixed 128-byte block starting with "TAG".
+    if len(clip) >= 128 and clip[-128:-125] == b"TAG":
+        clip = clip[:-128]
+    return clip
+
+
+def _concat_wav(clips: Sequence[bytes]) -> bytes:
+    params = None
+    frames = []
+    for clip in clips:
+        with wave.open(io.BytesIO(clip), "rb") as reader:
+            if params is None:
+                params = reader.getparams()
+            elif reader.getparams()[:3] != params[:3]:
+                raise ValueError("Cannot stitch WAV segments with different formats")
+            frames.append(reader.readframes(reader.getnframes()))
+    out = io.BytesIO()
+    with wave.open(out, "wb") as writer:
+        writer.setparams(params)
+        writer.writeframes(b"".join(frames))
+    return out.getvalue()
+
+
+def stitch_audio(clips: Sequence[bytes], mime_type: str) -> bytes:
+    """Join per-segment clips into one clip of the same format.
+
+    MP3 is a self-framing stream, so segments concatenate once per-file ID3
+    tags are removed. WAV segments are merged at the sample level under one
+    header. Raw PCM (audio/L16) concatenates as-is.
+    """
+    if len(clips) == 1:
+        return clips[0]
+    base_type = mime_type.split(";")[0].strip().lower()
+    if base_type in ("audio/wav", "audio/x-wav", "audio/wave"):
+        return _concat_wav(clips)
+    if base_type in ("audio/mpeg", "audio/mp3"):
+        return b"".join(_strip_id3(clip) for clip in clips)
+    if base_type in ("audio/l16", "audio/pcm"):
+        return b"".join(clips)
+    raise ValueError(f"Cannot stitch audio of type {mime_type}")
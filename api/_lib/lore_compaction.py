@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from api._lib import lore_index, memory_clients, search_cache
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+KEEP_VERSIONS = _env_int("MEMORY_KEEP_VERSIONS", 3)
+SCAN_PAGE_SIZE = 5000
+
+_job: Dict[str, Any] = {"status": "idle"}
+_job_lock = threading.Lock()
+
+
+def _disk_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _scan(collection) -> List[Tuple[str, Dict[str, Any], int]]:
+    """(id, metadata, document bytes) for every record, read page by page."""
+    records: List[Tuple[str, Dict[str, Any], int]] = []
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["metadatas", "documents"], limit=SCAN_PAGE_SIZE, offset=offset
+        )
+        ids = page["ids"]
+        for record_id, metadata, document in zip(
+            ids, page["metadatas"] or [], page["documents"] or []
+        ):
+            records.append((record_id, metadata or {}, len((document or "").encode("utf-8"))))
+        if len(ids) < SCAN_PAGE_SIZE:
+            return records
+        offset += len(ids)
+
+
+def compact(collection, keep: int = KEEP_VERSIONS, dry_run: bool = False) -> Dict[str, Any]:
+    """Delete all but the newest ``keep`` versions of every character.
+
+    Kept records also get their ``is_latest`` flag corrected, which backfills
+    records indexed before the flag existed. ``reclaimed_bytes`` estimates the
+    vector and document data removed; the store's files are reported before
+    and after, but SQLite reuses freed pages rather than shrinking at once.
+    """
+    if keep < 1:
+        raise ValueError("keep must be at least 1")
+    started = time.perf_counter()
+    disk_before = _disk_bytes(memory_clients.MEMORY_PATH)
+    records = _scan(collection)
+
+    versions: Dict[str, set] = {}
+    for _, metadata, _ in records:
+        if metadata.get("character_id") is not None and metadata.get("version") is not None:
+            versions.setdefault(metadata["character_id"], set()).add(metadata["version"])
+    kept = {
+        character_id: sorted(found, reverse=True)[:keep]
+        for character_id, found in versions.items()
+    }
+
+    delete: List[str] = []
+    reflag: List[Tuple[str, Dict[str, Any]]] = []
+    touched: set = set()
+    document_bytes = 0
+    for record_id, metadata, size in records:
+        keep_versions = kept.get(metadata.get("character_id"))
+        if keep_versions is None:
+            continue
+        if metadata.get("version") not in keep_versions:
+            delete.append(record_id)
+            touched.add(metadata["character_id"])
+            document_bytes += size
+            continue
+        is_latest = metadata["version"] == keep_versions[0]
+        if metadata.get("is_latest") != is_latest:
+            reflag.append((record_id, dict(metadata, is_latest=is_latest)))
+            touched.add(metadata["character_id"])
+
+    dimensions = 0
+    if delete:
+        sample = collection.get(ids=delete[:1], include=["embeddings"])
+        if sample["embeddings"] is not None and len(sample["embeddings"]):
+            dimensions = len(sample["embeddings"][0])
+    # NumpyCollection may store float16; ChromaDB always stores float32.
+    itemsize = getattr(getattr(collection, "dtype", None), "itemsize", 4)
+
+    if not dry_run:
+        batch = lore_index.UPSERT_BATCH_SIZE
+        for start in range(0, len(reflag), batch):
+            rows = reflag[start:start + batch]
+            collection.update(ids=[row[0] for row in rows], metadatas=[row[1] for row in rows])
+        for start in range(0, len(delete), batch):
+            collection.delete(ids=delete[start:start + batch])
+        if touched:
+            search_cache.invalidate(touched)
+
+    return {
+        "keep": keep,
+        "dry_run": dry_run,
+        "characters": len(versions),
+        "versions_before": sum(len(found) for found in versions.values()),
+        "versions_after": sum(len(found) for found in kept.values()),
+        "records_before": len(records),
+        "deleted": len(delete),
+        "flags_updated": len(reflag),
+        "reclaimed_bytes": document_bytes + len(delete) * dimensions * itemsize,
+        "disk_bytes_before": disk_before,
+        "disk_bytes_after": disk_before if dry_run else _disk_bytes(memory_clients.MEMORY_PATH),
+        "elapsed_s": round(time.perf_counter() - started, 2),
+    }
+
+
+def start(keep: int = KEEP_VERSIONS, dry_run: bool = False) -> bool:
+    """Run compact() on a daemon thread; False if a run is already going."""
+    with _job_lock:
+        if _job.get("status") == "running":
+            return False
+        _job.clear()
+        _job.update(status="running", keep=keep, dry_run=dry_run, started_at=time.time())
+
+    def run() -> None:
+        try:
+            result = compact(memory_clients.get_collection(), keep=keep, dry_run=dry_run)
+        except Exception as error:
+            with _job_lock:
+                _job.update(status="failed", error=str(error), finished_at=time.time())
+            return
+        with _job_lock:
+            _job.update(status="done", result=result, finished_at=time.time())
+
+    threading.Thread(target=run, name="lore-compaction", daemon=True).start()
+    return True
+
+
+def status() -> Dict[str, Any]:
+    with _job_lock:
+        return dict(_job)
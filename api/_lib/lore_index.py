@@ -0,0 +1,415 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from api._lib import embedding_cache, longtext, memory_clients, search_cache
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+INDEX_CONCURRENCY = _env_int("MEMORY_INDEX_CONCURRENCY", 4)
+UPSERT_BATCH_SIZE = _env_int("MEMORY_UPSERT_BATCH", 500)
+CHUNK_MAX_CHARS = _env_int("MEMORY_CHUNK_MAX_CHARS", 1000)
+MAX_ERRORS = 20
+_JOB_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# (chunk id, text, metadata)
+_Record = Tuple[str, str, Dict[str, Any]]
+
+
+_LORE_FIELDS = (
+    ("synopsis", "Synopsis"),
+    ("personality", "Personality"),
+    ("backstory", "Backstory"),
+)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def lore_chunks(character: Dict[str, Any]) -> List[_Record]:
+    """Split a character's lore into per-field, per-paragraph chunks.
+
+    Name and title form one "profile" chunk. Synopsis, personality and
+    backstory are split at paragraphs (long paragraphs at sentences, up to
+    CHUNK_MAX_CHARS) and each piece is prefixed with the character's name so
+    it still identifies its owner when retrieved on its own. Ids are stable
+    per (field, position), and every chunk carries its content hash.
+    """
+    base = lore_metadata(character)
+    doc_id = document_id(character)
+    name = character.get("name")
+    prefix = f"Name: {name}\n" if name else ""
+    chunks: List[_Record] = []
+
+    def add(field: str, index: int, text: str) -> None:
+        metadata = dict(base, field=field, chunk=index, content_hash=content_hash(text))
+        chunks.append((f"{doc_id}#{field}-{index}", text, metadata))
+
+    profile = "\n".join(
+        f"{label}: {character[key]}"
+        for key, label in (("name", "Name"), ("title", "Title"))
+        if character.get(key)
+    )
+    if profile:
+        add("profile", 0, profile)
+    for field, label in _LORE_FIELDS:
+        value = character.get(field)
+        if not value:
+            continue
+        for index, piece in enumerate(longtext.split_sentences(str(value), CHUNK_MAX_CHARS)):
+            add(field, index, f"{prefix}{label}: {piece}")
+    return chunks
+
+
+def lore_metadata(character: Dict[str, Any]) -> Dict[str, Any]:
+    # Metadata for filtering
+    return {
+        "character_id": character["id"],
+        "version": character.get("currentVersion", 1),
+        "updatedAt": character.get("updatedAt", ""),
+    }
+
+
+def document_id(character: Dict[str, Any]) -> str:
+    return f"{character['id']}_v{character.get('currentVersion', 1)}"
+
+
+class Checkpoint:
+    """Append-only file of document ids that have been upserted.
+
+    Ids are written only after their upsert succeeds, so re-running a job
+    with the same checkpoint skips finished work and retries the rest.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_job(cls, job_id: str) -> "Checkpoint":
+        if not _JOB_ID.match(job_id):
+            raise ValueError("job_id must be 1-64 letters, digits, '-' or '_'")
+        return cls(os.path.join(memory_clients.MEMORY_PATH, "checkpoints", f"{job_id}.ids"))
+
+    def load(self) -> Set[str]:
+        try:
+            with open(self.path, encoding="utf-8") as checkpoint_file:
+                return {line.strip() for line in checkpoint_file if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+    def add(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as checkpoint_file:
+                checkpoint_file.write("".join(f"{doc_id}\n" for doc_id in ids))
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+
+
+def unwrap_characters(data: Any) -> List[Any]:
+    """The character list in a parsed JSON array or object."""
+    if isinstance(data, dict):
+        return data.get("characters", [data])
+    return data if isinstance(data, list) else [data]
+
+
+def iter_characters(lines: Iterable[str]) -> Iterator[Any]:
+    """Characters from a JSON array, a {"characters": [...]} object or NDJSON.
+
+    NDJSON input is consumed line by line, so a file or request stream of
+    any size is never held in memory at once.
+    """
+    lines = iter(lines)
+    first = next((line for line in lines if line.strip()), None)
+    if first is None:
+        return
+    try:
+        head = json.loads(first)
+    except json.JSONDecodeError:
+        # Not one document per line: parse the whole input as a single value.
+        yield from unwrap_characters(json.loads(first + "".join(lines)))
+        return
+    yield from unwrap_characters(head)
+    for line in lines:
+        if line.strip():
+            yield from unwrap_characters(json.loads(line))
+
+
+def _character_filter(character_ids: List[str]) -> Dict[str, Any]:
+    if len(character_ids) == 1:
+        return {"character_id": character_ids[0]}
+    return {"character_id": {"$in": character_ids}}
+
+
+def prepare_characters(embedder, collection, characters: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Work out the minimal writes that bring stored chunks up to date.
+
+    Stored chunk metadata for these characters is read once. A chunk whose id
+    and content hash are unchanged is left alone (or only has its metadata
+    rewritten); a chunk whose text already exists under another id, e.g. in
+    the previous version, reuses that stored vector; only genuinely new text
+    is embedded. Stored chunks of the same character versions that are no
+    longer produced, including legacy whole-lore documents, are deleted.
+    Chunks of the newest version per character carry ``is_latest``; older
+    versions that still have the flag are demoted.
+    """
+    chunks = [chunk for character in characters for chunk in lore_chunks(character)]
+    character_ids = sorted({character["id"] for character in characters})
+    existing = collection.get(where=_character_filter(character_ids), include=["metadatas"])
+    stored = dict(zip(existing["ids"], existing["metadatas"] or []))
+
+    # Only chunks of each character's newest version are flagged is_latest.
+    latest: Dict[str, Any] = {}
+    for metadata in list(stored.values()) + [metadata for _, _, metadata in chunks]:
+        if metadata and metadata.get("version") is not None:
+            character_id, version = metadata.get("character_id"), metadata["version"]
+            latest[character_id] = max(latest.get(character_id, version), version)
+    for _, _, metadata in chunks:
+        metadata["is_latest"] = metadata["version"] == latest[metadata["character_id"]]
+    demote = [
+        (chunk_id, dict(metadata, is_latest=False))
+        for chunk_id, metadata in stored.items()
+        if metadata
+        and metadata.get("is_latest")
+        and metadata.get("version") != latest.get(metadata.get("character_id"))
+    ]
+
+    source_by_hash: Dict[str, str] = {}
+    for chunk_id, metadata in stored.items():
+        if metadata and metadata.get("content_hash"):
+            source_by_hash.setdefault(metadata["content_hash"], chunk_id)
+
+    unchanged = 0
+    copy_from: Dict[str, str] = {}
+    to_embed: List[_Record] = []
+    for chunk_id, text, metadata in chunks:
+        previous = stored.get(chunk_id)
+        if previous and previous.get("content_hash") == metadata["content_hash"]:
+            if previous == metadata:
+                unchanged += 1
+            else:
+                copy_from[chunk_id] = chunk_id
+        elif metadata["content_hash"] in source_by_hash:
+            copy_from[chunk_id] = source_by_hash[metadata["content_hash"]]
+        else:
+            to_embed.append((chunk_id, text, metadata))
+
+    vectors: Dict[str, List[float]] = {}
+    if copy_from:
+        sources = collection.get(ids=sorted(set(copy_from.values())), include=["embeddings"])
+        by_source = {
+            source: list(embedding)
+            for source, embedding in zip(sources["ids"], sources["embeddings"])
+        }
+        vectors.update({chunk_id: by_source[source] for chunk_id, source in copy_from.items()})
+    cached = 0
+    if to_embed:
+        embedded, cached = embedder.embed([text for _, text, _ in to_embed])
+        for (chunk_id, _, _), vector in zip(to_embed, embedded):
+            if vector is None:
+                raise RuntimeError(f"No embedding returned for {chunk_id}")
+            vectors[chunk_id] = vector
+
+    live_versions = {(character["id"], character.get("currentVersion", 1)) for character in characters}
+    produced = {chunk_id for chunk_id, _, _ in chunks}
+    stale = [
+        chunk_id
+        for chunk_id, metadata in stored.items()
+        if metadata
+        and (metadata.get("character_id"), metadata.get("version")) in live_versions
+        and chunk_id not in produced
+    ]
+    return {
+        "upserts": [
+            (chunk_id, vectors[chunk_id], text, metadata)
+            for chunk_id, text, metadata in chunks
+            if chunk_id in vectors
+        ],
+        "delete": stale,
+        "demote": [(chunk_id, metadata) for chunk_id, metadata in demote if chunk_id not in stale],
+        "character_ids": character_ids,
+        "counts": {
+            "chunks": len(chunks),
+            "unchanged": unchanged,
+            "reused": len(copy_from),
+            "embedded": len(to_embed),
+            "cached_embeddings": cached,
+            "deleted": len(stale),
+            "demoted": len(demote),
+        },
+    }
+
+
+def _upsert(collection, rows: List[Tuple[str, List[float], str, Dict[str, Any]]]) -> None:
+    if rows:
+        collection.upsert(
+            ids=[row[0] for row in rows],
+            embeddings=[row[1] for row in rows],
+            documents=[row[2] for row in rows],
+            metadatas=[row[3] for row in rows],
+        )
+
+
+def _demote(collection, rows: List[Tuple[str, Dict[str, Any]]]) -> None:
+    if rows:
+        collection.update(ids=[row[0] for row in rows], metadatas=[row[1] for row in rows])
+
+
+def _invalidate(plans: Iterable[Dict[str, Any]]) -> None:
+    # Cached searches over characters that were written to are now stale.
+    character_ids = {
+        character_id
+        for plan in plans
+        if plan["upserts"] or plan["demote"] or plan["delete"]
+        for character_id in plan["character_ids"]
+    }
+    if character_ids:
+        search_cache.invalidate(character_ids)
+
+
+def apply_plan(collection, plan: Dict[str, Any]) -> None:
+    """Write a plan from prepare_characters: upsert changes, delete leftovers."""
+    _upsert(collection, plan["upserts"])
+    _demote(collection, plan["demote"])
+    if plan["delete"]:
+        collection.delete(ids=plan["delete"])
+    _invalidate([plan])
+
+
+def index_characters(
+    embedder,
+    collection,
+    characters: Iterable[Any],
+    concurrency: int = INDEX_CONCURRENCY,
+    upsert_size: int = UPSERT_BATCH_SIZE,
+    checkpoint: Optional[Checkpoint] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Chunk, embed and upsert many characters.
+
+    Characters are grouped until a group holds about EMBED_BATCH_SIZE chunks;
+    up to ``concurrency`` groups are prepared (change detection plus one
+    embedding call) at a time, and their chunks are upserted once at least
+    ``upsert_size`` are pending. Characters already in ``checkpoint`` are
+    skipped. A failing group is counted and reported, not fatal.
+    ``progress`` receives the running summary after every upsert.
+    """
+    done = checkpoint.load() if checkpoint else set()
+    summary: Dict[str, Any] = {
+        "indexed": 0,
+        "skipped": 0,
+        "failed": 0,
+        "chunks": 0,
+        "unchanged": 0,
+        "reused": 0,
+        "embedded": 0,
+        "cached_embeddings": 0,
+        "deleted": 0,
+        "demoted": 0,
+        "errors": [],
+    }
+    started = time.perf_counter()
+    # Prepared groups waiting for an upsert: (document ids, plan).
+    pending: List[Tuple[List[str], Dict[str, Any]]] = []
+
+    def fail(count: int, message: str) -> None:
+        summary["failed"] += count
+        if len(summary["errors"]) < MAX_ERRORS:
+            summary["errors"].append(message)
+
+    def report() -> Dict[str, Any]:
+        elapsed = time.perf_counter() - started
+        summary["elapsed_s"] = round(elapsed, 2)
+        summary["per_second"] = round(summary["indexed"] / elapsed, 1) if elapsed else 0.0
+        return summary
+
+    def flush(force: bool = False) -> None:
+        # Whole groups are written together so a checkpointed character never
+        # has only part of its chunks stored.
+        if not pending or (
+            not force and sum(len(plan["upserts"]) for _, plan in pending) < upsert_size
+        ):
+            return
+        groups = pending[:]
+        pending.clear()
+        doc_ids = [doc_id for ids, _ in groups for doc_id in ids]
+        try:
+            _upsert(collection, [row for _, plan in groups for row in plan["upserts"]])
+            # Older versions lose is_latest only once the new one is stored.
+            _demote(collection, [row for _, plan in groups for row in plan["demote"]])
+        except Exception as error:
+            fail(len(doc_ids), f"upsert failed: {error}")
+            return
+        finally:
+            _invalidate([plan for _, plan in groups])
+        if checkpoint:
+            checkpoint.add(doc_ids)
+        summary["indexed"] += len(doc_ids)
+        if progress:
+            progress(report())
+
+    def groups() -> Iterator[List[Dict[str, Any]]]:
+        group: List[Dict[str, Any]] = []
+        group_chunks = 0
+        seen: Set[str] = set()
+        for character in characters:
+            if not isinstance(character, dict) or "id" not in character:
+                fail(1, "character without an id")
+                continue
+            doc_id = document_id(character)
+            if doc_id in done or doc_id in seen:
+                summary["skipped"] += 1
+                continue
+            seen.add(doc_id)
+            group.append(character)
+            group_chunks += len(lore_chunks(character))
+            if group_chunks >= embedding_cache.EMBED_BATCH_SIZE:
+                yield group
+                group, group_chunks = [], 0
+        if group:
+            yield group
+
+    def prepare(group: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return prepare_characters(embedder, collection, group)
+
+    def collect(finished: Iterable[Future], in_flight: Dict[Future, List[Dict[str, Any]]]) -> None:
+        for future in finished:
+            group = in_flight.pop(future)
+            try:
+                plan = future.result()
+                if plan["delete"]:
+                    collection.delete(ids=plan["delete"])
+                    search_cache.invalidate(plan["character_ids"])
+            except Exception as error:
+                fail(len(group), f"indexing failed: {error}")
+                continue
+            for key, value in plan["counts"].items():
+                summary[key] += value
+            pending.append(([document_id(character) for character in group], plan))
+        flush()
+
+    in_flight: Dict[Future, List[Dict[str, Any]]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for group in groups():
+            in_flight[pool.submit(prepare, group)] = group
+            if len(in_flight) >= concurrency:
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                collect(finished, in_flight)
+        if in_flight:
+            finished, _ = wait(list(in_flight))
+            collect(finished, in_flight)
+    flush(force=True)
+    return report()
@@ -0,0 +1,65 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+MAX_BATCH_QUERIES = 100
+
+
+def where_filter(character_id: Optional[str], latest_only: bool) -> Optional[Dict[str, Any]]:
+    """ChromaDB metadata filter for a search, or None to search everything."""
+    filters: List[Dict[str, Any]] = []
+    if character_id:
+        filters.append({"character_id": character_id})
+    if latest_only:
+        # Skips chunks of superseded versions
+        filters.append({"is_latest": True})
+    if len(filters) > 1:
+        return {"$and": filters}
+    return filters[0] if filters else None
+
+
+def format_results(
+    results: Dict[str, Any], row: int = 0, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """One query's matches from a collection.query response."""
+    formatted_results = []
+    documents = results.get("documents")
+    metadatas = results.get("metadatas")
+    distances = results.get("distances")
+
+    if documents and metadatas:
+        for i in range(len(documents[row]))[:limit]:
+            formatted_results.append(
+                {
+                    "content": documents[row][i],
+                    "metadata": metadatas[row][i],
+                    "distance": float(distances[row][i]) if distances else None,
+                }
+            )
+    return formatted_results
+
+
+def search_many(
+    collection, items: List[Dict[str, Any]], vectors: List[List[float]]
+) -> Tuple[List[List[Dict[str, Any]]], int]:
+    """Run many searches with as few collection queries as the filters allow.
+
+    ChromaDB applies one ``where`` to every embedding in a query, so items
+    are grouped by (character_id, latest_only) and each group is a single
+    multi-embedding query for the largest ``n_results`` in it; shorter
+    requests are trimmed. Returns results in item order and the number of
+    collection queries made.
+    """
+    groups: Dict[Tuple[Any, bool], List[int]] = {}
+    for index, item in enumerate(items):
+        key = (item.get("character_id") or None, bool(item.get("latest_only")))
+        groups.setdefault(key, []).append(index)
+
+    output: List[List[Dict[str, Any]]] = [[] for _ in items]
+    for (character_id, latest_only), indexes in groups.items():
+        results = collection.query(
+            query_embeddings=[list(vectors[index]) for index in indexes],
+            n_results=max(items[index]["n_results"] for index in indexes),
+            where=where_filter(character_id, latest_only),
+        )
+        for row, index in enumerate(indexes):
+            output[index] = format_results(results, row, items[index]["n_results"])
+    return output, len(groups)
@@ -0,0 +1,88 @@
+import base64
+from typing import Any, Dict, Mapping, Optional, Union
+
+VOICE_ID_HEADER = "X-Voice-Id"
+# Response headers browsers may read on media routes (CORS expose list).
+EXPOSE_HEADERS = [VOICE_ID_HEADER, "X-TTS-Cache"]
+# Set by handler_adapter on events from the local proxies, which send a bytes
+# body as it is; serverless events never carry it.
+RAW_BODY_KEY = "rawBody"
+
+
+def header(headers: Optional[Mapping[str, str]], name: str) -> Optional[str]:
+    """Case-insensitive header lookup in an event's ``headers`` dict."""
+    name = name.lower()
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def wants_binary(accept: Optional[str], kind: str) -> bool:
+    """True when ``accept`` prefers a raw ``kind`` body ("audio" or "image") over JSON.
+
+    The client has to name ``kind/*`` or a concrete ``kind/...`` type with
+    a quality at least that of application/json; ``*/*`` and a missing
+    header keep the JSON default.
+    """
+    media_q = json_q = 0.0
+    for item in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        media_type = media_type.lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type.startswith(f"{kind}/"):
+            media_q = max(media_q, q)
+        elif media_type in ("application/json", "application/*"):
+            json_q = max(json_q, q)
+    return media_q > 0 and media_q >= json_q
+
+
+def event_wants_binary(event: Dict[str, Any], kind: str) -> bool:
+    return wants_binary(header(event.get("headers"), "Accept"), kind)
+
+
+def _decoded_size(data: str) -> int:
+    return len(data) * 3 // 4 - data[-2:].count("=")
+
+
+def binary_response(
+    event: Dict[str, Any],
+    data: Union[bytes, str],
+    mime_type: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """Handler result for a binary body.
+
+    ``data`` is the raw bytes or, straight from an upstream API, their base64
+    text. Serverless runtimes only carry ``str`` bodies, so they get base64
+    flagged with ``isBase64Encoded``, and upstream text is passed through
+    untouched. Events from the local proxies (RAW_BODY_KEY) get bytes, which
+    the proxies send as they are. Either way the payload is converted at most
+    once. Content-Length is that of the decoded body.
+    """
+    raw = bool(event.get(RAW_BODY_KEY))
+    size = _decoded_size(data) if isinstance(data, str) else len(data)
+    if raw and isinstance(data, str):
+        data = base64.b64decode(data)
+    elif not raw and isinstance(data, bytes):
+        data = base64.b64encode(data).decode("ascii")
+    return {
+        "statusCode": 200,
+        "headers": dict(
+            {
+                "Content-Type": mime_type,
+                "Content-Length": str(size),
+                "Access-Control-Allow-Origin": "*",
+            },
+            **(headers or {}),
+        ),
+        "body": data,
+        "isBase64Encoded": not raw,
+    }
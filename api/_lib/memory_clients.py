@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from api._lib import embedders, vector_store
+
+MEMORY_PATH = os.getenv("MEMORY_DB_PATH", "./.memory")
+COLLECTION_NAME = os.getenv("MEMORY_COLLECTION", "character_lore")
+# "chroma" or "numpy" (memory-mapped matrix, see vector_store.py)
+VECTOR_STORE = os.getenv("MEMORY_VECTOR_STORE", "chroma").strip().lower()
+EMBEDDING_MODEL = embedders.GEMINI_MODEL
+
+_genai_clients: Dict[str, Any] = {}
+_chroma_client = None
+_collection = None
+# Embedder name recorded in the open collection's metadata
+_collection_embedder: Optional[str] = None
+# Local embedders by name; they hold models, so one per process
+_local_embedders: Dict[str, embedders.Embedder] = {}
+_lock = threading.Lock()
+_setup_ms: Dict[str, Optional[float]] = {
+    "genai": None,
+    "chroma": None,
+    "collection": None,
+    "embedder": None,
+}
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def get_genai_client(api_key: str):
+    """Process-wide google-genai client; one per API key so rotation works."""
+    client = _genai_clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _genai_clients.get(api_key)
+            if client is None:
+                from google import genai
+
+                started = time.perf_counter()
+                client = genai.Client(api_key=api_key)
+                _setup_ms["genai"] = _elapsed_ms(started)
+                _genai_clients[api_key] = client
+    return client
+
+
+def get_collection():
+    """Process-wide handle on the lore collection in the persistent store.
+
+    Opening the store (SQLite plus segment files for ChromaDB, SQLite plus a
+    memory-mapped matrix for MEMORY_VECTOR_STORE=numpy) and loading
+    collection metadata happens once; later calls return the cached handle.
+    """
+    global _chroma_client, _collection, _collection_embedder
+    if _collection is None:
+        with _lock:
+            if _collection is None:
+                # The metadata only applies when the collection is created here
+                metadata = {"embedder": embedders.default_name(embedders.configured_kind())}
+                if VECTOR_STORE == "numpy":
+                    started = time.perf_counter()
+                    collection = vector_store.NumpyCollection(
+                        os.path.join(MEMORY_PATH, "numpy", COLLECTION_NAME), metadata=metadata
+                    )
+                else:
+                    import chromadb
+
+                    started = time.perf_counter()
+                    _chroma_client = chromadb.PersistentClient(path=MEMORY_PATH)
+                    _setup_ms["chroma"] = _elapsed_ms(started)
+
+                    started = time.perf_counter()
+                    collection = _chroma_client.get_or_create_collection(
+                        name=COLLECTION_NAME, metadata=metadata
+                    )
+                _collection_embedder = _record_embedder(collection)
+                _collection = collection
+                _setup_ms["collection"] = _elapsed_ms(started)
+    return _collection
+
+
+def _record_embedder(collection) -> str:
+    metadata = dict(collection.metadata or {})
+    if not metadata.get("embedder"):
+        # Created before embedders were recorded: non-empty means Gemini vectors
+        metadata["embedder"] = (
+            embedders.LEGACY_EMBEDDER
+            if collection.count()
+            else embedders.default_name(embedders.configured_kind())
+        )
+        collection.modify(metadata=metadata)
+    return metadata["embedder"]
+
+
+def get_embedder(api_key: Optional[str]) -> embedders.Embedder:
+    """The embedder that built the lore collection.
+
+    MEMORY_EMBEDDER picks the backend for a new collection; an existing
+    collection keeps the one recorded in its metadata. Asking for a
+    different backend raises EmbedderError (409) rather than mixing vectors
+    from two models in one index.
+    """
+    get_collection()
+    recorded = _collection_embedder
+    kind = embedders.configured_kind()
+    if kind is not None and embedders.default_name(kind) != recorded:
+        raise embedders.EmbedderError(
+            f"Collection {COLLECTION_NAME} was built with {recorded}, but MEMORY_EMBEDDER "
+            f"selects {embedders.default_name(kind)}; use another MEMORY_COLLECTION or "
+            "unset MEMORY_EMBEDDER",
+            409,
+        )
+
+    base, _, projected = recorded.partition("|")
+    backend, _, detail = base.partition(":")
+    if backend == "gemini":
+        if not api_key:
+            raise embedders.EmbedderError("GEMINI_API_KEY not set")
+        model, _, dimensions = detail.partition("@")
+        return embedders.GeminiEmbedder(
+            get_genai_client(api_key), model, int(dimensions) if dimensions else None
+        )
+
+    embedder = _local_embedders.get(recorded)
+    if embedder is None:
+        with _lock:
+            embedder = _local_embedders.get(recorded)
+            if embedder is None:
+                started = time.perf_counter()
+                if backend == "hashing":
+                    embedder = embedders.HashingEmbedder(int(detail))
+                elif backend == "onnx":
+                    model_dir = os.getenv("MEMORY_ONNX_MODEL")
+                    if not model_dir:
+                        raise embedders.EmbedderError("MEMORY_ONNX_MODEL not set")
+                    embedder = embedders.OnnxEmbedder(model_dir)
+                else:
+                    raise embedders.EmbedderError(f"Unknown embedder {recorded}")
+                if projected:
+                    projection = embedders.configured_projection()
+                    if projection is None:
+                        raise embedders.EmbedderError("MEMORY_PCA_PATH not set")
+                    embedder = embedders.ProjectedEmbedder(embedder, projection)
+                if embedder.name != recorded:
+                    raise embedders.EmbedderError(
+                        f"Collection {COLLECTION_NAME} was built with {recorded}, "
+                        f"not {embedder.name}",
+                        409,
+                    )
+                _setup_ms["embedder"] = _elapsed_ms(started)
+                _local_embedders[recorded] = embedder
+    return embedder
+
+
+def close() -> None:
+    """Close and forget every client; the next request re-creates them.
+
+    Use after the memory directory is replaced or deleted, or on shutdown.
+    """
+    global _chroma_client, _collection, _collection_embedder
+    with _lock:
+        clients = list(_genai_clients.values())
+        _genai_clients.clear()
+        _local_embedders.clear()
+        chroma, collection = _chroma_client, _collection
+        _chroma_client, _collection, _collection_embedder = None, None, None
+        for key in _setup_ms:
+            _setup_ms[key] = None
+    for client in clients:
+        getattr(client, "close", lambda: None)()
+    if isinstance(collection, vector_store.NumpyCollection):
+        collection.close()
+    if chroma is not None:
+        getattr(chroma, "close", lambda: None)()
+
+
+def server_timing(phases: Dict[str, float]) -> str:
+    """Format per-phase durations (ms) as a Server-Timing header value."""
+    return ", ".join(f"{name};dur={duration:.2f}" for name, duration in phases.items())
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "genai_clients": len(_genai_clients),
+            "collection_open": _collection is not None,
+            "collection": COLLECTION_NAME,
+            "vector_store": VECTOR_STORE,
+            "embedder": _collection_embedder,
+            "setup_ms": dict(_setup_ms),
+        }
@@ -0,0 +1,145 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class _Job:
+    __slots__ = ("text", "language", "prompt", "future", "enqueued")
+
+    def __init__(self, text: str, language: str, prompt: List[Any]):
+        self.text = text
+        self.language = language
+        self.prompt = prompt
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class BatchScheduler:
+    """Dynamic micro-batching in front of ``generate_voice_clone``.
+
+    ``generate(texts, languages, prompt_items)`` must return
+    ``(waveforms, sample_rate)`` with one waveform per text. Requests are
+    queued and a single worker thread drains them: after the first job
+    arrives it waits up to ``window_ms`` for more, up to ``max_batch`` jobs,
+    then runs one batched generate call and resolves each caller's future
+    with its own waveform. Running all inference on one thread also stops
+    concurrent requests from oversubscribing torch's CPU threads.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[List[str], List[str], List[Any]], Tuple[List[Any], int]],
+        max_batch: Optional[int] = None,
+        window_ms: Optional[int] = None,
+    ):
+        self.generate = generate
+        self.max_batch = max(1, max_batch or _env_int("QWEN_BATCH_MAX_SIZE", 4))
+        self.window = (
+            window_ms if window_ms is not None else _env_int("QWEN_BATCH_WINDOW_MS", 20)
+        ) / 1000
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "inference_ms_total": 0.0,
+        }
+        self._worker = threading.Thread(target=self._run, name="qwen-batcher", daemon=True)
+        self._worker.start()
+
+    def enqueue(self, text: str, language: str, prompt: List[Any]) -> Future:
+        """Queue one request; the future resolves to (waveform, sample_rate)."""
+        job = _Job(text, language, prompt)
+        self._queue.put(job)
+        return job.future
+
+    def submit(self, text: str, language: str, prompt: List[Any]):
+        """Queue one request and block until its (waveform, sample_rate) is ready."""
+        return self.enqueue(text, language, prompt).result()
+
+    def _collect(self) -> List[_Job]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            waits = [(started - job.enqueued) * 1000 for job in batch]
+            try:
+                wavs, sr = self.generate(
+                    [job.text for job in batch],
+                    [job.language for job in batch],
+                    [item for job in batch for item in job.prompt],
+                )
+            except Exception as error:
+                self._fail(batch, error)
+                continue
+            if len(wavs) != len(batch):
+                # Never leave a caller blocked on a future nobody will resolve.
+                self._fail(
+                    batch,
+                    RuntimeError(f"generate returned {len(wavs)} waveforms for {len(batch)} texts"),
+                )
+                continue
+
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._stats["requests"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["wait_ms_total"] += sum(waits)
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], *waits)
+                self._stats["inference_ms_total"] += elapsed
+                self._batch_sizes[len(batch)] += 1
+            for job, wav in zip(batch, wavs):
+                job.future.set_result((wav, sr))
+
+    def _fail(self, batch: List[_Job], error: BaseException) -> None:
+        with self._lock:
+            self._stats["errors"] += len(batch)
+        for job in batch:
+            job.future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            sizes = dict(sorted(self._batch_sizes.items()))
+        requests = snapshot["requests"]
+        batches = snapshot["batches"]
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_batch": self.max_batch,
+            "window_ms": round(self.window * 1000, 1),
+            "requests": requests,
+            "batches": batches,
+            "errors": snapshot["errors"],
+            "batch_sizes": sizes,
+            "avg_batch_size": round(requests / batches, 2) if batches else 0.0,
+            "avg_wait_ms": round(snapshot["wait_ms_total"] / requests, 1) if requests else 0.0,
+            "max_wait_ms": round(snapshot["wait_ms_max"], 1),
+            "avg_inference_ms": round(snapshot["inference_ms_total"] / batches, 1) if batches else 0.0,
+        }
@@ -0,0 +1,233 @@
+import gc
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from api._lib.qwen_batcher import BatchScheduler
+
+STATS_TIMEOUT = 1.0
+
+
+def split_cores(workers: int, cores: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """Partition the usable cores into contiguous, near-equal groups."""
+    cores = sorted(cores if cores is not None else os.sched_getaffinity(0))
+    workers = max(1, min(workers, len(cores)))
+    size, extra = divmod(len(cores), workers)
+    groups, start = [], 0
+    for index in range(workers):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(cores[start:end])
+        start = end
+    return groups
+
+
+def _pss_mb(pid: int) -> Optional[float]:
+    # Proportional set size splits shared pages between the processes mapping
+    # them, so summing it across workers shows the real cost of the pool.
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as smaps:
+            for line in smaps:
+                if line.startswith("Pss:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _worker_main(conn, cores: List[int], generate, warmup) -> None:
+    # The parent owns Ctrl-C and terminates the pool on exit.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import torch
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    if warmup is not None:
+        warmup()
+
+    scheduler = BatchScheduler(generate)
+    send_lock = threading.Lock()
+
+    def reply(request_id, ok, payload):
+        with send_lock:
+            conn.send((request_id, ok, payload))
+
+    def resolve(request_id, future):
+        error = future.exception()
+        if error is None:
+            reply(request_id, True, future.result())
+        else:
+            reply(request_id, False, f"{type(error).__name__}: {error}")
+
+    while True:
+        try:
+            kind, request_id, payload = conn.recv()
+        except (EOFError, OSError):
+            break
+        if kind == "stats":
+            reply(request_id, True, scheduler.stats())
+        else:
+            future = scheduler.enqueue(*payload)
+            future.add_done_callback(lambda done, rid=request_id: resolve(rid, done))
+    os._exit(0)
+
+
+class _Worker:
+    def __init__(self, index: int, process, conn, cores: List[int]):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.cores = cores
+        self.alive = True
+        self.pending: Dict[int, Tuple[str, Future]] = {}
+        self.completed = 0
+        self.errors = 0
+        self.send_lock = threading.Lock()
+
+
+class WorkerPool:
+    """Forked Qwen workers that share the parent's model weights.
+
+    The model must already be loaded in the parent: ``fork`` then maps the
+    weights copy-on-write into every worker, so N workers cost roughly one copy
+    plus per-process activations. Each worker is pinned to its own group of
+    cores, sizes torch's thread pool to match and runs its own micro-batching
+    scheduler. ``submit`` sends each request to the worker with the fewest
+    requests in flight. Fork is unsafe once CUDA is initialized, so this is a
+    CPU-only mode.
+    """
+
+    def __init__(
+        self,
+        generate: Callable,
+        workers: int,
+        warmup: Optional[Callable[[], Any]] = None,
+        cores: Optional[Sequence[int]] = None,
+    ):
+        context = multiprocessing.get_context("fork")
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.workers: List[_Worker] = []
+
+        # Move everything allocated so far out of the collector's reach so GC
+        # passes in the workers do not dirty (and thus copy) inherited pages.
+        gc.freeze()
+        try:
+            for index, group in enumerate(split_cores(workers, cores)):
+                parent_conn, child_conn = context.Pipe()
+                process = context.Process(
+                    target=_worker_main,
+                    args=(child_conn, group, generate, warmup),
+                    name=f"qwen-worker-{index}",
+                    daemon=True,
+                )
+                process.start()
+                child_conn.close()
+                self.workers.append(_Worker(index, process, parent_conn, group))
+        finally:
+            gc.unfreeze()
+
+        # Readers start only after every fork so no child inherits their state.
+        for worker in self.workers:
+            threading.Thread(
+                target=self._read, args=(worker,), name=f"qwen-pool-{worker.index}", daemon=True
+            ).start()
+
+    def _read(self, worker: _Worker) -> None:
+        while True:
+            try:
+                request_id, ok, payload = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                kind, future = worker.pending.pop(request_id, (None, None))
+                if kind == "generate":
+                    if ok:
+                        worker.completed += 1
+                    else:
+                        worker.errors += 1
+            if future is None:
+                continue
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+        with self._lock:
+            worker.alive = False
+            orphans = [future for _, future in worker.pending.values()]
+            worker.pending.clear()
+        for future in orphans:
+            future.set_exception(RuntimeError(f"Qwen worker {worker.index} exited"))
+
+    def _send(self, worker: _Worker, kind: str, payload: Any) -> Future:
+        future: Future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            worker.pending[request_id] = (kind, future)
+        try:
+            with worker.send_lock:
+                worker.conn.send((kind, request_id, payload))
+        except (OSError, ValueError) as error:
+            with self._lock:
+                worker.pending.pop(request_id, None)
+            future.set_exception(RuntimeError(f"Qwen worker {worker.index} unavailable: {error}"))
+        return future
+
+    def submit(self, text: str, language: str, prompt: List[Any]):
+        """Run one request on the least-loaded worker and return (waveform, sr)."""
+        with self._lock:
+            alive = [worker for worker in self.workers if worker.alive]
+            if not alive:
+                raise RuntimeError("No Qwen workers are running")
+            # Ties go to the lowest index, so light traffic stays on warm workers.
+            worker = min(alive, key=lambda candidate: len(candidate.pending))
+        return self._send(worker, "generate", (text, language, prompt)).result()
+
+    def stats(self) -> Dict[str, Any]:
+        workers = []
+        for worker in self.workers:
+            scheduler = None
+            if worker.alive:
+                # A worker busy in a long generate call may not answer in time.
+                try:
+                    scheduler = self._send(worker, "stats", None).result(timeout=STATS_TIMEOUT)
+                except Exception:
+                    scheduler = None
+            with self._lock:
+                workers.append(
+                    {
+                        "pid": worker.process.pid,
+                        "cores": worker.cores,
+                        "alive": worker.alive,
+                        "in_flight": sum(
+                            1 for kind, _ in worker.pending.values() if kind == "generate"
+                        ),
+                        "completed": worker.completed,
+                        "errors": worker.errors,
+                        "pss_mb": _pss_mb(worker.process.pid),
+                        "scheduler": scheduler,
+                    }
+                )
+        pss = [worker["pss_mb"] for worker in workers if worker["pss_mb"] is not None]
+        return {
+            "workers": workers,
+            "parent_pss_mb": _pss_mb(os.getpid()),
+            "workers_pss_mb": round(sum(pss), 1) if pss else None,
+        }
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.conn.close()
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
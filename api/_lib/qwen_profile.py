@@ -0,0 +1,104 @@
+import contextlib
+import os
+import time
+from typing import Any, Dict
+
+import numpy as np
+
+WARMUP_TEXT = "Warming up."
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def settings() -> Dict[str, Any]:
+    """Inference knobs for the Qwen model, read from the environment."""
+    return {
+        "quantize": os.getenv("QWEN_TTS_QUANTIZE", "").strip().lower() or None,
+        "threads": _env_int("QWEN_TORCH_THREADS", 0),
+        "interop_threads": _env_int("QWEN_TORCH_INTEROP_THREADS", 0),
+        "compile": env_flag("QWEN_TORCH_COMPILE"),
+        "inference_mode": env_flag("QWEN_INFERENCE_MODE", True),
+        "workers": _env_int("QWEN_TTS_WORKERS", 0),
+    }
+
+
+def configure_threads(profile: Dict[str, Any]) -> None:
+    """Pin torch's intra-/inter-op pool sizes; 0 keeps torch's default."""
+    import torch
+
+    if profile["threads"] > 0:
+        torch.set_num_threads(profile["threads"])
+    if profile["interop_threads"] > 0:
+        try:
+            torch.set_num_interop_threads(profile["interop_threads"])
+        except RuntimeError:
+            # Only settable once, before any inter-op parallel work has started.
+            pass
+
+
+def optimize(model, profile: Dict[str, Any], device: str) -> None:
+    """Apply CPU-only optimizations to a loaded Qwen3TTSModel in place.
+
+    Dynamic int8 quantization targets the talker's Linear layers, which hold
+    most of the weights and dominate autoregressive decode time; the speaker
+    encoder and speech tokenizer stay in float32 to protect voice similarity.
+    """
+    import torch
+
+    talker = model.model.talker
+    if device == "cpu" and profile["quantize"] == "int8":
+        torch.ao.quantization.quantize_dynamic(
+            talker, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    elif profile["quantize"] not in (None, "int8"):
+        raise ValueError(f"Unsupported QWEN_TTS_QUANTIZE value: {profile['quantize']}")
+
+    if profile["compile"]:
+        # Compile forward only; generate() stays in Python and calls it per step.
+        talker.forward = torch.compile(talker.forward, dynamic=True)
+
+
+def inference_context(profile: Dict[str, Any]):
+    if not profile["inference_mode"]:
+        return contextlib.nullcontext()
+    import torch
+
+    return torch.inference_mode()
+
+
+def synthetic_reference(seconds: float = 1.0, sr: int = 24000):
+    """Low-level noise usable as an x-vector-only reference clip."""
+    rng = np.random.default_rng(0)
+    return rng.standard_normal(int(sr * seconds)).astype(np.float32) * 0.01, sr
+
+
+def warmup(model, profile: Dict[str, Any]) -> float:
+    """Run one short generation so the first real request skips lazy init.
+
+    Uses a synthetic reference in x-vector-only mode, so no sample file or
+    transcript is needed. Returns the elapsed time in milliseconds.
+    """
+    started = time.perf_counter()
+    with inference_context(profile):
+        prompt = model.create_voice_clone_prompt(
+            ref_audio=synthetic_reference(), x_vector_only_mode=True
+        )
+        model.generate_voice_clone(
+            text=WARMUP_TEXT,
+            language="English",
+            voice_clone_prompt=prompt,
+            max_new_tokens=32,
+        )
+    return round((time.perf_counter() - started) * 1000, 1)
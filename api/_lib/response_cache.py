@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+CACHE_HEADER = "X-Response-Cache"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def cache_key(model: str, payload: Dict[str, Any]) -> str:
+    """Hash of the model and the canonical JSON of the request payload.
+
+    Keys are sorted and whitespace dropped, so a ``prompt`` and the
+    equivalent ``contents`` (see gemini.text_payload) share an entry.
+    """
+    canonical = json.dumps(
+        [model, payload], sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Successful upstream response bodies with single-flight coalescing.
+
+    Opt-in: GEMINI_CACHE_TTL > 0 keeps bodies for that many seconds in a
+    memory LRU bounded by GEMINI_CACHE_MAX_BYTES. Independently, concurrent
+    calls for the same key share one upstream request (GEMINI_COALESCE,
+    on by default once the cache is enabled): the first caller fetches and
+    the others wait for its result, or its error. Only successful bodies
+    are cached; a failed fetch is retried by the next caller.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        coalesce: Optional[bool] = None,
+    ):
+        self.ttl = ttl if ttl is not None else _env_int("GEMINI_CACHE_TTL", 0)
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else _env_int("GEMINI_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+        )
+        self.coalesce = (
+            coalesce
+            if coalesce is not None
+            else bool(_env_int("GEMINI_COALESCE", 1 if self.ttl > 0 else 0))
+        )
+        # key -> (expires_at, body)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._async_in_flight: Dict[str, "asyncio.Future[bytes]"] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "upstream_calls": 0,
+            "upstream_errors": 0,
+            "evictions": 0,
+        }
+
+    def _drop(self, key: str) -> None:
+        self._size -= len(self._entries.pop(key)[1])
+
+    def _lookup(self, key: str) -> Optional[bytes]:
+        # Caller holds the lock.
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return entry[1]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._lookup(key)
+
+    def put(self, key: str, body: bytes) -> None:
+        if self.ttl <= 0 or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                evicted, _ = next(iter(self._entries.items()))
+                self._drop(evicted)
+                self._stats["evictions"] += 1
+
+    def _fetched(self, key: str, body: Optional[bytes]) -> None:
+        with self._lock:
+            self._stats["upstream_calls"] += 1
+            if body is None:
+                self._stats["upstream_errors"] += 1
+        if body is not None:
+            self.put(key, body)
+
+    def fetch(self, key: str, compute: Callable[[], bytes]) -> Tuple[bytes, str]:
+        """Cached body for ``key``, else ``compute()`` run once for all concurrent callers.
+
+        Returns the body and how it was served: ``HIT``, ``COALESCED`` or
+        ``MISS``. Errors from ``compute`` reach every waiting caller.
+        """
+        with self._lock:
+            body = self._lookup(key)
+            if body is not None:
+                return body, "HIT"
+            self._stats["misses"] += 1
+            future = self._in_flight.get(key) if self.coalesce else None
+            leader = future is None
+            if leader:
+                future = Future()
+                if self.coalesce:
+                    self._in_flight[key] = future
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            return future.result(), "COALESCED"
+
+        try:
+            body = compute()
+        except BaseException as error:
+            self._fetched(key, None)
+            future.set_exception(error)
+            raise
+        else:
+            self._fetched(key, body)
+            future.set_result(body)
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+        return body, "MISS"
+
+    async def afetch(self, key: str, compute: Callable[[], Awaitable[bytes]]) -> Tuple[bytes, str]:
+        """fetch() for the event loop.
+
+        The upstream call runs as its own task, so a caller that disconnects
+        does not cancel the request the others are waiting on.
+        """
+        with self._lock:
+            body = self._lookup(key)
+            if body is not None:
+                return body, "HIT"
+            self._stats["misses"] += 1
+            task = self._async_in_flight.get(key) if self.coalesce else None
+            status = "MISS" if task is None else "COALESCED"
+            if task is None:
+                task = asyncio.ensure_future(compute())
+                task.add_done_callback(lambda done: self._afetched(key, done))
+                if self.coalesce:
+                    self._async_in_flight[key] = task
+            else:
+                self._stats["coalesced"] += 1
+        return await asyncio.shield(task), status
+
+    def _afetched(self, key: str, task: "asyncio.Future[bytes]") -> None:
+        with self._lock:
+            if self._async_in_flight.get(key) is task:
+                del self._async_in_flight[key]
+        failed = task.cancelled() or task.exception() is not None
+        self._fetched(key, None if failed else task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+            snapshot["bytes"] = self._size
+            snapshot["in_flight"] = len(self._in_flight) + len(self._async_in_flight)
+        snapshot["ttl"] = self.ttl
+        snapshot["coalesce"] = self.coalesce
+        # Every hit and every coalesced waiter is an upstream call not made.
+        snapshot["upstream_calls_saved"] = snapshot["hits"] + snapshot["coalesced"]
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_ratio"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+        return snapshot
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def stats() -> Dict[str, Any]:
+    return get_cache().stats()
@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from api._lib import memory_clients
+
+CACHE_HEADER = "X-Search-Cache"
+# Generation of searches without a character_id; every write bumps it.
+ALL_CHARACTERS = ""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+class SearchCache:
+    """Formatted lore search results in a memory LRU, checked against generations.
+
+    Every write to the lore collection bumps a generation counter for each
+    character it touched, plus the ALL_CHARACTERS counter. An entry remembers
+    the generation it was computed under (the character's, or ALL_CHARACTERS
+    for unfiltered searches) and is only served while that is unchanged.
+
+    The counters live in a small SQLite file next to the memory store, so
+    writes from other processes (scripts/index_characters.py,
+    scripts/compact_memory.py) invalidate too. They are read back only after
+    ``PRAGMA data_version`` reports another connection's commit; otherwise a
+    hit is a dictionary lookup.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.path = path or os.path.join(memory_clients.MEMORY_PATH, "search-generations.sqlite3")
+        self.max_entries = (
+            max_entries if max_entries is not None else _env_int("SEARCH_CACHE_ENTRIES", 2048)
+        )
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[int, List[Dict[str, Any]]]]" = (
+            OrderedDict()
+        )
+        # Generations read from SQLite since the last foreign commit.
+        self._generations: Dict[str, int] = {}
+        self._data_version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "invalidations": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS generations ("
+                "character_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+            self._db = db
+        return self._db
+
+    def _generation(self, scope: str) -> int:
+        db = self._connect()
+        data_version = db.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._generations.clear()
+            self._data_version = data_version
+        generation = self._generations.get(scope)
+        if generation is None:
+            row = db.execute(
+                "SELECT generation FROM generations WHERE character_id = ?", (scope,)
+            ).fetchone()
+            generation = self._generations[scope] = row[0] if row else 0
+        return generation
+
+    def lookup(
+        self, key: Tuple[Any, ...], scope: str
+    ) -> Tuple[Optional[List[Dict[str, Any]]], int]:
+        """Cached results for ``key`` (None on a miss) and the current generation.
+
+        Pass the generation back to store() so results computed while a
+        write was landing are never kept as current.
+        """
+        if self.max_entries <= 0:
+            return None, 0
+        with self._lock:
+            generation = self._generation(scope)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1], generation
+            if entry is not None:
+                del self._entries[key]
+                self._stats["stale"] += 1
+            self._stats["misses"] += 1
+            return None, generation
+
+    def store(self, key: Tuple[Any, ...], generation: int, results: List[Dict[str, Any]]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, character_ids: Iterable[str]) -> None:
+        """Bump the generations of ``character_ids`` and of unfiltered searches."""
+        scopes = sorted({str(character_id) for character_id in character_ids} | {ALL_CHARACTERS})
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    "INSERT INTO generations (character_id, generation) VALUES (?, 1) "
+                    "ON CONFLICT(character_id) DO UPDATE SET generation = generation + 1",
+                    [(scope,) for scope in scopes],
+                )
+                db.execute("COMMIT")
+            except sqlite3.Error:
+                db.execute("ROLLBACK")
+                raise
+            # Our own commits do not change data_version; forget the bumped scopes.
+            for scope in scopes:
+                self._generations.pop(scope, None)
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_ratio"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+        return snapshot
+
+    def close(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SearchCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SearchCache()
+    return _cache
+
+
+def invalidate(character_ids: Iterable[str]) -> None:
+    get_cache().invalidate(character_ids)
+
+
+def stats() -> Dict[str, Any]:
+    return get_cache().stats()
@@ -0,0 +1,49 @@
+import asyncio
+import queue
+import threading
+from typing import AsyncIterator, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def iterate_in_thread(agen: AsyncIterator[T]) -> Iterator[T]:
+    """Drive an async generator from synchronous (WSGI) code.
+
+    The generator runs on its own event loop in a background thread and items
+    are handed over through a queue, so the caller can forward each chunk as
+    soon as it is produced. Closing the returned iterator stops the producer.
+    """
+    items: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+
+    async def pump():
+        try:
+            async for item in agen:
+                if stop.is_set():
+                    break
+                items.put(item)
+        except Exception as error:
+            items.put(_Failure(error))
+        finally:
+            await agen.aclose()
+            items.put(_DONE)
+
+    threading.Thread(target=lambda: asyncio.run(pump()), daemon=True).start()
+
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
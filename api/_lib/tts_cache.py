@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+CACHE_HEADER = "X-TTS-Cache"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def cache_key(
+    provider: str,
+    text: str,
+    voice: Optional[str] = None,
+    rate: Optional[str] = None,
+    pitch: Optional[str] = None,
+    volume: Optional[str] = None,
+    language: Optional[str] = None,
+    reference: Optional[str] = None,
+) -> str:
+    """Content address of a clip: every input that changes the audio."""
+    canonical = json.dumps(
+        [provider, text, voice, rate, pitch, volume, language, reference],
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Two-tier audio cache: an in-process LRU in front of a disk directory.
+
+    Both tiers are bounded by total bytes. Disk entries are evicted oldest
+    access first (mtime is bumped on every hit). Disk errors are swallowed so a
+    read-only filesystem only costs the disk tier, never the request.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        memory_bytes: Optional[int] = None,
+        disk_bytes: Optional[int] = None,
+    ):
+        self.directory = directory or os.getenv("TTS_CACHE_DIR", "./.tts-cache")
+        self.memory_limit = (
+            memory_bytes
+            if memory_bytes is not None
+            else _env_int("TTS_CACHE_MEMORY_BYTES", 64 * 1024 * 1024)
+        )
+        self.disk_limit = (
+            disk_bytes
+            if disk_bytes is not None
+            else _env_int("TTS_CACHE_DISK_BYTES", 512 * 1024 * 1024)
+        )
+        self._memory: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._memory_size = 0
+        self._disk_size: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, key: str, data: bytes, mime_type: str) -> None:
+        if len(data) > self.memory_limit:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key)[0])
+        self._memory[key] = (data, mime_type)
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_limit:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._remember(key, *entry)
+        return entry
+
+    def put(self, key: str, data: bytes, mime_type: str) -> None:
+        with self._lock:
+            self._remember(key, data, mime_type)
+        self._write_disk(key, data, mime_type)
+
+    def _read_disk(self, key: str) -> Optional[Tuple[bytes, str]]:
+        if self.disk_limit <= 0:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                mime_type = cache_file.readline().decode("ascii").strip()
+                data = cache_file.read()
+            os.utime(path)
+        except (OSError, UnicodeDecodeError):
+            return None
+        return data, mime_type
+
+    def _write_disk(self, key: str, data: bytes, mime_type: str) -> None:
+        if self.disk_limit <= 0 or len(data) > self.disk_limit:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as cache_file:
+                cache_file.write(mime_type.encode("ascii") + b"\n")
+                cache_file.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = self._scan_disk_size()
+            else:
+                self._disk_size += len(data) + len(mime_type) + 1
+            if self._disk_size > self.disk_limit:
+                self._evict_disk()
+
+    def _disk_entries(self) -> Iterable[Tuple[float, int, str]]:
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _scan_disk_size(self) -> int:
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def _evict_disk(self) -> None:
+        # Trim to 90% of the limit so eviction does not run on every write.
+        target = int(self.disk_limit * 0.9)
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._stats["evictions"] += 1
+        self._disk_size = total
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot["memory_entries"] = len(self._memory)
+            snapshot["memory_bytes"] = self._memory_size
+            snapshot["disk_bytes"] = self._disk_size
+        hits = snapshot["memory_hits"] + snapshot["disk_hits"]
+        lookups = hits + snapshot["misses"]
+        snapshot["hit_ratio"] = round(hits / lookups, 4) if lookups else 0.0
+        return snapshot
+
+
+_cache: Optional[TTSCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> TTSCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTSCache()
+    return _cache
+
+
+def get(key: str) -> Optional[Tuple[bytes, str]]:
+    return get_cache().get(key)
+
+
+def put(key: str, data: bytes, mime_type: str) -> None:
+    get_cache().put(key, data, mime_type)
+
+
+async def aget(key: str) -> Optional[Tuple[bytes, str]]:
+    # Disk reads stay off the event loop.
+    return await asyncio.to_thread(get, key)
+
+
+async def aput(key: str, data: bytes, mime_type: str) -> None:
+    # Disk writes and eviction (an os.walk of the cache dir) stay off the event loop.
+    await asyncio.to_thread(put, key, data, mime_type)
+
+
+def stats() -> Dict[str, Any]:
+    return get_cache().stats()
+
+
+def tee(key: str, mime_type: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Pass streamed chunks through and cache the clip once it completes."""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer.extend(chunk)
+        yield chunk
+    if buffer:
+        put(key, bytes(buffer), mime_type)
+
+
+async def atee(key: str, mime_type: str, chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        yield chunk
+    if buffer:
+        await aput(key, bytes(buffer), mime_type)
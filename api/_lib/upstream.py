@@ -0,0 +1,244 @@
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+GEMINI_API_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta/models"
+
+# (connect, read) timeouts in seconds. Generation routes get long read timeouts
+# because large outputs legitimately take a while; connect stays short so a dead
+# upstream fails fast instead of hanging a worker.
+DEFAULT_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "gemini": (5.0, 120.0),
+    "imagen": (5.0, 180.0),
+    "tts": (5.0, 120.0),
+    "default": (5.0, 60.0),
+}
+
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0,
+    "connections": 0,
+    "errors": 0,
+    "async_requests": 0,
+    "http2_responses": 0,
+}
+
+
+def _bump(key: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[key] += amount
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _bump("connections")
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _bump("connections")
+        return super()._new_conn()
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_timeout(route: str, default: Tuple[float, float]) -> Tuple[float, float]:
+    # UPSTREAM_TIMEOUT_GEMINI="5,120" -> (connect, read)
+    raw = os.getenv(f"UPSTREAM_TIMEOUT_{route.upper()}")
+    if not raw:
+        return default
+    try:
+        connect, read = (float(part) for part in raw.split(","))
+        return connect, read
+    except ValueError:
+        return default
+
+
+class UpstreamClient:
+    """Keep-alive HTTP client shared by every route that talks to Gemini.
+
+    Requests go through one pooled session so TCP/TLS handshakes are paid once
+    per connection rather than once per call.
+    """
+
+    def __init__(
+        self,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: Optional[int] = None,
+        timeouts: Optional[Dict[str, Tuple[float, float]]] = None,
+    ):
+        self.pool_connections = pool_connections or _env_int(
+            "UPSTREAM_POOL_CONNECTIONS", 4
+        )
+        self.pool_maxsize = pool_maxsize or _env_int("UPSTREAM_POOL_MAXSIZE", 32)
+        base = dict(DEFAULT_TIMEOUTS)
+        base.update(timeouts or {})
+        self.timeouts = {
+            route: _env_timeout(route, value) for route, value in base.items()
+        }
+
+        # Only connection failures are retried; a POST that reached the
+        # upstream may already have been billed.
+        retries = Retry(
+            connect=_env_int("UPSTREAM_CONNECT_RETRIES", 2),
+            read=0,
+            status=0,
+            redirect=0,
+        )
+        adapter = _PooledAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retries,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def timeout_for(self, route: str) -> Tuple[float, float]:
+        return self.timeouts.get(route) or self.timeouts["default"]
+
+    def post(self, route: str, url: str, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout_for(route))
+        _bump("requests")
+        try:
+            return self.session.post(url, **kwargs)
+        except requests.exceptions.RequestException:
+            _bump("errors")
+            raise
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_client: Optional[UpstreamClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> UpstreamClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UpstreamClient()
+    return _client
+
+
+def post(route: str, url: str, **kwargs: Any) -> requests.Response:
+    return get_client().post(route, url, **kwargs)
+
+
+_async_client = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_async_client():
+    """Non-blocking pooled client for the ASGI proxy.
+
+    Negotiates HTTP/2 when the ``h2`` package is installed, so concurrent calls
+    to the same host multiplex over a single connection. Must be used from one
+    event loop; ``proxy_asgi`` creates and closes it around the app lifespan.
+    """
+    global _async_client
+    if _async_client is None:
+        import httpx
+
+        pool_maxsize = get_client().pool_maxsize
+        # AsyncHTTPTransport retries apply to connection failures only.
+        transport = httpx.AsyncHTTPTransport(
+            http2=_http2_available(),
+            retries=_env_int("UPSTREAM_CONNECT_RETRIES", 2),
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize,
+            ),
+        )
+        _async_client = httpx.AsyncClient(
+            transport=transport,
+            headers={"Content-Type": "application/json"},
+        )
+    return _async_client
+
+
+def async_timeout_for(route: str):
+    import httpx
+
+    connect, read = get_client().timeout_for(route)
+    return httpx.Timeout(read, connect=connect)
+
+
+async def apost(route: str, url: str, **kwargs: Any):
+    kwargs.setdefault("timeout", async_timeout_for(route))
+    _bump("async_requests")
+    try:
+        response = await get_async_client().post(url, **kwargs)
+    except Exception:
+        _bump("errors")
+        raise
+    if response.http_version == "HTTP/2":
+        _bump("http2_responses")
+    return response
+
+
+def astream(route: str, url: str, **kwargs: Any):
+    """Async context manager yielding a streaming POST response."""
+    kwargs.setdefault("timeout", async_timeout_for(route))
+    _bump("async_requests")
+    return get_async_client().stream("POST", url, **kwargs)
+
+
+async def aclose() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def gemini_url(model: str, method: str, api_key: str) -> str:
+    url = f"{GEMINI_API_ENDPOINT}/{model}:{method}?key={api_key}"
+    if method == "streamGenerateContent":
+        url += "&alt=sse"
+    return url
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        snapshot = dict(_stats)
+    reused = max(snapshot["requests"] - snapshot["connections"], 0)
+    snapshot["reused"] = reused
+    snapshot["reuse_ratio"] = (
+        round(reused / snapshot["requests"], 4) if snapshot["requests"] else 0.0
+    )
+    if _client is not None:
+        snapshot["pool_maxsize"] = _client.pool_maxsize
+        snapshot["timeouts"] = {
+            route: list(value) for route, value in _client.timeouts.items()
+        }
+    return snapshot
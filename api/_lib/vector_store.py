@@ -0,0 +1,511 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DTYPES = ("float32", "float16")
+# Rows scored per step of a brute-force query; bounds the float32 scratch copy.
+BLOCK_ROWS = 65536
+# float16 rows are upcast before scoring, which is fastest in cache-sized blocks.
+HALF_BLOCK_ROWS = 2048
+_MIN_CAPACITY = 1024
+# (id, document, metadata)
+_Record = Tuple[str, Optional[str], Dict[str, Any]]
+# Metadata keys that can be used in where filters; kept as in-memory columns.
+FILTER_KEYS = ("character_id", "version", "is_latest")
+_COMPARE = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+
+
+class NumpyCollection:
+    """Vector collection in a memory-mapped matrix with a SQLite sidecar.
+
+    Implements the subset of the ChromaDB ``Collection`` API the memory
+    handlers use (get, query, upsert, update, delete, count, metadata,
+    modify), so it can replace ChromaDB without changing them. Vectors live
+    in ``vectors.<dtype>`` as a row-major float32 or float16 matrix opened
+    with ``np.memmap``; ids, documents and metadata live in SQLite. Opening
+    maps the file without reading it, so cold start does not grow with the
+    corpus.
+
+    Queries are exact: squared L2 distance (ChromaDB's default space) over
+    every row that passes the ``where`` filter, scored in blocks. float16
+    halves disk and page cache but pays an upcast per scored row. Filters are
+    evaluated on in-memory NumPy columns and only support FILTER_KEYS with
+    ``$eq``, ``$ne``, ``$in``, ``$nin``, ``$gt``, ``$gte``, ``$lt``, ``$lte``,
+    ``$and`` and ``$or``; ``character_id`` is compared as a string. Freed rows
+    are reused by later upserts.
+
+    Several processes may share a store: writes pick their rows inside a
+    ``BEGIN IMMEDIATE`` transaction, and commits from other processes are
+    noticed through SQLite's ``data_version`` and the columns are reloaded.
+    """
+
+    def __init__(
+        self, path: str, metadata: Optional[Dict[str, Any]] = None, dtype: Optional[str] = None
+    ):
+        self.path = path
+        self.name = os.path.basename(os.path.normpath(path))
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(
+            os.path.join(path, "records.sqlite3"), check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, document TEXT, "
+            "metadata TEXT NOT NULL, character_id TEXT, version REAL, "
+            "is_latest INTEGER NOT NULL DEFAULT 0, norm REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+        dtype = dtype or os.getenv("MEMORY_VECTOR_DTYPE", "float32").strip().lower()
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+        # Like get_or_create_collection: arguments only apply to a new store.
+        self._db.execute("INSERT OR IGNORE INTO info VALUES ('dtype', ?)", (dtype,))
+        self._db.execute(
+            "INSERT OR IGNORE INTO info VALUES ('metadata', ?)", (json.dumps(metadata or {}),)
+        )
+        self.dtype = np.dtype(self._info("dtype"))
+        self._block_rows = BLOCK_ROWS if self.dtype == np.float32 else HALF_BLOCK_ROWS
+        dimensions = self._info("dimensions")
+        self.dimensions: Optional[int] = int(dimensions) if dimensions else None
+
+        self._matrix: Optional[np.memmap] = None
+        self._capacity = 0
+        self._columns: Optional[Dict[str, Any]] = None
+        self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _info(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def _vector_path(self) -> str:
+        return os.path.join(self.path, f"vectors.{self.dtype.name}")
+
+    def _map(self) -> None:
+        self._matrix = None
+        if not self.dimensions or not os.path.exists(self._vector_path):
+            self._capacity = 0
+            return
+        row_bytes = self.dimensions * self.dtype.itemsize
+        self._capacity = os.path.getsize(self._vector_path) // row_bytes
+        if self._capacity:
+            self._matrix = np.memmap(
+                self._vector_path,
+                dtype=self.dtype,
+                mode="r+",
+                shape=(self._capacity, self.dimensions),
+            )
+
+    def _reserve(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2, _MIN_CAPACITY)
+        if self._matrix is not None:
+            self._matrix.flush()
+        self._matrix = None
+        with open(self._vector_path, "ab") as vector_file:
+            vector_file.truncate(capacity * self.dimensions * self.dtype.itemsize)
+        self._map()
+        self._grow_columns(capacity)
+
+    def _refresh(self) -> None:
+        data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            # Another process committed; its vectors may be past our mapping.
+            self._data_version = data_version
+            dimensions = self._info("dimensions")
+            self.dimensions = int(dimensions) if dimensions else None
+            self._columns = None
+            self._map()
+        elif self._matrix is None and self._capacity == 0:
+            self._map()
+
+    def _empty_columns(self, size: int) -> Dict[str, Any]:
+        return {
+            "alive": np.zeros(size, dtype=bool),
+            "character_id": np.full(size, -1, dtype=np.int32),
+            "version": np.full(size, np.nan),
+            "is_latest": np.zeros(size, dtype=bool),
+            "norm": np.zeros(size, dtype=np.float32),
+        }
+
+    def _grow_columns(self, size: int) -> None:
+        if self._columns is None:
+            return
+        grown = self._empty_columns(size)
+        for key, column in self._columns["arrays"].items():
+            grown[key][: len(column)] = column
+        self._columns["arrays"] = grown
+
+    def _load_columns(self) -> Dict[str, Any]:
+        self._refresh()
+        if self._columns is None:
+            codes: Dict[str, int] = {}
+            arrays = self._empty_columns(self._capacity)
+            rows = self._db.execute(
+                "SELECT row, character_id, version, is_latest, norm FROM records"
+            ).fetchall()
+            if rows:
+                index = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+                arrays["alive"][index] = True
+                arrays["character_id"][index] = [
+                    -1 if row[1] is None else codes.setdefault(row[1], len(codes))
+                    for row in rows
+                ]
+                arrays["version"][index] = [np.nan if row[2] is None else row[2] for row in rows]
+                arrays["is_latest"][index] = [bool(row[3]) for row in rows]
+                arrays["norm"][index] = [row[4] for row in rows]
+            self._columns = {"arrays": arrays, "codes": codes}
+        return self._columns
+
+    def _field_mask(self, key: str, condition: Any) -> np.ndarray:
+        if key not in FILTER_KEYS:
+            raise ValueError(f"NumpyCollection can only filter on {', '.join(FILTER_KEYS)}")
+        columns = self._columns
+        column = columns["arrays"][key]
+
+        def convert(value: Any) -> Any:
+            if key == "character_id":
+                # Stored as TEXT, so 5 and "5" name the same character.
+                return columns["codes"].get(str(value), -2)
+            if key == "is_latest":
+                return bool(value)
+            return float(value)
+
+        conditions = condition if isinstance(condition, dict) else {"$eq": condition}
+        mask = np.ones(len(column), dtype=bool)
+        for operator, value in conditions.items():
+            if operator == "$eq":
+                mask &= column == convert(value)
+            elif operator == "$ne":
+                mask &= column != convert(value)
+            elif operator == "$in":
+                mask &= np.isin(column, [convert(item) for item in value])
+            elif operator == "$nin":
+                mask &= ~np.isin(column, [convert(item) for item in value])
+            elif operator in _COMPARE and key == "version":
+                mask &= _COMPARE[operator](column, convert(value))
+            else:
+                raise ValueError(f"Unsupported filter {operator} on {key}")
+        return mask
+
+    def _where_mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        mask = self._columns["arrays"]["alive"].copy()
+        for key, condition in (where or {}).items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._where_mask(clause)
+            elif key == "$or":
+                matched = np.zeros(len(mask), dtype=bool)
+                for clause in condition:
+                    matched |= self._where_mask(clause)
+                mask &= matched
+            else:
+                mask &= self._field_mask(key, condition)
+        return mask
+
+    def _records(self, rows: Sequence[int]) -> Dict[int, _Record]:
+        found: Dict[int, _Record] = {}
+        rows = [int(row) for row in rows]
+        for start in range(0, len(rows), 500):
+            chunk = rows[start:start + 500]
+            for row, record_id, document, metadata in self._db.execute(
+                "SELECT row, id, document, metadata FROM records WHERE row IN (%s)"
+                % ",".join("?" * len(chunk)),
+                chunk,
+            ):
+                found[row] = (record_id, document, json.loads(metadata))
+        return found
+
+    def _rows_for_ids(self, ids: Sequence[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            found.update(
+                self._db.execute(
+                    "SELECT id, row FROM records WHERE id IN (%s)" % ",".join("?" * len(chunk)),
+                    chunk,
+                ).fetchall()
+            )
+        return found
+
+    def _vectors(self, rows: np.ndarray) -> np.ndarray:
+        if not len(rows):
+            return np.empty((0, self.dimensions or 0), dtype=np.float32)
+        if rows[-1] - rows[0] + 1 == len(rows):
+            # Contiguous rows: a slice of the map, no gather
+            return np.asarray(self._matrix[rows[0]:rows[-1] + 1], dtype=np.float32)
+        return np.asarray(self._matrix[rows], dtype=np.float32)
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._load_columns()["arrays"]["alive"].sum())
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("metadatas", "documents"),
+    ) -> Dict[str, Any]:
+        with self._lock:
+            self._load_columns()
+            mask = self._where_mask(where)
+            if ids is not None:
+                rows = np.asarray(sorted(self._rows_for_ids(ids).values()), dtype=np.int64)
+                rows = rows[mask[rows]] if len(rows) else rows
+            else:
+                rows = np.flatnonzero(mask)
+            start = offset or 0
+            rows = rows[start:start + limit if limit is not None else None]
+
+            records = self._records(rows)
+            return {
+                "ids": [records[row][0] for row in rows],
+                "documents": [records[row][1] for row in rows] if "documents" in include else None,
+                "metadatas": [records[row][2] for row in rows] if "metadatas" in include else None,
+                "embeddings": self._vectors(rows) if "embeddings" in include else None,
+            }
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("metadatas", "documents", "distances"),
+    ) -> Dict[str, Any]:
+        with self._lock:
+            columns = self._load_columns()
+            queries = np.asarray(query_embeddings, dtype=np.float32)
+            if queries.ndim == 1:
+                queries = queries[None, :]
+            if self.dimensions and queries.shape[1] != self.dimensions:
+                raise ValueError(
+                    f"Query dimension {queries.shape[1]} does not match collection "
+                    f"dimension {self.dimensions}"
+                )
+            candidates = np.flatnonzero(self._where_mask(where))
+            k = min(n_results, len(candidates))
+            query_norms = np.einsum("ij,ij->i", queries, queries)
+
+            best_rows = np.empty((len(queries), 0), dtype=np.int64)
+            best_distances = np.empty((len(queries), 0), dtype=np.float32)
+            for start in range(0, len(candidates) if k else 0, self._block_rows):
+                block = candidates[start:start + self._block_rows]
+                distances = (
+                    query_norms[:, None]
+                    + columns["arrays"]["norm"][block][None, :]
+                    - 2.0 * (queries @ self._vectors(block).T)
+                )
+                rows = np.concatenate([best_rows, np.broadcast_to(block, distances.shape)], axis=1)
+                distances = np.concatenate([best_distances, distances], axis=1)
+                if distances.shape[1] > k:
+                    keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                    rows = np.take_along_axis(rows, keep, axis=1)
+                    distances = np.take_along_axis(distances, keep, axis=1)
+                best_rows, best_distances = rows, distances
+            order = np.argsort(best_distances, axis=1, kind="stable")
+            best_rows = np.take_along_axis(best_rows, order, axis=1)
+            best_distances = np.maximum(np.take_along_axis(best_distances, order, axis=1), 0.0)
+
+            records = self._records(np.unique(best_rows))
+            return {
+                "ids": [[records[row][0] for row in rows] for rows in best_rows],
+                "documents": [[records[row][1] for row in rows] for rows in best_rows]
+                if "documents" in include
+                else None,
+                "metadatas": [[records[row][2] for row in rows] for rows in best_rows]
+                if "metadatas" in include
+                else None,
+                "distances": best_distances.tolist() if "distances" in include else None,
+            }
+
+    def _write(self, items: Dict[str, Tuple[np.ndarray, Optional[str], Dict[str, Any]]]) -> None:
+        # BEGIN IMMEDIATE takes SQLite's write lock before any row is picked,
+        # so every process allocates against the latest commit and no other
+        # writer can claim the same rows until this transaction ends.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            columns = self._load_columns()
+            existing = self._rows_for_ids(list(items))
+            high_water = self._db.execute(
+                "SELECT COALESCE(MAX(row) + 1, 0) FROM records"
+            ).fetchone()[0]
+            free = iter(np.flatnonzero(~columns["arrays"]["alive"][:high_water]).tolist())
+            rows: Dict[str, int] = {}
+            for record_id in items:
+                if record_id in existing:
+                    rows[record_id] = existing[record_id]
+                else:
+                    row = next(free, None)
+                    if row is None:
+                        row, high_water = high_water, high_water + 1
+                    rows[record_id] = row
+            self._reserve(max(rows.values()) + 1)
+            columns = self._load_columns()
+
+            index = np.asarray([rows[record_id] for record_id in items], dtype=np.int64)
+            stored = np.stack([vector for vector, _, _ in items.values()]).astype(self.dtype)
+            self._matrix[index] = stored
+            self._matrix.flush()
+            norms = np.einsum("ij,ij->i", stored.astype(np.float32), stored.astype(np.float32))
+
+            records = []
+            for (record_id, (_, document, metadata)), norm in zip(items.items(), norms):
+                version = metadata.get("version")
+                character_id = metadata.get("character_id")
+                records.append(
+                    (
+                        rows[record_id],
+                        record_id,
+                        document,
+                        json.dumps(metadata),
+                        None if character_id is None else str(character_id),
+                        float(version) if isinstance(version, (int, float)) else None,
+                        int(bool(metadata.get("is_latest"))),
+                        float(norm),
+                    )
+                )
+            # Vectors are flushed before the records commit, so a visible record
+            # always has its vector on disk. New ids use a plain INSERT: a row
+            # collision fails the write instead of replacing another record.
+            self._db.executemany(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [record for record in records if record[1] in existing],
+            )
+            self._db.executemany(
+                "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [record for record in records if record[1] not in existing],
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            self._columns = None
+            raise
+
+        arrays = columns["arrays"]
+        codes = columns["codes"]
+        for row, _, _, _, character_id, version, is_latest, norm in records:
+            arrays["alive"][row] = True
+            arrays["character_id"][row] = (
+                -1 if character_id is None else codes.setdefault(character_id, len(codes))
+            )
+            arrays["version"][row] = np.nan if version is None else version
+            arrays["is_latest"][row] = bool(is_latest)
+            arrays["norm"][row] = norm
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Optional[Sequence[Optional[str]]] = None,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("embeddings must be one vector per id")
+        with self._lock:
+            self._refresh()
+            if self.dimensions is None:
+                self.dimensions = int(vectors.shape[1])
+                self._db.execute(
+                    "INSERT OR REPLACE INTO info VALUES ('dimensions', ?)", (str(self.dimensions),)
+                )
+            elif vectors.shape[1] != self.dimensions:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match collection "
+                    f"dimension {self.dimensions}"
+                )
+            items = {}
+            for index, record_id in enumerate(ids):
+                items[record_id] = (
+                    vectors[index],
+                    documents[index] if documents is not None else None,
+                    dict(metadatas[index] or {}) if metadatas is not None else {},
+                )
+            if items:
+                self._write(items)
+
+    def update(
+        self,
+        ids: Sequence[str],
+        embeddings: Optional[Sequence[Sequence[float]]] = None,
+        documents: Optional[Sequence[Optional[str]]] = None,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """Change existing records; metadata is merged and unknown ids skipped, as in ChromaDB."""
+        with self._lock:
+            current = self.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+            by_id = {
+                record_id: (vector, document, metadata)
+                for record_id, vector, document, metadata in zip(
+                    current["ids"],
+                    current["embeddings"],
+                    current["documents"],
+                    current["metadatas"],
+                )
+            }
+            items = {}
+            for index, record_id in enumerate(ids):
+                if record_id not in by_id:
+                    continue
+                vector, document, metadata = by_id[record_id]
+                if embeddings is not None:
+                    vector = np.asarray(embeddings[index], dtype=np.float32)
+                if documents is not None:
+                    document = documents[index]
+                if metadatas is not None and metadatas[index]:
+                    metadata = dict(metadata, **metadatas[index])
+                items[record_id] = (vector, document, metadata)
+            if items:
+                self._write(items)
+
+    def delete(
+        self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None
+    ) -> None:
+        with self._lock:
+            if ids is None and where is None:
+                return
+            rows = self.get(ids=ids, where=where, include=[])["ids"]
+            index = sorted(self._rows_for_ids(rows).values())
+            if not index:
+                return
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM records WHERE row = ?", [(row,) for row in index])
+            self._db.execute("COMMIT")
+            # The matrix rows stay allocated and are reused by later upserts.
+            self._columns["arrays"]["alive"][index] = False
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(self._info("metadata") or "{}")
+
+    def modify(self, name: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> None:
+        if name is not None:
+            raise ValueError("NumpyCollection cannot be renamed")
+        if metadata is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO info VALUES ('metadata', ?)", (json.dumps(metadata),)
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+            self._matrix = None
+            self._columns = None
+            self._db.close()
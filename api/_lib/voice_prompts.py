@@ -0,0 +1,162 @@
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+_VOICE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def voice_id(audio_bytes: bytes, ref_text: str) -> str:
+    digest = hashlib.sha256(audio_bytes)
+    digest.update(b"\0" + ref_text.encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def is_voice_id(value: Any) -> bool:
+    """True for strings shaped like voice_id() output (safe to use in file names)."""
+    return isinstance(value, str) and _VOICE_ID.match(value) is not None
+
+
+def decode_reference(audio_bytes: bytes):
+    import soundfile as sf
+
+    # Qwen accepts (waveform, sr) directly, so the reference never hits disk.
+    wav, sr = sf.read(io.BytesIO(audio_bytes), dtype="float32", always_2d=False)
+    if wav.ndim > 1:
+        wav = np.mean(wav, axis=-1).astype(np.float32)
+    return wav, int(sr)
+
+
+class VoicePromptCache:
+    """Bounded LRU of Qwen voice-clone prompts keyed by voice id.
+
+    A prompt is the speech-tokenizer codes plus speaker embedding extracted
+    from the reference clip; computing it is the expensive part of every
+    voice-clone request. When ``directory`` is set, prompts are also saved as
+    tensors so they survive restarts and can be shared between workers.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, directory: Optional[str] = None):
+        self.max_entries = max_entries or _env_int("QWEN_VOICE_CACHE_SIZE", 32)
+        self.directory = directory if directory is not None else os.getenv("QWEN_VOICE_CACHE_DIR")
+        self._prompts: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._building: Dict[str, threading.Lock] = {}
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _path(self, vid: str) -> str:
+        if not is_voice_id(vid):
+            raise ValueError(f"Invalid voice id: {vid!r}")
+        return os.path.join(self.directory, f"{vid}.pt")
+
+    def _remember(self, vid: str, items: List[Any]) -> None:
+        self._prompts[vid] = items
+        self._prompts.move_to_end(vid)
+        while len(self._prompts) > self.max_entries:
+            self._prompts.popitem(last=False)
+
+    def get(self, model, vid: str) -> Optional[List[Any]]:
+        with self._lock:
+            items = self._prompts.get(vid)
+            if items is not None:
+                self._prompts.move_to_end(vid)
+                self._stats["hits"] += 1
+                return items
+
+        items = self._load(model, vid)
+        with self._lock:
+            if items is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._remember(vid, items)
+        return items
+
+    def get_or_create(self, model, vid: str, audio_bytes: bytes, ref_text: str) -> List[Any]:
+        items = self.get(model, vid)
+        if items is not None:
+            return items
+
+        # Concurrent first requests for the same voice build the prompt once.
+        with self._lock:
+            build_lock = self._building.setdefault(vid, threading.Lock())
+        with build_lock:
+            with self._lock:
+                items = self._prompts.get(vid)
+            if items is None:
+                items = model.create_voice_clone_prompt(
+                    ref_audio=decode_reference(audio_bytes), ref_text=ref_text
+                )
+                with self._lock:
+                    self._remember(vid, items)
+                self._save(vid, items)
+        with self._lock:
+            self._building.pop(vid, None)
+        return items
+
+    def _save(self, vid: str, items: List[Any]) -> None:
+        if not self.directory:
+            return
+        import torch
+
+        fields = [
+            {
+                "ref_code": item.ref_code,
+                "ref_spk_embedding": item.ref_spk_embedding,
+                "x_vector_only_mode": item.x_vector_only_mode,
+                "icl_mode": item.icl_mode,
+                "ref_text": item.ref_text,
+            }
+            for item in items
+        ]
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self._path(vid)}.{os.getpid()}.tmp"
+            torch.save(fields, tmp_path)
+            os.replace(tmp_path, self._path(vid))
+        except OSError:
+            pass
+
+    def _load(self, model, vid: str) -> Optional[List[Any]]:
+        if not self.directory or not os.path.exists(self._path(vid)):
+            return None
+        import torch
+        from qwen_tts.inference.qwen3_tts_model import VoiceClonePromptItem
+
+        try:
+            fields = torch.load(self._path(vid), map_location=model.device, weights_only=True)
+        except (OSError, RuntimeError):
+            return None
+        return [VoiceClonePromptItem(**item) for item in fields]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot["entries"] = len(self._prompts)
+        return snapshot
+
+
+_cache: Optional[VoicePromptCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> VoicePromptCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VoicePromptCache()
+    return _cache
@@ -0,0 +1,66 @@
+import json
+import os
+
+from api._lib import gemini, gemini_batch, response_cache, upstream
+
+
+def execute(api_key, job, prompt):
+    # Runs one batch job; text jobs share the /api/gemini/generate response cache.
+    if job['type'] == 'image':
+        url = upstream.gemini_url(job['model'], 'generateContent', api_key)
+        response = upstream.post('imagen', url, json=gemini.image_payload(prompt))
+        response.raise_for_status()
+        return gemini_batch.image_result(response.json())
+
+    payload = gemini.text_payload(prompt, None)
+
+    def fetch():
+        url = upstream.gemini_url(job['model'], 'generateContent', api_key)
+        response = upstream.post('gemini', url, json=payload)
+        response.raise_for_status()
+        return response.content
+
+    body, _ = response_cache.get_cache().fetch(
+        response_cache.cache_key(job['model'], payload), fetch
+    )
+    return gemini_batch.text_result(json.loads(body))
+
+
+def handler(event, context):
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Gemini API key not configured'})
+        }
+
+    try:
+        data = json.loads(event.get('body') or '{}')
+        jobs, concurrency = gemini_batch.parse_jobs(data)
+    except ValueError as error:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': str(error)})
+        }
+
+    # Serverless responses cannot stream: lines are returned together, in
+    # completion order, once every job has finished.
+    lines = gemini_batch.run(
+        jobs, concurrency, lambda job, prompt: execute(api_key, job, prompt)
+    )
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': gemini_batch.NDJSON_MIME_TYPE,
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': ''.join(json.dumps(line) + '\n' for line in lines)
+    }
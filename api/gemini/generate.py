@@ -2,6 +2,23 @@ import json
 import os
 import requests
 
+from api._lib import gemini, response_cache, upstream
+
+
+def stream_text(api_key, model, payload):
+    # Yields ('chunk', {'text': ...}) per streamGenerateContent chunk with text,
+    # then ('done', {usageMetadata, finishReason, modelVersion}).
+    url = upstream.gemini_url(model, 'streamGenerateContent', api_key)
+    final = {}
+    with upstream.post('gemini', url, json=payload, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            result = gemini.sse_json(line)
+            text = gemini.text_delta(result, final) if result else ''
+            if text:
+                yield 'chunk', {'text': text}
+    yield 'done', final
+
 
 def handler(event, context):
     api_key = os.getenv('GEMINI_API_KEY')
@@ -16,7 +33,17 @@ def handler(event, context):
         }
 
     try:
-        data = json.loads(event.get('body') or '{}')
+        try:
+            data = json.loads(event.get('body') or '{}')
+        except json.JSONDecodeError:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'error': 'Invalid JSON body'})
+            }
         model = data.get('model', 'gemini-3-flash-preview')
         prompt = data.get('prompt')
         contents = data.get('contents')
@@ -31,19 +58,27 @@ def handler(event, context):
                 'body': json.dumps({'error': 'Either prompt or contents is required'})
             }
 
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
+        url = upstream.gemini_url(model, 'generateContent', api_key)
         payload = {'contents': contents if contents else [{'parts': [{'text': prompt}]}]}
 
-        response = requests.post(url, json=payload, headers={'Content-Type': 'application/json'})
-        response.raise_for_status()
+        def fetch():
+            response = upstream.post('gemini', url, json=payload)
+            response.raise_for_status()
+            return response.content
+
+        # Identical concurrent (or, with GEMINI_CACHE_TTL, recent) requests share one call
+        body, cache_status = response_cache.get_cache().fetch(
+            response_cache.cache_key(model, payload), fetch
+        )
 
         return {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
+                'Access-Control-Allow-Origin': '*',
+                response_cache.CACHE_HEADER: cache_status
             },
-            'body': response.text
+            'body': body.decode('utf-8')
         }
     except requests.exceptions.RequestException as error:
         return {
@@ -2,9 +2,21 @@ import json
 import os
 import requests
 
+from api._lib import media, upstream
+
 
 def handler(event, context):
-    data = json.loads(event.get("body") or "{}")
+    try:
+        data = json.loads(event.get("body") or "{}")
+    except json.JSONDecodeError:
+        return {
+            "statusCode": 400,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+            },
+            "body": json.dumps({"error": "Invalid JSON body"}),
+        }
     prompt = data.get("prompt")
     model = data.get("model", "gemini-3.1-flash-image-preview")
 
@@ -30,15 +42,13 @@ def handler(event, context):
         }
 
     try:
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
+        url = upstream.gemini_url(model, "generateContent", api_key)
         payload = {
             "contents": [{"parts": [{"text": prompt}]}],
             "generationConfig": {"responseMimeType": "image/png"},
         }
 
-        response = requests.post(
-            url, json=payload, headers={"Content-Type": "application/json"}
-        )
+        response = upstream.post("imagen", url, json=payload)
         response.raise_for_status()
         result = response.json()
 
@@ -48,6 +58,12 @@ def handler(event, context):
             if parts and "inlineData" in parts[0]:
                 inline_data = parts[0]["inlineData"]
                 if inline_data.get("mimeType", "").startswith("image/"):
+                    if media.event_wants_binary(event, "image"):
+                        # Upstream base64 goes out as-is (serverless) or is
+                        # decoded once (local proxies).
+                        return media.binary_response(
+                            event, inline_data.get("data", ""), inline_data["mimeType"]
+                        )
                     return {
                         "statusCode": 200,
                         "headers": {
@@ -0,0 +1,64 @@
+import json
+
+from api._lib import lore_compaction, memory_clients
+
+
+def handler(event, context):
+    try:
+        try:
+            data = json.loads(event.get("body") or "{}")
+        except json.JSONDecodeError:
+            return {
+                "statusCode": 400,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+                "body": json.dumps({"error": "Invalid JSON body"}),
+            }
+        keep = data.get("keep", lore_compaction.KEEP_VERSIONS)
+        dry_run = bool(data.get("dry_run", False))
+
+        if not isinstance(keep, int) or isinstance(keep, bool) or keep < 1:
+            return {
+                "statusCode": 400,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+                "body": json.dumps({"error": "keep must be a positive integer"}),
+            }
+
+        # Runs in the background by default; progress is in /api/memory/stats
+        if data.get("wait"):
+            result = lore_compaction.compact(
+                memory_clients.get_collection(), keep=keep, dry_run=dry_run
+            )
+            status_code, body = 200, result
+        elif lore_compaction.start(keep=keep, dry_run=dry_run):
+            status_code, body = 202, lore_compaction.status()
+        else:
+            status_code = 409
+            body = dict(lore_compaction.status(), error="Compaction already running")
+
+        return {
+            "statusCode": status_code,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+            },
+            "body": json.dumps(body),
+        }
+
+    except Exception as e:
+        import traceback
+
+        print(traceback.format_exc())
+        return {
+            "statusCode": 500,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+            },
+            "body": json.dumps({"error": str(e)}),
+        }
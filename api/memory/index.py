@@ -1,101 +1,75 @@
 import json
 import os
-from google import genai
-import chromadb
+import time
 from typing import List, Any
 
+from api._lib import embedders, embedding_cache, lore_index, memory_clients
 
-def handler(event, context):
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return {
-            "statusCode": 500,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-            },
-            "body": json.dumps({"error": "GEMINI_API_KEY not set"}),
-        }
 
+def handler(event, context):
     try:
-        data = json.loads(event.get("body") or "{}")
-        character = data.get("character")
-
-        if not character or "id" not in character:
+        try:
+            data = json.loads(event.get("body") or "{}")
+        except json.JSONDecodeError:
             return {
                 "statusCode": 400,
                 "headers": {
                     "Content-Type": "application/json",
                     "Access-Control-Allow-Origin": "*",
                 },
-                "body": json.dumps({"error": "Valid character data required"}),
+                "body": json.dumps({"error": "Invalid JSON body"}),
             }
+        character = data.get("character")
 
-        # Initialize GenAI client for embeddings
-        client_genai = genai.Client(api_key=api_key)
-
-        # Create lore text
-        lore_parts = [
-            f"Name: {character.get('name')}",
-            f"Title: {character.get('title')}",
-            f"Synopsis: {character.get('synopsis')}",
-            f"Personality: {character.get('personality')}",
-            f"Backstory: {character.get('backstory')}",
-        ]
-        lore_text = "\n".join(filter(None, lore_parts))
-
-        # Get embedding using the new SDK
-        embedding_response = client_genai.models.embed_content(
-            model="text-embedding-004", contents=lore_text
-        )
-
-        if not embedding_response.embeddings:
+        if not character or "id" not in character:
             return {
-                "statusCode": 500,
+                "statusCode": 400,
                 "headers": {
                     "Content-Type": "application/json",
                     "Access-Control-Allow-Origin": "*",
                 },
-                "body": json.dumps({"error": "Failed to generate embedding"}),
+                "body": json.dumps({"error": "Valid character data required"}),
             }
 
-        embedding_values = embedding_response.embeddings[0].values
-        if embedding_values is None:
+        # Clients, the collection handle and local models are created once per process
+        started = time.perf_counter()
+        try:
+            collection = memory_clients.get_collection()
+            embedder = memory_clients.get_embedder(os.getenv("GEMINI_API_KEY"))
+        except embedders.EmbedderError as e:
             return {
-                "statusCode": 500,
+                "statusCode": e.status_code,
                 "headers": {
                     "Content-Type": "application/json",
                     "Access-Control-Allow-Origin": "*",
                 },
-                "body": json.dumps({"error": "Embedding values are None"}),
+                "body": json.dumps({"error": str(e)}),
             }
+        timings = {"setup": (time.perf_counter() - started) * 1000}
 
-        # Initialize ChromaDB
-        client_chroma = chromadb.PersistentClient(path="./.memory")
-        collection = client_chroma.get_or_create_collection(name="character_lore")
-
-        # Metadata for filtering
-        metadata = {
-            "character_id": character["id"],
-            "version": character.get("currentVersion", 1),
-            "updatedAt": character.get("updatedAt", ""),
-        }
+        # Split lore into chunks; only changed chunks are embedded and written
+        started = time.perf_counter()
+        plan = lore_index.prepare_characters(embedder, collection, [character])
+        timings["prepare"] = (time.perf_counter() - started) * 1000
 
-        # Index lore
-        collection.upsert(
-            embeddings=[list(embedding_values)],
-            documents=[lore_text],
-            metadatas=[metadata],
-            ids=[f"{character['id']}_v{metadata['version']}"],
-        )
+        started = time.perf_counter()
+        lore_index.apply_plan(collection, plan)
+        timings["write"] = (time.perf_counter() - started) * 1000
+        counts = plan["counts"]
 
         return {
             "statusCode": 200,
             "headers": {
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",
+                "Server-Timing": memory_clients.server_timing(timings),
+                embedding_cache.CACHE_HEADER: (
+                    "HIT" if counts["cached_embeddings"] == counts["embedded"] else "MISS"
+                ),
             },
-            "body": json.dumps({"message": "Character lore indexed successfully"}),
+            "body": json.dumps(
+                {"message": "Character lore indexed successfully", "chunks": counts}
+            ),
         }
 
     except Exception as e:
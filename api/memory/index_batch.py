@@ -0,0 +1,77 @@
+import json
+import os
+
+from api._lib import embedders, lore_index, memory_clients
+
+
+def handler(event, context):
+    try:
+        # Accepts a JSON array, {"characters": [...], "job_id": ...} or NDJSON
+        body = event.get("body") or ""
+        params = event.get("queryStringParameters") or {}
+        job_id = params.get("job_id")
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError:
+            data = None  # NDJSON, parsed line by line while indexing
+        if isinstance(data, dict):
+            job_id = data.get("job_id") or job_id
+
+        try:
+            checkpoint = lore_index.Checkpoint.for_job(job_id) if job_id else None
+        except ValueError as e:
+            return {
+                "statusCode": 400,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+                "body": json.dumps({"error": str(e)}),
+            }
+
+        if data is None:
+            characters = lore_index.iter_characters(body.splitlines(keepends=True))
+        else:
+            characters = lore_index.unwrap_characters(data)
+
+        try:
+            collection = memory_clients.get_collection()
+            embedder = memory_clients.get_embedder(os.getenv("GEMINI_API_KEY"))
+        except embedders.EmbedderError as e:
+            return {
+                "statusCode": e.status_code,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+                "body": json.dumps({"error": str(e)}),
+            }
+
+        summary = lore_index.index_characters(
+            embedder,
+            collection,
+            characters,
+            checkpoint=checkpoint,
+        )
+
+        return {
+            "statusCode": 200,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+            },
+            "body": json.dumps(dict(summary, job_id=job_id)),
+        }
+
+    except Exception as e:
+        import traceback
+
+        print(traceback.format_exc())
+        return {
+            "statusCode": 500,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+            },
+            "body": json.dumps({"error": str(e)}),
+        }
@@ -1,27 +1,28 @@
 import json
 import os
-from google import genai
-import chromadb
+import time
 from typing import List, Any
 
+from api._lib import embedders, embedding_cache, lore_search, memory_clients, search_cache
 
-def handler(event, context):
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return {
-            "statusCode": 500,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-            },
-            "body": json.dumps({"error": "GEMINI_API_KEY not set"}),
-        }
 
+def handler(event, context):
     try:
-        data = json.loads(event.get("body") or "{}")
+        try:
+            data = json.loads(event.get("body") or "{}")
+        except json.JSONDecodeError:
+            return {
+                "statusCode": 400,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+                "body": json.dumps({"error": "Invalid JSON body"}),
+            }
         character_id = data.get("character_id")
         query = data.get("query")
         n_results = data.get("n_results", 5)
+        latest_only = bool(data.get("latest_only", False))
 
         if not query:
             return {
@@ -33,25 +34,54 @@ def handler(event, context):
                 "body": json.dumps({"error": "Query is required"}),
             }
 
-        # Initialize GenAI client for embeddings
-        client_genai = genai.Client(api_key=api_key)
+        # Clients, the collection handle and local models are created once per process
+        started = time.perf_counter()
+        try:
+            collection = memory_clients.get_collection()
+            embedder = memory_clients.get_embedder(os.getenv("GEMINI_API_KEY"))
+        except embedders.EmbedderError as e:
+            return {
+                "statusCode": e.status_code,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+                "body": json.dumps({"error": str(e)}),
+            }
+        timings = {"setup": (time.perf_counter() - started) * 1000}
 
-        # Get query embedding
-        embedding_response = client_genai.models.embed_content(
-            model="text-embedding-004", contents=query
+        # Results stay cached until a write touches this character (any
+        # character for unfiltered searches)
+        started = time.perf_counter()
+        cache = search_cache.get_cache()
+        cache_key = (
+            embedder.name,
+            search_cache.normalize_query(query),
+            character_id,
+            n_results,
+            latest_only,
         )
-
-        if not embedding_response.embeddings:
+        scope = str(character_id) if character_id else search_cache.ALL_CHARACTERS
+        formatted_results, generation = cache.lookup(cache_key, scope)
+        timings["cache"] = (time.perf_counter() - started) * 1000
+        if formatted_results is not None:
             return {
-                "statusCode": 500,
+                "statusCode": 200,
                 "headers": {
                     "Content-Type": "application/json",
                     "Access-Control-Allow-Origin": "*",
+                    "Server-Timing": memory_clients.server_timing(timings),
+                    search_cache.CACHE_HEADER: "HIT",
                 },
-                "body": json.dumps({"error": "Failed to generate embedding"}),
+                "body": json.dumps({"results": formatted_results}),
             }
 
-        embedding_values = embedding_response.embeddings[0].values
+        # Get query embedding
+        started = time.perf_counter()
+        vectors, cached = embedder.embed([query])
+        timings["embed"] = (time.perf_counter() - started) * 1000
+
+        embedding_values = vectors[0]
         if embedding_values is None:
             return {
                 "statusCode": 500,
@@ -59,42 +89,31 @@ def handler(event, context):
                     "Content-Type": "application/json",
                     "Access-Control-Allow-Origin": "*",
                 },
-                "body": json.dumps({"error": "Embedding values are None"}),
+                "body": json.dumps({"error": "Failed to generate embedding"}),
             }
 
-        # Initialize ChromaDB
-        client_chroma = chromadb.PersistentClient(path="./.memory")
-        collection = client_chroma.get_or_create_collection(name="character_lore")
-
         # Prepare search filters
-        where = {"character_id": character_id} if character_id else None
+        where = lore_search.where_filter(character_id, latest_only)
 
         # Search
+        started = time.perf_counter()
         results = collection.query(
             query_embeddings=[list(embedding_values)], n_results=n_results, where=where
         )
+        timings["query"] = (time.perf_counter() - started) * 1000
 
         # Format results
-        formatted_results = []
-        documents = results.get("documents")
-        metadatas = results.get("metadatas")
-        distances = results.get("distances")
-
-        if documents and metadatas:
-            for i in range(len(documents[0])):
-                formatted_results.append(
-                    {
-                        "content": documents[0][i],
-                        "metadata": metadatas[0][i],
-                        "distance": float(distances[0][i]) if distances else None,
-                    }
-                )
+        formatted_results = lore_search.format_results(results)
+        cache.store(cache_key, generation, formatted_results)
 
         return {
             "statusCode": 200,
             "headers": {
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",
+                "Server-Timing": memory_clients.server_timing(timings),
+                embedding_cache.CACHE_HEADER: "HIT" if cached else "MISS",
+                search_cache.CACHE_HEADER: "MISS",
             },
             "body": json.dumps({"results": formatted_results}),
         }
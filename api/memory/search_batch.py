@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+from api._lib import embedders, embedding_cache, lore_search, memory_clients
+
+
+def _error(status_code, message):
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Content-Type": "application/json",
+            "Access-Control-Allow-Origin": "*",
+        },
+        "body": json.dumps({"error": message}),
+    }
+
+
+def handler(event, context):
+    try:
+        try:
+            data = json.loads(event.get("body") or "{}")
+        except json.JSONDecodeError:
+            return {
+                "statusCode": 400,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+                "body": json.dumps({"error": "Invalid JSON body"}),
+            }
+        queries = data.get("queries")
+        latest_only = bool(data.get("latest_only", False))
+
+        if not isinstance(queries, list) or not queries:
+            return _error(400, "queries must be a non-empty list")
+        if len(queries) > lore_search.MAX_BATCH_QUERIES:
+            return _error(400, f"At most {lore_search.MAX_BATCH_QUERIES} queries per request")
+
+        # Normalize items; per-item latest_only overrides the request default
+        items = []
+        for index, item in enumerate(queries):
+            if not isinstance(item, dict) or not item.get("query"):
+                return _error(400, f"queries[{index}]: query is required")
+            n_results = item.get("n_results", 5)
+            if not isinstance(n_results, int) or isinstance(n_results, bool) or n_results < 1:
+                return _error(400, f"queries[{index}]: n_results must be a positive integer")
+            items.append(
+                {
+                    "query": item["query"],
+                    "character_id": item.get("character_id"),
+                    "n_results": n_results,
+                    "latest_only": bool(item.get("latest_only", latest_only)),
+                }
+            )
+
+        started = time.perf_counter()
+        try:
+            collection = memory_clients.get_collection()
+            embedder = memory_clients.get_embedder(os.getenv("GEMINI_API_KEY"))
+        except embedders.EmbedderError as e:
+            return _error(e.status_code, str(e))
+        timings = {"setup": (time.perf_counter() - started) * 1000}
+
+        # All query embeddings in one batch (minus cache hits)
+        started = time.perf_counter()
+        vectors, cached = embedder.embed([item["query"] for item in items])
+        timings["embed"] = (time.perf_counter() - started) * 1000
+        if any(vector is None for vector in vectors):
+            return _error(500, "Failed to generate embedding")
+
+        started = time.perf_counter()
+        results, query_count = lore_search.search_many(collection, items, vectors)
+        timings["query"] = (time.perf_counter() - started) * 1000
+
+        return {
+            "statusCode": 200,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+                "Server-Timing": memory_clients.server_timing(timings),
+                embedding_cache.CACHE_HEADER: "HIT" if cached == len(items) else "MISS",
+            },
+            "body": json.dumps(
+                {
+                    "results": [
+                        {"query": item["query"], "results": matches}
+                        for item, matches in zip(items, results)
+                    ],
+                    "collection_queries": query_count,
+                }
+            ),
+        }
+
+    except Exception as e:
+        import traceback
+
+        print(traceback.format_exc())
+        return _error(500, str(e))
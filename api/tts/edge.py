@@ -2,34 +2,89 @@ import asyncio
 import base64
 import json
 import os
-import tempfile
 from edge_tts import Communicate
 
+from api._lib import longtext, media, tts_cache
 
-async def generate_speech_async(text, voice, rate, pitch, volume):
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmpfile:
-        filepath = tmpfile.name
+EDGE_MIME_TYPE = 'audio/mpeg'
 
+# Upper bound on the synthesized audio held in memory for one request; in
+# long-text mode it applies to the stitched clip, not to each segment.
+EDGE_TTS_MAX_BYTES = int(os.getenv('EDGE_TTS_MAX_BYTES', 20 * 1024 * 1024))
+
+
+async def stream_speech(text, voice, rate, pitch, volume):
     communicate = Communicate(text, voice, rate=rate, pitch=pitch, volume=volume)
-    await communicate.save(filepath)
+    async for chunk in communicate.stream():
+        if chunk['type'] == 'audio':
+            yield chunk['data']
+
+
+async def synthesize_speech(text, voice, rate, pitch, volume, budget=None):
+    # Collect the streamed MP3 chunks in memory instead of round-tripping
+    # through a temp file.
+    budget = budget or longtext.ByteBudget(EDGE_TTS_MAX_BYTES)
+    buffer = bytearray()
+    async for data in stream_speech(text, voice, rate, pitch, volume):
+        budget.take(len(data))
+        buffer.extend(data)
+    return bytes(buffer)
+
+
+async def synthesize_segmented(text, voice, rate, pitch, volume):
+    # Long-text mode: sentences are synthesized concurrently and the MP3
+    # segments stitched back together, all counted against one byte budget.
+    budget = longtext.ByteBudget(EDGE_TTS_MAX_BYTES)
+
+    async def synthesize_segment(segment):
+        return await synthesize_speech(segment, voice, rate, pitch, volume, budget)
+
+    clips, timings = await longtext.gather_bounded(
+        synthesize_segment, longtext.split_sentences(text)
+    )
+    return longtext.stitch_audio(clips, EDGE_MIME_TYPE), timings
+
+
+def speech_cache_key(text, voice, rate, pitch, volume, segmented=False):
+    provider = 'edge+segments' if segmented else 'edge'
+    return tts_cache.cache_key(provider, text, voice=voice, rate=rate, pitch=pitch, volume=volume)
 
-    with open(filepath, 'rb') as audio_file:
-        audio_content = base64.b64encode(audio_file.read()).decode('utf-8')
 
-    os.remove(filepath)
-    return audio_content
+async def synthesize_cached(text, voice, rate, pitch, volume, segmented=False):
+    # Returns (audio bytes, cache status, per-segment timings).
+    key = speech_cache_key(text, voice, rate, pitch, volume, segmented)
+    cached = await tts_cache.aget(key)
+    if cached:
+        return cached[0], 'HIT', []
+    if segmented:
+        audio_bytes, timings = await synthesize_segmented(text, voice, rate, pitch, volume)
+    else:
+        audio_bytes, timings = await synthesize_speech(text, voice, rate, pitch, volume), []
+    await tts_cache.aput(key, audio_bytes, EDGE_MIME_TYPE)
+    return audio_bytes, 'MISS', timings
 
 
 def handler(event, context):
     try:
-        data = json.loads(event.get('body') or '{}')
+        try:
+            data = json.loads(event.get('body') or '{}')
+        except json.JSONDecodeError:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'error': 'Invalid JSON body'})
+            }
         text = data.get('text')
         voice = data.get('voice', 'en-US-GuyNeural')
         rate = data.get('rate', '+0%')
         pitch = data.get('pitch', '+0Hz')
         volume = data.get('volume', '+0%')
+        segmented = bool(data.get('segmented'))
 
-        if not text:
+        if not longtext.is_speakable(text):
             return {
                 'statusCode': 400,
                 'headers': {
@@ -39,15 +94,28 @@ def handler(event, context):
                 'body': json.dumps({'error': 'Text is required'})
             }
 
-        audio_content = asyncio.run(generate_speech_async(text, voice, rate, pitch, volume))
+        audio_bytes, cache_status, timings = asyncio.run(
+            synthesize_cached(text, voice, rate, pitch, volume, segmented)
+        )
+        if media.event_wants_binary(event, 'audio'):
+            return media.binary_response(
+                event, audio_bytes, EDGE_MIME_TYPE, {tts_cache.CACHE_HEADER: cache_status}
+            )
+        result = {
+            'audioContent': base64.b64encode(audio_bytes).decode('utf-8'),
+            'mimeType': 'audio/mp3'
+        }
+        if segmented:
+            result['segments'] = timings
 
         return {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
+                'Access-Control-Allow-Origin': '*',
+                tts_cache.CACHE_HEADER: cache_status
             },
-            'body': json.dumps({'audioContent': audio_content, 'mimeType': 'audio/mp3'})
+            'body': json.dumps(result)
         }
     except Exception as error:
         return {
@@ -1,7 +1,71 @@
+import base64
 import json
 import os
 import requests
 
+from api._lib import gemini, longtext, media, tts_cache, upstream
+
+
+def synthesize_speech(api_key, text, voice_name):
+    # Returns (audio bytes, mimeType), or None when the response has no audio.
+    url = upstream.gemini_url(gemini.TTS_MODEL, "generateContent", api_key)
+    response = upstream.post("tts", url, json=gemini.speech_payload(text, voice_name))
+    response.raise_for_status()
+    inline_data = gemini.first_inline_data(response.json())
+    if not inline_data:
+        return None
+    return (
+        base64.b64decode(inline_data.get("data", "")),
+        inline_data.get("mimeType", "audio/mpeg"),
+    )
+
+
+def synthesize_segmented(api_key, text, voice_name):
+    # Long-text mode: sentences are synthesized concurrently on the pooled
+    # client and the segments stitched into one clip.
+    results, timings = longtext.map_bounded(
+        lambda segment: synthesize_speech(api_key, segment, voice_name),
+        longtext.split_sentences(text),
+    )
+    if not results or any(result is None for result in results):
+        return None, timings
+    mime_type = results[0][1]
+    clips = [audio for audio, _ in results]
+    return (longtext.stitch_audio(clips, mime_type), mime_type), timings
+
+
+def synthesize_cached(api_key, text, voice_name, segmented=False):
+    # Returns ((audio bytes, mimeType) or None, cache status, segment timings).
+    provider = "google+segments" if segmented else "google"
+    key = tts_cache.cache_key(provider, text, voice=voice_name)
+    cached = tts_cache.get(key)
+    if cached:
+        return cached, "HIT", []
+    if segmented:
+        result, timings = synthesize_segmented(api_key, text, voice_name)
+    else:
+        result, timings = synthesize_speech(api_key, text, voice_name), []
+    if result is not None:
+        tts_cache.put(key, *result)
+    return result, "MISS", timings
+
+
+def stream_speech(api_key, text, voice_name):
+    # Yields (mimeType, audio bytes) per streamGenerateContent chunk.
+    url = upstream.gemini_url(gemini.TTS_MODEL, "streamGenerateContent", api_key)
+    with upstream.post(
+        "tts", url, json=gemini.speech_payload(text, voice_name), stream=True
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            event = gemini.sse_json(line)
+            inline_data = gemini.first_inline_data(event) if event else None
+            if inline_data and inline_data.get("data"):
+                yield (
+                    inline_data.get("mimeType", "audio/mpeg"),
+                    base64.b64decode(inline_data["data"]),
+                )
+
 
 def handler(event, context):
     api_key = os.getenv("GOOGLE_TTS_API_KEY") or os.getenv("GEMINI_API_KEY")
@@ -16,11 +80,22 @@ def handler(event, context):
         }
 
     try:
-        data = json.loads(event.get("body") or "{}")
+        try:
+            data = json.loads(event.get("body") or "{}")
+        except json.JSONDecodeError:
+            return {
+                "statusCode": 400,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+                "body": json.dumps({"error": "Invalid JSON body"}),
+            }
         text = data.get("text")
         voice_name = data.get("voice_name", "Kore")
+        segmented = bool(data.get("segmented"))
 
-        if not text:
+        if not longtext.is_speakable(text):
             return {
                 "statusCode": 400,
                 "headers": {
@@ -30,51 +105,39 @@ def handler(event, context):
                 "body": json.dumps({"error": "Text is required"}),
             }
 
-        model = "gemini-2.5-flash-preview-tts"
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-        payload = {
-            "contents": [{"parts": [{"text": text}]}],
-            "generationConfig": {
-                "responseModalities": ["AUDIO"],
-                "speechConfig": {
-                    "voiceConfig": {"prebuiltVoiceConfig": {"voiceName": voice_name}}
+        result, cache_status, timings = synthesize_cached(
+            api_key, text, voice_name, segmented
+        )
+        if result is None:
+            return {
+                "statusCode": 500,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
                 },
-            },
-        }
+                "body": json.dumps({"error": "No audio content in response"}),
+            }
 
-        response = requests.post(
-            url, json=payload, headers={"Content-Type": "application/json"}
-        )
-        response.raise_for_status()
-        result = response.json()
-
-        candidates = result.get("candidates", [])
-        if candidates:
-            parts = candidates[0].get("content", {}).get("parts", [])
-            if parts and "inlineData" in parts[0]:
-                return {
-                    "statusCode": 200,
-                    "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                    },
-                    "body": json.dumps(
-                        {
-                            "audioContent": parts[0]["inlineData"].get("data"),
-                            "mimeType": parts[0]["inlineData"].get(
-                                "mimeType", "audio/mpeg"
-                            ),
-                        }
-                    ),
-                }
+        audio, mime_type = result
+        if media.event_wants_binary(event, "audio"):
+            return media.binary_response(
+                event, audio, mime_type, {tts_cache.CACHE_HEADER: cache_status}
+            )
+        body = {
+            "audioContent": base64.b64encode(audio).decode("utf-8"),
+            "mimeType": mime_type,
+        }
+        if segmented:
+            body["segments"] = timings
 
         return {
-            "statusCode": 500,
+            "statusCode": 200,
             "headers": {
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",
+                tts_cache.CACHE_HEADER: cache_status,
             },
-            "body": json.dumps({"error": "No audio content in response"}),
+            "body": json.dumps(body),
         }
     except requests.exceptions.RequestException as error:
         return {
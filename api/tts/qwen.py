@@ -1,42 +1,178 @@
 import json
 import os
 import base64
-import torch
-import soundfile as sf
 import io
-import tempfile
-from qwen_tts import Qwen3TTSModel
+import threading
+import time
+
+from api._lib import media, qwen_profile, tts_cache, voice_prompts
+from api._lib.qwen_batcher import BatchScheduler
+from api._lib.qwen_pool import WorkerPool
 
 # Global model variable for potential reuse in persistent environments
 _model = None
+_model_lock = threading.Lock()
+# Read on first use, after the entry point has loaded .env
+_profile = None
+# torch's thread count before get_model changes it
+_default_threads = None
+_load_info = {"device": None, "load_ms": None, "warmup_ms": None}
+_scheduler = None
+_scheduler_lock = threading.Lock()
+# Set by start_warmup when it forks the worker pool at startup
+_pool_thread = None
+
+
+def _settings():
+    global _profile
+    if _profile is None:
+        _profile = qwen_profile.settings()
+    return _profile
+
+
+def _pool_size():
+    workers = max(0, _settings()["workers"])
+    if not workers:
+        return 0
+    import torch
+
+    # Forking after CUDA initialization is unsupported; the pool is CPU-only.
+    return 0 if torch.cuda.is_available() else workers
 
 
 def get_model():
-    global _model
+    global _model, _default_threads
     if _model is None:
-        model_id = os.getenv("QWEN_TTS_MODEL_ID", "Qwen/Qwen3-TTS-12Hz-0.6B-Base")
-        # Use 0.6B by default for lower memory usage in serverless/small environments
-        # Use CPU if CUDA is not available
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        dtype = torch.bfloat16 if torch.cuda.is_available() else torch.float32
-
-        _model = Qwen3TTSModel.from_pretrained(
-            model_id,
-            device_map=device,
-            dtype=dtype,
-        )
+        with _model_lock:
+            if _model is None:
+                # The model stack is imported on first use so the proxies (and
+                # their tests) start without it.
+                import torch
+                from qwen_tts import Qwen3TTSModel
+
+                model_id = os.getenv("QWEN_TTS_MODEL_ID", "Qwen/Qwen3-TTS-12Hz-0.6B-Base")
+                # Use 0.6B by default for lower memory usage in serverless/small environments
+                # Use CPU if CUDA is not available
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                dtype = torch.bfloat16 if torch.cuda.is_available() else torch.float32
+
+                started = time.perf_counter()
+                _default_threads = torch.get_num_threads()
+                if _pool_thread is not None:
+                    # Keep OpenMP's thread pool from starting before the workers fork.
+                    torch.set_num_threads(1)
+                else:
+                    qwen_profile.configure_threads(_settings())
+                model = Qwen3TTSModel.from_pretrained(
+                    model_id,
+                    device_map=device,
+                    dtype=dtype,
+                )
+                qwen_profile.optimize(model, _settings(), device)
+                _load_info["device"] = device
+                _load_info["load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                _model = model
     return _model
 
 
+def _generate_batch(texts, languages, prompt_items):
+    model = get_model()
+    with qwen_profile.inference_context(_settings()):
+        return model.generate_voice_clone(
+            text=texts,
+            language=languages,
+            voice_clone_prompt=prompt_items,
+        )
+
+
+def _start_pool():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            import torch
+
+            get_model()
+            _scheduler = WorkerPool(
+                _generate_batch,
+                _pool_size(),
+                warmup=warmup if qwen_profile.env_flag("QWEN_WARMUP") else None,
+            )
+            # The parent still builds voice prompts; give it its threads back.
+            torch.set_num_threads(_settings()["threads"] or _default_threads)
+
+
+def get_scheduler():
+    """The worker pool started by start_warmup, else an in-process BatchScheduler.
+
+    Requests never fork: forking a threaded server from a request thread can
+    copy locks held by other threads (torch, OpenMP) into the workers and
+    deadlock them. A request that arrives while the pool is starting waits
+    for it.
+    """
+    global _scheduler
+    if _pool_thread is not None:
+        _pool_thread.join()
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = BatchScheduler(_generate_batch)
+    return _scheduler
+
+
+def warmup():
+    """Load the model and run one dummy generation before traffic arrives."""
+    _load_info["warmup_ms"] = qwen_profile.warmup(get_model(), _settings())
+
+
+def start_warmup():
+    """Preload on a background thread; call once at server startup.
+
+    With QWEN_TTS_WORKERS set this loads the model and forks the worker pool
+    (each worker warms itself up), the only place the pool is started;
+    otherwise it warms up in-process when QWEN_WARMUP is set.
+    """
+    global _pool_thread
+    if _pool_size():
+        target = _start_pool
+    elif qwen_profile.env_flag("QWEN_WARMUP"):
+        target = warmup
+    else:
+        return None
+    thread = threading.Thread(target=target, name="qwen-warmup", daemon=True)
+    if target is _start_pool:
+        _pool_thread = thread
+    thread.start()
+    return thread
+
+
+def stats():
+    return {
+        "profile": dict(_settings(), **_load_info),
+        "voice_prompts": voice_prompts.get_cache().stats(),
+        "scheduler": _scheduler.stats() if _scheduler is not None else None,
+    }
+
+
 def handler(event, context):
     try:
-        data = json.loads(event.get("body") or "{}")
+        try:
+            data = json.loads(event.get("body") or "{}")
+        except json.JSONDecodeError:
+            return {
+                "statusCode": 400,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+                "body": json.dumps({"error": "Invalid JSON body"}),
+            }
         text = data.get("text")
         ref_audio_b64 = data.get("ref_audio")  # Base64 string
         ref_text = data.get("ref_text")
+        requested_voice_id = data.get("voice_id")
         language = data.get("language", "English")
 
-        if not text or not ref_audio_b64 or not ref_text:
+        if not text or not (requested_voice_id or (ref_audio_b64 and ref_text)):
             return {
                 "statusCode": 400,
                 "headers": {
@@ -44,40 +180,104 @@ def handler(event, context):
                     "Access-Control-Allow-Origin": "*",
                 },
                 "body": json.dumps(
-                    {"error": "text, ref_audio (base64), and ref_text are required"}
+                    {
+                        "error": "text and either voice_id or ref_audio (base64) and ref_text are required"
+                    }
                 ),
             }
 
-        # Decode reference audio
-        audio_bytes = base64.b64decode(ref_audio_b64.split(",")[-1])
+        if ref_audio_b64 and ref_text:
+            # Decode reference audio
+            audio_bytes = base64.b64decode(ref_audio_b64.split(",")[-1])
+            vid = voice_prompts.voice_id(audio_bytes, ref_text)
+        elif voice_prompts.is_voice_id(requested_voice_id):
+            audio_bytes = None
+            vid = requested_voice_id
+        else:
+            # The id names a file under QWEN_VOICE_CACHE_DIR; never pass arbitrary paths on.
+            return {
+                "statusCode": 400,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+                "body": json.dumps({"error": "Invalid voice_id"}),
+            }
+
+        key = tts_cache.cache_key("qwen", text, language=language, reference=vid)
+        binary = media.event_wants_binary(event, "audio")
+        cached = tts_cache.get(key)
+        if cached and binary:
+            return media.binary_response(
+                event,
+                cached[0],
+                "audio/wav",
+                {tts_cache.CACHE_HEADER: "HIT", media.VOICE_ID_HEADER: vid},
+            )
+        if cached:
+            return {
+                "statusCode": 200,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                    tts_cache.CACHE_HEADER: "HIT",
+                },
+                "body": json.dumps(
+                    {
+                        "audioContent": base64.b64encode(cached[0]).decode("utf-8"),
+                        "mimeType": "audio/wav",
+                        "voiceId": vid,
+                    }
+                ),
+            }
 
-        # Load audio into memory
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=True) as tmp:
-            tmp.write(audio_bytes)
-            tmp.flush()
+        model = get_model()
+        prompts = voice_prompts.get_cache()
+        if audio_bytes is not None:
+            prompt = prompts.get_or_create(model, vid, audio_bytes, ref_text)
+        else:
+            prompt = prompts.get(model, vid)
+            if prompt is None:
+                return {
+                    "statusCode": 404,
+                    "headers": {
+                        "Content-Type": "application/json",
+                        "Access-Control-Allow-Origin": "*",
+                    },
+                    "body": json.dumps(
+                        {"error": "Unknown voice_id; resend ref_audio and ref_text"}
+                    ),
+                }
 
-            model = get_model()
+        # Generate cloned voice; concurrent requests share one batched call
+        wav, sr = get_scheduler().submit(text, language, prompt)
 
-            # Generate cloned voice
-            wavs, sr = model.generate_voice_clone(
-                text=text,
-                language=language,
-                ref_audio=tmp.name,
-                ref_text=ref_text,
-            )
+        import soundfile as sf
 
-        # Convert output to base64
+        # One copy out of the soundfile buffer, shared by the cache and the response
         out_buf = io.BytesIO()
-        sf.write(out_buf, wavs[0], sr, format="WAV")
-        out_b64 = base64.b64encode(out_buf.getvalue()).decode("utf-8")
+        sf.write(out_buf, wav, sr, format="WAV")
+        wav_bytes = out_buf.getvalue()
+        tts_cache.put(key, wav_bytes, "audio/wav")
+        if binary:
+            return media.binary_response(
+                event,
+                wav_bytes,
+                "audio/wav",
+                {tts_cache.CACHE_HEADER: "MISS", media.VOICE_ID_HEADER: vid},
+            )
+        out_b64 = base64.b64encode(wav_bytes).decode("utf-8")
 
         return {
             "statusCode": 200,
             "headers": {
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",
+                tts_cache.CACHE_HEADER: "MISS",
             },
-            "body": json.dumps({"audioContent": out_b64, "mimeType": "audio/wav"}),
+            "body": json.dumps(
+                {"audioContent": out_b64, "mimeType": "audio/wav", "voiceId": vid}
+            ),
         }
 
     except Exception as e:
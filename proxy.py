@@ -1,220 +1,283 @@
-import asyncio
-import base64
+import itertools
 import os
-import tempfile
 import json
 
-import edge_tts
 import requests
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 
+# Read .env before importing api.*: several modules read settings at import time.
 load_dotenv()
 
+from api._lib import (  # noqa: E402
+    embedding_cache,
+    gemini,
+    gemini_batch,
+    handler_adapter,
+    longtext,
+    lore_compaction,
+    media,
+    memory_clients,
+    response_cache,
+    search_cache,
+    tts_cache,
+    upstream,
+)
+from api._lib.streaming import iterate_in_thread  # noqa: E402
+from api.gemini.batch import execute as execute_batch_job  # noqa: E402
+from api.gemini.generate import (  # noqa: E402
+    handler as gemini_generate_handler,
+    stream_text as stream_gemini_text,
+)
+from api.imagen.generate import handler as imagen_handler  # noqa: E402
+from api.tts.edge import (  # noqa: E402
+    EDGE_MIME_TYPE,
+    handler as edge_tts_handler,
+    speech_cache_key as edge_speech_cache_key,
+    stream_speech as stream_edge_speech,
+)
+from api.tts.google import (  # noqa: E402
+    handler as google_tts_handler,
+    stream_speech as stream_google_speech,
+)
+
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=media.EXPOSE_HEADERS)
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GOOGLE_TTS_API_KEY = os.getenv("GOOGLE_TTS_API_KEY") or GEMINI_API_KEY
-GEMINI_API_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta/models"
+
+
+def _serve(handler):
+    # Run a serverless handler on this request; its body and headers go out
+    # unchanged, without a json.loads/jsonify round trip.
+    event = handler_adapter.make_event(request.get_data(), request.headers, request.args)
+    body, status, headers = handler_adapter.response_parts(handler(event, None))
+    return Response(body, status, headers=headers)
 
 
 @app.route("/api/gemini/generate", methods=["POST"])
 def gemini_generate():
+    return _serve(gemini_generate_handler)
+
+
+@app.route("/api/gemini/stream", methods=["POST"])
+def gemini_stream():
     if not GEMINI_API_KEY:
         return jsonify({"error": "Gemini API key not configured"}), 500
 
+    data = request.get_json() or {}
+    model = data.get("model", gemini.DEFAULT_TEXT_MODEL)
+    prompt = data.get("prompt")
+    contents = data.get("contents")
+
+    if not prompt and not contents:
+        return jsonify({"error": "Either prompt or contents is required"}), 400
+
+    # Pull the first event before committing to a 200 so upstream failures
+    # still surface as a JSON error.
+    events = stream_gemini_text(GEMINI_API_KEY, model, gemini.text_payload(prompt, contents))
     try:
-        data = request.get_json() or {}
-        model = data.get("model", "gemini-3-flash-preview")
-        prompt = data.get("prompt")
-        contents = data.get("contents")
-
-        if not prompt and not contents:
-            return jsonify({"error": "Either prompt or contents is required"}), 400
-
-        payload = {
-            "contents": contents if contents else [{"parts": [{"text": prompt}]}]
-        }
-        response = requests.post(
-            f"{GEMINI_API_ENDPOINT}/{model}:generateContent?key={GEMINI_API_KEY}",
-            json=payload,
-            headers={"Content-Type": "application/json"},
-        )
-        response.raise_for_status()
-        return jsonify(response.json()), response.status_code
+        first = next(events)
     except requests.exceptions.RequestException as error:
         return jsonify({"error": f"Gemini API error: {str(error)}"}), 500
 
+    def body():
+        try:
+            for name, payload in itertools.chain([first], events):
+                yield gemini.sse_event(name, payload)
+        except requests.exceptions.RequestException as error:
+            yield gemini.sse_event("error", {"error": f"Gemini API error: {str(error)}"})
+
+    response = Response(body(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
-@app.route("/api/imagen/generate", methods=["POST"])
-def imagen_generate():
-    data = request.get_json() or {}
-    prompt = data.get("prompt")
-    model = data.get("model", "gemini-3.1-flash-image-preview")
 
-    if not prompt:
-        return jsonify({"error": "Prompt is required"}), 400
+@app.route("/api/gemini/batch", methods=["POST"])
+def gemini_batch_generate():
     if not GEMINI_API_KEY:
-        return jsonify({"error": "GEMINI_API_KEY not set"}), 500
+        return jsonify({"error": "Gemini API key not configured"}), 500
 
     try:
-        response = requests.post(
-            f"{GEMINI_API_ENDPOINT}/{model}:generateContent?key={GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            json={
-                "contents": [{"parts": [{"text": prompt}]}],
-                "generationConfig": {"responseMimeType": "image/png"},
-            },
-        )
-        response.raise_for_status()
-        image_data = response.json()
-
-        candidates = image_data.get("candidates", [])
-        if candidates:
-            parts = candidates[0].get("content", {}).get("parts", [])
-            if parts and "inlineData" in parts[0]:
-                inline_data = parts[0]["inlineData"]
-                if inline_data.get("mimeType", "").startswith("image/"):
-                    return (
-                        jsonify(
-                            {
-                                "imageData": inline_data.get("data"),
-                                "mimeType": inline_data.get("mimeType"),
-                            }
-                        ),
-                        200,
-                    )
-
-        return jsonify({"error": "No image data received from API"}), 500
-    except requests.exceptions.RequestException as error:
-        return jsonify({"error": f"Gemini API request error: {str(error)}"}), 500
+        jobs, concurrency = gemini_batch.parse_jobs(request.get_json() or {})
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    # One NDJSON line per job as it completes, then a summary line
+    lines = gemini_batch.run(
+        jobs, concurrency, lambda job, prompt: execute_batch_job(GEMINI_API_KEY, job, prompt)
+    )
+    response = Response(
+        (json.dumps(line) + "\n" for line in lines), mimetype=gemini_batch.NDJSON_MIME_TYPE
+    )
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/api/imagen/generate", methods=["POST"])
+def imagen_generate():
+    return _serve(imagen_handler)
 
 
 @app.route("/api/tts/google", methods=["POST"])
 def google_tts_generate():
+    return _serve(google_tts_handler)
+
+
+@app.route("/api/tts/edge", methods=["POST"])
+def edge_tts_generate():
+    return _serve(edge_tts_handler)
+
+
+def _cached_audio_response(audio, mime_type):
+    response = Response(audio, mimetype=mime_type)
+    response.headers[tts_cache.CACHE_HEADER] = "HIT"
+    return response
+
+
+@app.route("/api/tts/google/stream", methods=["POST"])
+def google_tts_stream():
     if not GOOGLE_TTS_API_KEY:
         return jsonify({"error": "Google TTS API key not configured"}), 500
 
-    try:
-        data = request.get_json() or {}
-        text = data.get("text")
-        voice_name = data.get("voice_name", "Kore")
-
-        if not text:
-            return jsonify({"error": "Text is required"}), 400
-
-        model = "gemini-2.5-flash-preview-tts"
-        payload = {
-            "contents": [{"parts": [{"text": text}]}],
-            "generationConfig": {
-                "responseModalities": ["AUDIO"],
-                "speechConfig": {
-                    "voiceConfig": {"prebuiltVoiceConfig": {"voiceName": voice_name}}
-                },
-            },
-        }
-
-        response = requests.post(
-            f"{GEMINI_API_ENDPOINT}/{model}:generateContent?key={GOOGLE_TTS_API_KEY}",
-            json=payload,
-            headers={"Content-Type": "application/json"},
-        )
-        response.raise_for_status()
-        result = response.json()
-
-        candidates = result.get("candidates", [])
-        if candidates:
-            parts = candidates[0].get("content", {}).get("parts", [])
-            if parts and "inlineData" in parts[0]:
-                inline_data = parts[0]["inlineData"]
-                return jsonify(
-                    {
-                        "audioContent": inline_data.get("data"),
-                        "mimeType": inline_data.get("mimeType", "audio/mpeg"),
-                    }
-                ), 200
+    data = request.get_json() or {}
+    text = data.get("text")
+    voice_name = data.get("voice_name", "Kore")
 
+    if not longtext.is_speakable(text):
+        return jsonify({"error": "Text is required"}), 400
+
+    key = tts_cache.cache_key("google", text, voice=voice_name)
+    cached = tts_cache.get(key)
+    if cached:
+        return _cached_audio_response(*cached)
+
+    # Pull the first chunk before committing to a 200 so upstream failures
+    # still surface as a JSON error.
+    chunks = stream_google_speech(GOOGLE_TTS_API_KEY, text, voice_name)
+    try:
+        mime_type, first = next(chunks)
+    except StopIteration:
         return jsonify({"error": "No audio content in response"}), 500
     except requests.exceptions.RequestException as error:
         return jsonify({"error": f"Google TTS API error: {str(error)}"}), 500
 
+    audio = itertools.chain([first], (data for _, data in chunks))
+    response = Response(tts_cache.tee(key, mime_type, audio), mimetype=mime_type)
+    response.headers[tts_cache.CACHE_HEADER] = "MISS"
+    return response
 
-async def _generate_edge_tts(text, voice, rate, pitch, volume):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmpfile:
-        filepath = tmpfile.name
 
-    communicate = edge_tts.Communicate(
-        text, voice, rate=rate, pitch=pitch, volume=volume
-    )
-    await communicate.save(filepath)
-
-    with open(filepath, "rb") as audio_file:
-        audio_content = base64.b64encode(audio_file.read()).decode("utf-8")
+@app.route("/api/tts/edge/stream", methods=["POST"])
+def edge_tts_stream():
+    data = request.get_json() or {}
+    text = data.get("text")
+    voice = data.get("voice", "en-US-GuyNeural")
+    rate = data.get("rate", "+0%")
+    pitch = data.get("pitch", "+0Hz")
+    volume = data.get("volume", "+0%")
 
-    os.remove(filepath)
-    return audio_content
+    if not longtext.is_speakable(text):
+        return jsonify({"error": "Text is required"}), 400
 
+    key = edge_speech_cache_key(text, voice, rate, pitch, volume)
+    cached = tts_cache.get(key)
+    if cached:
+        return _cached_audio_response(*cached)
 
-@app.route("/api/tts/edge", methods=["POST"])
-def edge_tts_generate():
+    chunks = iterate_in_thread(stream_edge_speech(text, voice, rate, pitch, volume))
     try:
-        data = request.get_json() or {}
-        text = data.get("text")
-        voice = data.get("voice", "en-US-GuyNeural")
-        rate = data.get("rate", "+0%")
-        pitch = data.get("pitch", "+0Hz")
-        volume = data.get("volume", "+0%")
-
-        if not text:
-            return jsonify({"error": "Text is required"}), 400
-
-        audio_content = asyncio.run(
-            _generate_edge_tts(text, voice, rate, pitch, volume)
-        )
-        return jsonify({"audioContent": audio_content, "mimeType": "audio/mp3"}), 200
+        first = next(chunks)
+    except StopIteration:
+        return jsonify({"error": "No audio received from Edge TTS"}), 500
     except Exception as error:
         return jsonify({"error": f"Edge TTS proxy error: {str(error)}"}), 500
 
+    audio = itertools.chain([first], chunks)
+    response = Response(
+        tts_cache.tee(key, EDGE_MIME_TYPE, audio), mimetype=EDGE_MIME_TYPE
+    )
+    response.headers[tts_cache.CACHE_HEADER] = "MISS"
+    return response
+
+
+@app.route("/api/tts/cache/stats", methods=["GET"])
+def tts_cache_stats():
+    return jsonify(tts_cache.stats()), 200
 
-from api.tts.qwen import handler as qwen_handler
+
+from api.tts.qwen import (
+    handler as qwen_handler,
+    start_warmup as start_qwen_warmup,
+    stats as qwen_stats,
+)
+from api.memory.compact import handler as memory_compact_handler
 from api.memory.index import handler as memory_index_handler
+from api.memory.index_batch import handler as memory_index_batch_handler
 from api.memory.search import handler as memory_search_handler
+from api.memory.search_batch import handler as memory_search_batch_handler
+
+
+@app.route("/api/upstream/stats", methods=["GET"])
+def upstream_stats():
+    return jsonify(dict(upstream.stats(), response_cache=response_cache.stats())), 200
 
 
 @app.route("/api/tts/qwen", methods=["POST"])
 def qwen_tts_generate():
-    # Wrap the serverless handler for Flask
-    event = {
-        "body": request.get_data().decode("utf-8"),
-        "headers": dict(request.headers),
-    }
-    result = qwen_handler(event, None)
-    return jsonify(json.loads(result["body"])), result["statusCode"]
+    return _serve(qwen_handler)
+
+
+@app.route("/api/tts/qwen/stats", methods=["GET"])
+def qwen_tts_stats():
+    return jsonify(qwen_stats()), 200
 
 
 @app.route("/api/memory/index", methods=["POST"])
 def memory_index():
-    # Wrap the serverless handler for Flask
-    event = {
-        "body": request.get_data().decode("utf-8"),
-        "headers": dict(request.headers),
-    }
-    result = memory_index_handler(event, None)
-    return jsonify(json.loads(result["body"])), result["statusCode"]
+    return _serve(memory_index_handler)
+
+
+@app.route("/api/memory/index_batch", methods=["POST"])
+def memory_index_batch():
+    return _serve(memory_index_batch_handler)
 
 
 @app.route("/api/memory/search", methods=["POST"])
 def memory_search():
-    # Wrap the serverless handler for Flask
-    event = {
-        "body": request.get_data().decode("utf-8"),
-        "headers": dict(request.headers),
-    }
-    result = memory_search_handler(event, None)
-    return jsonify(json.loads(result["body"])), result["statusCode"]
+    return _serve(memory_search_handler)
+
+
+@app.route("/api/memory/search_batch", methods=["POST"])
+def memory_search_batch():
+    return _serve(memory_search_batch_handler)
+
+
+@app.route("/api/memory/compact", methods=["POST"])
+def memory_compact():
+    return _serve(memory_compact_handler)
+
+
+@app.route("/api/memory/stats", methods=["GET"])
+def memory_stats():
+    return (
+        jsonify(
+            dict(
+                memory_clients.stats(),
+                embedding_cache=embedding_cache.stats(),
+                search_cache=search_cache.stats(),
+                compaction=lore_compaction.status(),
+            )
+        ),
+        200,
+    )
 
 
 if __name__ == "__main__":
+    # The debug reloader re-runs this file in a child; only that one serves.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_qwen_warmup()
     app.run(debug=True, host="0.0.0.0", port=49152)
@@ -0,0 +1,418 @@
+"""Async (ASGI) variant of proxy.py.
+
+Serves the same routes and payloads as the Flask proxy, but on a single
+long-lived event loop: Gemini text generation and the streaming routes go
+through the non-blocking pooled client and Edge TTS is awaited directly
+instead of spinning up a loop per request. Imagen, Google TTS, batch jobs and
+the handlers that are inherently blocking (Qwen inference, ChromaDB) reuse
+the api/* code in the default thread pool so they never stall the loop.
+
+Run with: uvicorn proxy_asgi:app --host 0.0.0.0 --port 49152
+"""
+
+import base64
+import contextlib
+import json
+import os
+
+import httpx
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# Read .env before importing api.*: several modules read settings at import time.
+load_dotenv()
+
+from api._lib import (  # noqa: E402
+    embedding_cache,
+    gemini,
+    gemini_batch,
+    handler_adapter,
+    longtext,
+    lore_compaction,
+    media,
+    memory_clients,
+    response_cache,
+    search_cache,
+    tts_cache,
+    upstream,
+)
+from api.gemini.batch import execute as execute_batch_job  # noqa: E402
+from api.imagen.generate import handler as imagen_handler  # noqa: E402
+from api.memory.compact import handler as memory_compact_handler  # noqa: E402
+from api.memory.index import handler as memory_index_handler  # noqa: E402
+from api.memory.index_batch import handler as memory_index_batch_handler  # noqa: E402
+from api.memory.search import handler as memory_search_handler  # noqa: E402
+from api.memory.search_batch import handler as memory_search_batch_handler  # noqa: E402
+from api.tts.edge import (  # noqa: E402
+    EDGE_MIME_TYPE,
+    speech_cache_key as edge_speech_cache_key,
+    stream_speech as stream_edge_speech,
+    synthesize_cached as synthesize_edge_cached,
+)
+from api.tts.google import handler as google_tts_handler  # noqa: E402
+from api.tts.qwen import (  # noqa: E402
+    handler as qwen_handler,
+    start_warmup as start_qwen_warmup,
+    stats as qwen_stats,
+)
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GOOGLE_TTS_API_KEY = os.getenv("GOOGLE_TTS_API_KEY") or GEMINI_API_KEY
+
+
+class _InvalidJSONBody(ValueError):
+    pass
+
+
+async def _json_body(request: Request) -> dict:
+    body = await request.body()
+    try:
+        return json.loads(body) if body else {}
+    except ValueError as error:
+        raise _InvalidJSONBody(str(error)) from error
+
+
+async def _invalid_json_body(request: Request, error: _InvalidJSONBody) -> Response:
+    # Matches the 400 Flask returns when request.get_json() fails.
+    return JSONResponse({"error": "Invalid JSON body"}, 400)
+
+
+async def gemini_generate(request: Request) -> Response:
+    if not GEMINI_API_KEY:
+        return JSONResponse({"error": "Gemini API key not configured"}, 500)
+
+    try:
+        data = await _json_body(request)
+        model = data.get("model", gemini.DEFAULT_TEXT_MODEL)
+        prompt = data.get("prompt")
+        contents = data.get("contents")
+
+        if not prompt and not contents:
+            return JSONResponse({"error": "Either prompt or contents is required"}, 400)
+
+        payload = gemini.text_payload(prompt, contents)
+
+        async def fetch():
+            response = await upstream.apost(
+                "gemini",
+                upstream.gemini_url(model, "generateContent", GEMINI_API_KEY),
+                json=payload,
+            )
+            response.raise_for_status()
+            return response.content
+
+        # Identical requests in flight share one upstream call
+        body, cache_status = await response_cache.get_cache().afetch(
+            response_cache.cache_key(model, payload), fetch
+        )
+        return Response(
+            body,
+            200,
+            media_type="application/json",
+            headers={response_cache.CACHE_HEADER: cache_status},
+        )
+    except httpx.HTTPError as error:
+        return JSONResponse({"error": f"Gemini API error: {str(error)}"}, 500)
+
+
+async def _gemini_text_events(model, payload):
+    url = upstream.gemini_url(model, "streamGenerateContent", GEMINI_API_KEY)
+    final = {}
+    async with upstream.astream("gemini", url, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            result = gemini.sse_json(line)
+            text = gemini.text_delta(result, final) if result else ""
+            if text:
+                yield "chunk", {"text": text}
+    yield "done", final
+
+
+async def gemini_stream(request: Request) -> Response:
+    if not GEMINI_API_KEY:
+        return JSONResponse({"error": "Gemini API key not configured"}, 500)
+
+    data = await _json_body(request)
+    model = data.get("model", gemini.DEFAULT_TEXT_MODEL)
+    prompt = data.get("prompt")
+    contents = data.get("contents")
+
+    if not prompt and not contents:
+        return JSONResponse({"error": "Either prompt or contents is required"}, 400)
+
+    # Pull the first event before committing to a 200 so upstream failures
+    # still surface as a JSON error.
+    events = _gemini_text_events(model, gemini.text_payload(prompt, contents))
+    try:
+        first = await events.__anext__()
+    except httpx.HTTPError as error:
+        return JSONResponse({"error": f"Gemini API error: {str(error)}"}, 500)
+
+    async def body():
+        try:
+            async for name, payload in _prepend(first, events):
+                yield gemini.sse_event(name, payload)
+        except httpx.HTTPError as error:
+            yield gemini.sse_event("error", {"error": f"Gemini API error: {str(error)}"})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _execute_batch_job(job, prompt):
+    # Jobs block on the pooled sync client; the schedule itself stays on the loop.
+    return await run_in_threadpool(execute_batch_job, GEMINI_API_KEY, job, prompt)
+
+
+async def gemini_batch_generate(request: Request) -> Response:
+    if not GEMINI_API_KEY:
+        return JSONResponse({"error": "Gemini API key not configured"}, 500)
+
+    try:
+        jobs, concurrency = gemini_batch.parse_jobs(await _json_body(request))
+    except ValueError as error:
+        return JSONResponse({"error": str(error)}, 400)
+
+    # One NDJSON line per job as it completes, then a summary line
+    async def body():
+        async for line in gemini_batch.arun(jobs, concurrency, _execute_batch_job):
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(
+        body(),
+        media_type=gemini_batch.NDJSON_MIME_TYPE,
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+
+async def edge_tts_generate(request: Request) -> Response:
+    data = await _json_body(request)
+    try:
+        text = data.get("text")
+        voice = data.get("voice", "en-US-GuyNeural")
+        rate = data.get("rate", "+0%")
+        pitch = data.get("pitch", "+0Hz")
+        volume = data.get("volume", "+0%")
+        segmented = bool(data.get("segmented"))
+
+        if not longtext.is_speakable(text):
+            return JSONResponse({"error": "Text is required"}, 400)
+
+        audio, cache_status, timings = await synthesize_edge_cached(
+            text, voice, rate, pitch, volume, segmented
+        )
+        if media.wants_binary(request.headers.get("accept"), "audio"):
+            return _audio_response(audio, EDGE_MIME_TYPE, cache_status)
+        body = {
+            "audioContent": base64.b64encode(audio).decode("utf-8"),
+            "mimeType": "audio/mp3",
+        }
+        if segmented:
+            body["segments"] = timings
+        return JSONResponse(body, headers={tts_cache.CACHE_HEADER: cache_status})
+    except Exception as error:
+        return JSONResponse({"error": f"Edge TTS proxy error: {str(error)}"}, 500)
+
+
+async def _prepend(first, rest):
+    yield first
+    async for item in rest:
+        yield item
+
+
+def _audio_response(audio, mime_type, cache_status):
+    return Response(audio, media_type=mime_type, headers={tts_cache.CACHE_HEADER: cache_status})
+
+
+def _cached_audio_response(audio, mime_type):
+    return _audio_response(audio, mime_type, "HIT")
+
+
+async def _google_speech_chunks(text, voice_name):
+    url = upstream.gemini_url(gemini.TTS_MODEL, "streamGenerateContent", GOOGLE_TTS_API_KEY)
+    async with upstream.astream(
+        "tts", url, json=gemini.speech_payload(text, voice_name)
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            event = gemini.sse_json(line)
+            inline_data = gemini.first_inline_data(event) if event else None
+            if inline_data and inline_data.get("data"):
+                yield (
+                    inline_data.get("mimeType", "audio/mpeg"),
+                    base64.b64decode(inline_data["data"]),
+                )
+
+
+async def google_tts_stream(request: Request) -> Response:
+    if not GOOGLE_TTS_API_KEY:
+        return JSONResponse({"error": "Google TTS API key not configured"}, 500)
+
+    data = await _json_body(request)
+    text = data.get("text")
+    voice_name = data.get("voice_name", "Kore")
+
+    if not longtext.is_speakable(text):
+        return JSONResponse({"error": "Text is required"}, 400)
+
+    key = tts_cache.cache_key("google", text, voice=voice_name)
+    cached = await tts_cache.aget(key)
+    if cached:
+        return _cached_audio_response(*cached)
+
+    # Pull the first chunk before committing to a 200 so upstream failures
+    # still surface as a JSON error.
+    chunks = _google_speech_chunks(text, voice_name)
+    try:
+        mime_type, first = await chunks.__anext__()
+    except StopAsyncIteration:
+        return JSONResponse({"error": "No audio content in response"}, 500)
+    except httpx.HTTPError as error:
+        return JSONResponse({"error": f"Google TTS API error: {str(error)}"}, 500)
+
+    async def audio():
+        async for _, data in chunks:
+            yield data
+
+    return StreamingResponse(
+        tts_cache.atee(key, mime_type, _prepend(first, audio())),
+        media_type=mime_type,
+        headers={tts_cache.CACHE_HEADER: "MISS"},
+    )
+
+
+async def edge_tts_stream(request: Request) -> Response:
+    data = await _json_body(request)
+    text = data.get("text")
+    voice = data.get("voice", "en-US-GuyNeural")
+    rate = data.get("rate", "+0%")
+    pitch = data.get("pitch", "+0Hz")
+    volume = data.get("volume", "+0%")
+
+    if not longtext.is_speakable(text):
+        return JSONResponse({"error": "Text is required"}, 400)
+
+    key = edge_speech_cache_key(text, voice, rate, pitch, volume)
+    cached = await tts_cache.aget(key)
+    if cached:
+        return _cached_audio_response(*cached)
+
+    chunks = stream_edge_speech(text, voice, rate, pitch, volume)
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        return JSONResponse({"error": "No audio received from Edge TTS"}, 500)
+    except Exception as error:
+        return JSONResponse({"error": f"Edge TTS proxy error: {str(error)}"}, 500)
+
+    return StreamingResponse(
+        tts_cache.atee(key, EDGE_MIME_TYPE, _prepend(first, chunks)),
+        media_type=EDGE_MIME_TYPE,
+        headers={tts_cache.CACHE_HEADER: "MISS"},
+    )
+
+
+def _wrap_handler(handler):
+    # Serverless handlers block (model inference, SQLite), so they run in the
+    # thread pool. Their body and headers go out unchanged (see handler_adapter).
+    async def endpoint(request: Request) -> Response:
+        event = handler_adapter.make_event(
+            await request.body(), request.headers, request.query_params
+        )
+        result = await run_in_threadpool(handler, event, None)
+        body, status, headers = handler_adapter.response_parts(result)
+        return Response(body, status, headers=headers)
+
+    return endpoint
+
+
+async def upstream_stats(request: Request) -> Response:
+    return JSONResponse(dict(upstream.stats(), response_cache=response_cache.stats()))
+
+
+async def tts_cache_stats(request: Request) -> Response:
+    return JSONResponse(tts_cache.stats())
+
+
+async def qwen_tts_stats(request: Request) -> Response:
+    return JSONResponse(qwen_stats())
+
+
+async def memory_stats(request: Request) -> Response:
+    return JSONResponse(
+        dict(
+            memory_clients.stats(),
+            embedding_cache=embedding_cache.stats(),
+            search_cache=search_cache.stats(),
+            compaction=lore_compaction.status(),
+        )
+    )
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    upstream.get_async_client()
+    start_qwen_warmup()
+    yield
+    await upstream.aclose()
+    memory_clients.close()
+    embedding_cache.get_cache().close()
+    search_cache.get_cache().close()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/gemini/generate", gemini_generate, methods=["POST"]),
+        Route("/api/gemini/stream", gemini_stream, methods=["POST"]),
+        Route("/api/gemini/batch", gemini_batch_generate, methods=["POST"]),
+        Route("/api/imagen/generate", _wrap_handler(imagen_handler), methods=["POST"]),
+        Route("/api/tts/google", _wrap_handler(google_tts_handler), methods=["POST"]),
+        Route("/api/tts/edge", edge_tts_generate, methods=["POST"]),
+        Route("/api/tts/google/stream", google_tts_stream, methods=["POST"]),
+        Route("/api/tts/edge/stream", edge_tts_stream, methods=["POST"]),
+        Route("/api/tts/qwen", _wrap_handler(qwen_handler), methods=["POST"]),
+        Route("/api/memory/index", _wrap_handler(memory_index_handler), methods=["POST"]),
+        Route("/api/memory/search", _wrap_handler(memory_search_handler), methods=["POST"]),
+        Route(
+            "/api/memory/index_batch",
+            _wrap_handler(memory_index_batch_handler),
+            methods=["POST"],
+        ),
+        Route(
+            "/api/memory/search_batch",
+            _wrap_handler(memory_search_batch_handler),
+            methods=["POST"],
+        ),
+        Route("/api/memory/compact", _wrap_handler(memory_compact_handler), methods=["POST"]),
+        Route("/api/memory/stats", memory_stats, methods=["GET"]),
+        Route("/api/upstream/stats", upstream_stats, methods=["GET"]),
+        Route("/api/tts/cache/stats", tts_cache_stats, methods=["GET"]),
+        Route("/api/tts/qwen/stats", qwen_tts_stats, methods=["GET"]),
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_methods=["*"],
+            allow_headers=["*"],
+            expose_headers=media.EXPOSE_HEADERS,
+        )
+    ],
+    exception_handlers={_InvalidJSONBody: _invalid_json_body},
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=49152)
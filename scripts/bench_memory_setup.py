@@ -0,0 +1,68 @@
+"""Measure per-request client setup cost of the memory handlers.
+
+"fresh" mirrors the old handlers: a new genai.Client, a new
+chromadb.PersistentClient and get_or_create_collection on every request.
+"shared" goes through api/_lib/memory_clients.py, which creates them once per
+process. No embedding or network call is made; only setup is timed.
+
+    python scripts/bench_memory_setup.py --runs 50 --path /tmp/bench-memory
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chromadb  # noqa: E402
+from google import genai  # noqa: E402
+
+from api._lib import memory_clients  # noqa: E402
+
+API_KEY = os.getenv("GEMINI_API_KEY", "bench-placeholder-key")
+
+
+def setup_fresh(path):
+    genai.Client(api_key=API_KEY)
+    client = chromadb.PersistentClient(path=path)
+    client.get_or_create_collection(name=memory_clients.COLLECTION_NAME)
+
+
+def setup_shared(path):
+    memory_clients.get_genai_client(API_KEY)
+    memory_clients.get_collection()
+
+
+def measure(fn, path, runs):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label, latencies):
+    print(
+        f"{label:<8} first={latencies[0]:8.2f}ms "
+        f"median={statistics.median(latencies):8.3f}ms "
+        f"p95={sorted(latencies)[int(len(latencies) * 0.95) - 1]:8.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--path", default=memory_clients.MEMORY_PATH)
+    args = parser.parse_args()
+
+    memory_clients.MEMORY_PATH = args.path
+    report("fresh", measure(setup_fresh, args.path, args.runs))
+    report("shared", measure(setup_shared, args.path, args.runs))
+    memory_clients.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Compare Qwen3-TTS CPU inference profiles (float32 vs dynamic int8).
+
+Each profile runs in its own subprocess so peak RSS and torch thread
+settings are measured in isolation. Reports load time, warmup time, the
+median real-time factor (synthesis seconds per second of audio; below 1.0 is
+faster than real time) and peak resident memory.
+
+    python scripts/bench_qwen_cpu.py --runs 3 --threads 8
+
+By default the voice is a synthetic x-vector-only reference. Pass a sample to
+benchmark the ICL path used by the app:
+
+    python scripts/bench_qwen_cpu.py --ref-audio sample.wav --ref-text "..."
+
+With --workers, it instead measures throughput of the forked worker pool
+(QWEN_TTS_WORKERS) under concurrent requests, plus the pool's total PSS:
+
+    python scripts/bench_qwen_cpu.py --workers 1,2,4 --requests 16
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEXT = (
+    "Born beneath the ash-grey skies of the northern marches, Kaelen learned "
+    "the smith's trade before she could read."
+)
+PROFILES = {"float32": "", "int8": "int8"}
+
+
+def run_profile(args):
+    from api._lib import qwen_profile, voice_prompts
+    from api.tts import qwen
+
+    started = time.perf_counter()
+    model = qwen.get_model()
+    load_ms = (time.perf_counter() - started) * 1000
+    warmup_ms = qwen_profile.warmup(model, qwen_profile.settings())
+
+    if args.ref_audio:
+        with open(args.ref_audio, "rb") as audio_file:
+            reference = voice_prompts.decode_reference(audio_file.read())
+        prompt = model.create_voice_clone_prompt(ref_audio=reference, ref_text=args.ref_text)
+    else:
+        prompt = model.create_voice_clone_prompt(
+            ref_audio=qwen_profile.synthetic_reference(), x_vector_only_mode=True
+        )
+
+    factors = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        wavs, sr = qwen._generate_batch([args.text], [args.language], prompt)
+        elapsed = time.perf_counter() - started
+        factors.append(elapsed / (len(wavs[0]) / sr))
+
+    print(
+        json.dumps(
+            {
+                "load_ms": round(load_ms, 1),
+                "warmup_ms": warmup_ms,
+                "rtf_median": round(statistics.median(factors), 3),
+                "rtf_min": round(min(factors), 3),
+                # ru_maxrss is reported in kilobytes on Linux.
+                "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            }
+        )
+    )
+
+
+def run_pool(args):
+    from api._lib import qwen_pool, qwen_profile
+    from api.tts import qwen
+
+    pool = qwen.get_scheduler()
+    model = qwen.get_model()
+    prompt = model.create_voice_clone_prompt(
+        ref_audio=qwen_profile.synthetic_reference(), x_vector_only_mode=True
+    )
+    # One request per worker first, so lazy init is not part of the timing.
+    warm = [
+        threading.Thread(target=pool.submit, args=(args.text, args.language, prompt))
+        for _ in range(max(1, qwen._pool_size()))
+    ]
+    for thread in warm:
+        thread.start()
+    for thread in warm:
+        thread.join()
+
+    audio_seconds = []
+
+    def one():
+        wav, sr = pool.submit(args.text, args.language, prompt)
+        audio_seconds.append(len(wav) / sr)
+
+    threads = [threading.Thread(target=one) for _ in range(args.requests)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    # In-process mode has no workers; the parent's PSS is the whole cost.
+    pss = [qwen_pool._pss_mb(os.getpid()), pool.stats().get("workers_pss_mb")]
+    print(
+        json.dumps(
+            {
+                "requests_per_s": round(len(audio_seconds) / elapsed, 3),
+                "audio_s_per_s": round(sum(audio_seconds) / elapsed, 3),
+                "total_pss_mb": round(sum(value for value in pss if value is not None), 1),
+            }
+        )
+    )
+
+
+def bench_pool(args):
+    for workers in [int(value) for value in args.workers.split(",")]:
+        env = dict(os.environ, QWEN_TTS_WORKERS=str(workers), QWEN_WARMUP="0")
+        child_args = ["--requests", str(args.requests), "--text", args.text, "--language", args.language]
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child-pool", *child_args],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            print(f"workers={workers:<3} failed:\n{completed.stderr.strip()}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(
+            f"workers={workers:<3} req/s={result['requests_per_s']:7.3f} "
+            f"audio_s/s={result['audio_s_per_s']:7.3f} total_pss={result['total_pss_mb']:8.1f}MB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--profile", choices=["both", *PROFILES], default="both")
+    parser.add_argument("--text", default=TEXT)
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--ref-audio")
+    parser.add_argument("--ref-text")
+    parser.add_argument("--workers", help="comma-separated pool sizes, e.g. 1,2,4")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child-pool", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.ref_audio and not args.ref_text:
+        parser.error("--ref-audio requires --ref-text")
+    if args.child:
+        run_profile(args)
+        return
+    if args.child_pool:
+        run_pool(args)
+        return
+    if args.workers:
+        bench_pool(args)
+        return
+
+    names = list(PROFILES) if args.profile == "both" else [args.profile]
+    for name in names:
+        env = dict(
+            os.environ,
+            QWEN_TTS_QUANTIZE=PROFILES[name],
+            QWEN_TORCH_THREADS=str(args.threads),
+            QWEN_WARMUP="0",
+        )
+        child_args = ["--runs", str(args.runs), "--text", args.text, "--language", args.language]
+        if args.ref_audio:
+            child_args += ["--ref-audio", args.ref_audio, "--ref-text", args.ref_text]
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", *child_args],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            print(f"{name:<8} failed:\n{completed.stderr.strip()}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(
+            f"{name:<8} load={result['load_ms']:8.0f}ms warmup={result['warmup_ms']:8.0f}ms "
+            f"rtf_median={result['rtf_median']:6.3f} rtf_min={result['rtf_min']:6.3f} "
+            f"peak_rss={result['peak_rss_mb']:8.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
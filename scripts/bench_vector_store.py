@@ -0,0 +1,194 @@
+"""Compare the ChromaDB and memory-mapped NumPy lore vector stores.
+
+Builds the same synthetic corpus (random unit vectors spread over
+--characters characters and three versions each) in every store, then opens
+each one in a fresh subprocess, as a cold serverless handler would, and
+reports open time, first-query time, p50/p99 query latency with no filter
+and with a character + latest-only filter, and resident memory.
+
+    python scripts/bench_vector_store.py --chunks 50000 --queries 200
+    python scripts/bench_vector_store.py --stores numpy-float32,numpy-float16
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STORES = {
+    "chroma": {"MEMORY_VECTOR_STORE": "chroma"},
+    "numpy-float32": {"MEMORY_VECTOR_STORE": "numpy", "MEMORY_VECTOR_DTYPE": "float32"},
+    "numpy-float16": {"MEMORY_VECTOR_STORE": "numpy", "MEMORY_VECTOR_DTYPE": "float16"},
+}
+BATCH = 1000
+
+
+def _vectors(rng, count, dimensions):
+    import numpy as np
+
+    vectors = rng.standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _rss_mb():
+    with open("/proc/self/status", encoding="ascii") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_build(args):
+    import numpy as np
+
+    from api._lib import memory_clients
+
+    rng = np.random.default_rng(0)
+    collection = memory_clients.get_collection()
+    for start in range(0, args.chunks, BATCH):
+        count = min(BATCH, args.chunks - start)
+        ids = [f"chunk-{index}" for index in range(start, start + count)]
+        metadatas = []
+        for index in range(start, start + count):
+            version = index % 3 + 1
+            metadatas.append(
+                {
+                    "character_id": f"c{index // 3 % args.characters}",
+                    "version": version,
+                    "is_latest": version == 3,
+                }
+            )
+        collection.upsert(
+            ids=ids,
+            embeddings=_vectors(rng, count, args.dim).tolist(),
+            documents=[f"Lore chunk {index}" for index in range(start, start + count)],
+            metadatas=metadatas,
+        )
+    memory_clients.close()
+
+
+def run_query(args):
+    import numpy as np
+
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    from api._lib import memory_clients
+
+    collection = memory_clients.get_collection()
+    open_ms = (time.perf_counter() - started) * 1000
+    rss_open = _rss_mb()
+
+    rng = np.random.default_rng(1)
+    queries = _vectors(rng, args.queries, args.dim).tolist()
+
+    started = time.perf_counter()
+    collection.query(query_embeddings=[queries[0]], n_results=10)
+    first_ms = (time.perf_counter() - started) * 1000
+
+    def latencies(where_for):
+        timings = []
+        for index, query in enumerate(queries):
+            started = time.perf_counter()
+            collection.query(query_embeddings=[query], n_results=10, where=where_for(index))
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            "p50": round(timings[len(timings) // 2], 3),
+            "p99": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3),
+        }
+
+    unfiltered = latencies(lambda index: None)
+    filtered = latencies(
+        lambda index: {
+            "$and": [{"character_id": f"c{index % args.characters}"}, {"is_latest": True}]
+        }
+    )
+    print(
+        json.dumps(
+            {
+                "open_ms": round(open_ms, 1),
+                "first_query_ms": round(first_ms, 1),
+                "unfiltered": unfiltered,
+                "filtered": filtered,
+                "open_rss_mb": round(rss_open - rss_before, 1),
+                "rss_mb": round(_rss_mb(), 1),
+                # ru_maxrss is reported in kilobytes on Linux.
+                "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            }
+        )
+    )
+
+
+def _child(mode, store, args):
+    env = dict(os.environ, MEMORY_DB_PATH=os.path.join(args.path, store), **STORES[store])
+    child_args = [
+        "--chunks", str(args.chunks),
+        "--characters", str(args.characters),
+        "--dim", str(args.dim),
+        "--queries", str(args.queries),
+    ]
+    return subprocess.run(
+        [sys.executable, os.path.abspath(__file__), mode, *child_args],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--characters", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--stores", default=",".join(STORES))
+    parser.add_argument("--path", default="/tmp/bench-vector-store")
+    parser.add_argument("--rebuild", action="store_true", help="discard stores built earlier")
+    parser.add_argument("--child-build", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child-query", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_build:
+        run_build(args)
+        return
+    if args.child_query:
+        run_query(args)
+        return
+
+    for store in args.stores.split(","):
+        if store not in STORES:
+            parser.error(f"unknown store {store}; choose from {', '.join(STORES)}")
+        directory = os.path.join(args.path, store)
+        if args.rebuild:
+            shutil.rmtree(directory, ignore_errors=True)
+        if not os.path.isdir(directory):
+            started = time.perf_counter()
+            completed = _child("--child-build", store, args)
+            if completed.returncode != 0:
+                print(f"{store:<14} build failed:\n{completed.stderr.strip()}")
+                continue
+            print(f"{store:<14} built {args.chunks} chunks in {time.perf_counter() - started:.1f}s")
+
+        completed = _child("--child-query", store, args)
+        if completed.returncode != 0:
+            print(f"{store:<14} failed:\n{completed.stderr.strip()}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(
+            f"{store:<14} open={result['open_ms']:7.1f}ms first={result['first_query_ms']:7.1f}ms "
+            f"p50={result['unfiltered']['p50']:7.2f}ms p99={result['unfiltered']['p99']:7.2f}ms "
+            f"filtered p50={result['filtered']['p50']:6.2f}ms p99={result['filtered']['p99']:6.2f}ms "
+            f"open_rss=+{result['open_rss_mb']:.1f}MB rss={result['rss_mb']:.1f}MB "
+            f"peak_rss={result['peak_rss_mb']:.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Drop old character versions from the lore memory store.
+
+Keeps the newest --keep versions of every character (MEMORY_KEEP_VERSIONS,
+default 3), fixes the is_latest flag used by latest-only search and prints
+how many records and bytes were reclaimed.
+
+    python scripts/compact_memory.py --keep 1
+    python scripts/compact_memory.py --keep 2 --dry-run
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from api._lib import lore_compaction, memory_clients  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keep", type=int, default=lore_compaction.KEEP_VERSIONS)
+    parser.add_argument("--dry-run", action="store_true", help="report without deleting")
+    args = parser.parse_args()
+    if args.keep < 1:
+        parser.error("--keep must be at least 1")
+
+    try:
+        report = lore_compaction.compact(
+            memory_clients.get_collection(), keep=args.keep, dry_run=args.dry_run
+        )
+    finally:
+        memory_clients.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
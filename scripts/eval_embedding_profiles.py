@@ -0,0 +1,162 @@
+"""Measure search recall against index size for lore storage profiles.
+
+Embeds the lore chunks of a character export (the same JSON or NDJSON input
+as index_characters.py) with the configured embedder at full size and takes
+the exact top-k neighbours of every query as the reference. Each profile
+(dimensions x float32/float16) is searched the same way and reports
+recall@k and the size of the vectors for this corpus.
+
+Gemini profiles request a reduced output_dimensionality from the API (vectors
+are cached, so reruns are free). Local embedders (MEMORY_EMBEDDER=onnx or
+hashing) use a PCA projection fitted on the corpus; --write-pca saves it for
+MEMORY_PCA_PATH. Without --queries, --sample random chunks (at most half the
+corpus) are held out of the index and the first sentence of each is used as
+a query; a query cut from an indexed chunk would find that chunk at every
+profile and inflate recall. Queries from --queries should paraphrase the
+lore rather than quote it, for the same reason.
+
+    python scripts/eval_embedding_profiles.py characters.ndjson --dims 768,512,256,128
+    python scripts/eval_embedding_profiles.py export.json --queries queries.txt --k 5
+    MEMORY_EMBEDDER=onnx python scripts/eval_embedding_profiles.py characters.ndjson \\
+        --dims 128 --write-pca .memory/pca-128.npz
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+import numpy as np  # noqa: E402
+
+from api._lib import embedders, lore_index, memory_clients  # noqa: E402
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def embed_all(embedder, texts):
+    vectors = []
+    for start in range(0, len(texts), 500):
+        batch, _ = embedder.embed(texts[start:start + 500])
+        if any(vector is None for vector in batch):
+            raise RuntimeError("embedder returned no vector for some texts")
+        vectors.extend(batch)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def neighbours(corpus, queries, k):
+    # Vectors are unit length, so the largest dot products are the nearest.
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+def recall(reference, found):
+    k = len(reference[0])
+    return float(np.mean([len(truth & hits) / k for truth, hits in zip(reference, found)]))
+
+
+def hold_out_queries(texts, count, seed):
+    # Returns (corpus without the held-out chunks, one query per held-out chunk).
+    held = set(random.Random(seed).sample(range(len(texts)), min(count, len(texts) // 2)))
+    queries = []
+    for index in sorted(held):
+        body = texts[index].split("\n", 1)[-1].split(": ", 1)[-1]
+        queries.append(_SENTENCE_END.split(body)[0])
+    return [text for index, text in enumerate(texts) if index not in held], queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSON or NDJSON character export, or - for stdin")
+    parser.add_argument("--queries", help="file with one query per line")
+    parser.add_argument("--sample", type=int, default=200, help="sampled queries without --queries")
+    parser.add_argument("--dims", default="768,512,256,128")
+    parser.add_argument("--dtypes", default="float32,float16")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write-pca", help="save the PCA projection (local embedders, one --dims)")
+    args = parser.parse_args()
+
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with stream:
+        characters = [
+            character
+            for character in lore_index.iter_characters(stream)
+            if isinstance(character, dict) and "id" in character
+        ]
+    texts = [text for character in characters for _, text, _ in lore_index.lore_chunks(character)]
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as query_file:
+            queries = [line.strip() for line in query_file if line.strip()]
+    else:
+        texts, queries = hold_out_queries(texts, args.sample, args.seed)
+    if len(texts) <= args.k:
+        parser.error(f"need more than --k={args.k} indexed chunks, found {len(texts)}")
+
+    try:
+        kind = embedders.configured_kind() or "gemini"
+        if kind == "gemini":
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise embedders.EmbedderError("GEMINI_API_KEY not set")
+            client = memory_clients.get_genai_client(api_key)
+            full = embedders.GeminiEmbedder(client)
+        elif kind == "hashing":
+            full = embedders.HashingEmbedder()
+        else:
+            if not os.getenv("MEMORY_ONNX_MODEL"):
+                raise embedders.EmbedderError("MEMORY_ONNX_MODEL not set")
+            full = embedders.OnnxEmbedder(os.getenv("MEMORY_ONNX_MODEL"))
+    except embedders.EmbedderError as e:
+        parser.error(str(e))
+
+    corpus = embed_all(full, texts)
+    query_vectors = embed_all(full, queries)
+    full_dims = corpus.shape[1]
+    reference = neighbours(corpus, query_vectors, args.k)
+    print(
+        f"{full.name}: {len(texts)} indexed chunks, {len(queries)} "
+        f"{'given' if args.queries else 'held-out'} queries, "
+        f"reference = exact top-{args.k} at {full_dims} dims float32"
+    )
+
+    dims_list = [int(value) for value in args.dims.split(",")]
+    if args.write_pca and (kind == "gemini" or len(dims_list) != 1):
+        parser.error("--write-pca needs a local embedder and exactly one --dims value")
+    baseline_bytes = corpus.size * 4
+    for dims in dims_list:
+        dims = min(dims, full_dims)
+        note = ""
+        if dims == full_dims:
+            stored, reduced_queries = corpus, query_vectors
+        elif kind == "gemini":
+            reduced = embedders.GeminiEmbedder(client, dimensions=dims)
+            stored, reduced_queries = embed_all(reduced, texts), embed_all(reduced, queries)
+        else:
+            projection = embedders.fit_projection(corpus, dims)
+            stored = embedders.project(corpus, projection)
+            reduced_queries = embedders.project(query_vectors, projection)
+            note = f" (PCA, {float(projection['explained']):.1%} variance, fitted in-sample)"
+            if args.write_pca:
+                embedders.save_projection(args.write_pca, projection)
+                note += f" -> {args.write_pca}"
+        for dtype in args.dtypes.split(","):
+            vectors = stored.astype(dtype).astype(np.float32)
+            size = stored.shape[0] * dims * np.dtype(dtype).itemsize
+            score = recall(reference, neighbours(vectors, reduced_queries, args.k))
+            print(
+                f"dims={dims:<5} {dtype:<8} recall@{args.k}={score:6.3f} "
+                f"size={size / 1e6:8.2f}MB ({size / baseline_bytes:5.1%}){note}"
+            )
+    memory_clients.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Bulk-index characters into the lore memory store.
+
+Reads a JSON array, a {"characters": [...]} export or NDJSON (one character
+per line) from a file or stdin, embeds lore in batches with the collection's
+embedder and bounded concurrency, and upserts in large chunks. With --job,
+finished ids are recorded in a checkpoint so an interrupted run resumes where
+it stopped.
+
+    python scripts/index_characters.py characters.ndjson --job reindex-2026
+    cat export.json | python scripts/index_characters.py - --concurrency 8
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from api._lib import embedders, lore_index, memory_clients  # noqa: E402
+
+
+def print_progress(summary):
+    print(
+        f"indexed={summary['indexed']} skipped={summary['skipped']} "
+        f"failed={summary['failed']} rate={summary['per_second']}/s "
+        f"elapsed={summary['elapsed_s']}s",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSON or NDJSON file, or - for stdin")
+    parser.add_argument("--job", help="checkpoint name for resumable runs")
+    parser.add_argument("--checkpoint", help="explicit checkpoint file path")
+    parser.add_argument("--concurrency", type=int, default=lore_index.INDEX_CONCURRENCY)
+    parser.add_argument("--upsert-size", type=int, default=lore_index.UPSERT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    try:
+        embedder = memory_clients.get_embedder(os.getenv("GEMINI_API_KEY"))
+    except embedders.EmbedderError as e:
+        parser.error(str(e))
+
+    if args.checkpoint:
+        checkpoint = lore_index.Checkpoint(args.checkpoint)
+    elif args.job:
+        checkpoint = lore_index.Checkpoint.for_job(args.job)
+    else:
+        checkpoint = None
+
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        summary = lore_index.index_characters(
+            embedder,
+            memory_clients.get_collection(),
+            lore_index.iter_characters(stream),
+            concurrency=args.concurrency,
+            upsert_size=args.upsert_size,
+            checkpoint=checkpoint,
+            progress=print_progress,
+        )
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        memory_clients.close()
+
+    print_progress(summary)
+    for error in summary["errors"]:
+        print(f"error: {error}", file=sys.stderr)
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
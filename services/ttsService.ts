@@ -32,6 +32,10 @@ interface TTSResponse {
   provider: TTSProvider;
 }
 
+// Inputs longer than this are split into sentences and synthesized in parallel
+// server-side (the `segmented` long-text mode of the Google and Edge routes).
+const LONG_TEXT_THRESHOLD = 600;
+
 const defaultTTSConfig: TTSConfig = {
   provider: 'google',
   google: { voice: 'Kore', languageCode: 'en-US', speakingRate: 1.0, pitch: 0.0 },
@@ -44,6 +48,7 @@ async function callTTSAPI(
   body: Record<string, unknown>,
   provider: TTSProvider,
   mimeType: string,
+  onVoiceId?: (voiceId: string) => void,
 ): Promise<TTSResponse> {
   const response = await fetch(`${PROXY_BASE_URL}${endpoint}`, {
     method: 'POST',
@@ -58,6 +63,9 @@ async function callTTSAPI(
 
   const responseData = await response.json();
   const audioBase64: string | undefined = responseData.audioContent;
+  if (onVoiceId && typeof responseData.voiceId === 'string') {
+    onVoiceId(responseData.voiceId);
+  }
 
   if (!audioBase64) {
     return { data: null, error: `No audio content in response from ${provider} TTS`, provider };
@@ -69,7 +77,11 @@ async function callTTSAPI(
 async function textToSpeechGoogle(text: string, config: TTSConfig): Promise<TTSResponse> {
   if (!text) return { data: null, error: 'No text provided', provider: 'google' };
   try {
-    return callTTSAPI('/api/tts/google', { text, voice_name: config.google?.voice || 'Kore' }, 'google', 'audio/mp3');
+    return callTTSAPI('/api/tts/google', {
+      text,
+      voice_name: config.google?.voice || 'Kore',
+      segmented: text.length > LONG_TEXT_THRESHOLD,
+    }, 'google', 'audio/mp3');
   } catch (error) {
     console.error('Error in Google TTS service:', error);
     throw error;
@@ -85,6 +97,7 @@ async function textToSpeechEdge(text: string, config: TTSConfig): Promise<TTSRes
       rate: config.edge?.rate || '+0%',
       pitch: config.edge?.pitch || '+0Hz',
       volume: config.edge?.volume || '+0%',
+      segmented: text.length > LONG_TEXT_THRESHOLD,
     }, 'edge', 'audio/mp3');
   } catch (error) {
     console.error('Error in Edge TTS service:', error);
@@ -92,18 +105,31 @@ async function textToSpeechEdge(text: string, config: TTSConfig): Promise<TTSRes
   }
 }
 
+// Server-side voice ids for reference samples already uploaded this session,
+// keyed by transcript + sample so the megabytes of base64 are sent only once.
+const qwenVoiceIds = new Map<string, string>();
+
 async function textToSpeechQwen(text: string, config: TTSConfig): Promise<TTSResponse> {
   if (!text) return { data: null, error: 'No text provided', provider: 'qwen' };
   if (!config.qwen?.ref_audio || !config.qwen?.ref_text) {
     return { data: null, error: 'Reference audio and transcript are required for voice cloning', provider: 'qwen' };
   }
+  const { ref_audio, ref_text } = config.qwen;
+  const language = config.qwen.language || 'English';
+  const sampleKey = `${ref_text}\u0000${ref_audio}`;
   try {
-    return callTTSAPI('/api/tts/qwen', {
-      text,
-      ref_audio: config.qwen.ref_audio,
-      ref_text: config.qwen.ref_text,
-      language: config.qwen.language || 'English',
-    }, 'qwen', 'audio/wav');
+    const voiceId = qwenVoiceIds.get(sampleKey);
+    if (voiceId) {
+      try {
+        return await callTTSAPI('/api/tts/qwen', { text, voice_id: voiceId, language }, 'qwen', 'audio/wav');
+      } catch {
+        // The server may have restarted or evicted the voice; upload the sample again.
+        qwenVoiceIds.delete(sampleKey);
+      }
+    }
+    return await callTTSAPI('/api/tts/qwen', { text, ref_audio, ref_text, language }, 'qwen', 'audio/wav', (voiceId) => {
+      qwenVoiceIds.set(sampleKey, voiceId);
+    });
   } catch (error) {
     console.error('Error in Qwen TTS service:', error);
     throw error;
@@ -0,0 +1,354 @@
+"""proxy.py and proxy_asgi.py must answer exactly like the api/* handlers they wrap.
+
+Each case calls a serverless handler directly and posts the same request to
+the proxy, with the upstream calls faked and the caches reset in between, and
+compares body bytes, status, Content-Type, Content-Length and the cache/voice
+headers.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import tempfile
+
+import pytest
+import requests
+
+_STATE = tempfile.mkdtemp(prefix="handler-adapter-")
+os.environ.update(
+    GEMINI_API_KEY="test-key",
+    MEMORY_DB_PATH=os.path.join(_STATE, "memory"),
+    MEMORY_VECTOR_STORE="numpy",
+    MEMORY_EMBEDDER="hashing",
+    EMBED_CACHE_PATH=os.path.join(_STATE, "embeddings.sqlite3"),
+    TTS_CACHE_DIR=os.path.join(_STATE, "tts"),
+)
+
+import proxy  # noqa: E402
+import proxy_asgi  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+from api._lib import (  # noqa: E402
+    embedding_cache,
+    handler_adapter,
+    longtext,
+    media,
+    response_cache,
+    search_cache,
+    tts_cache,
+    upstream,
+)
+from api.gemini import generate as gemini_generate  # noqa: E402
+from api.imagen import generate as imagen_generate  # noqa: E402
+from api.memory import index as memory_index  # noqa: E402
+from api.memory import search as memory_search  # noqa: E402
+from api.tts import edge as edge_tts  # noqa: E402
+from api.tts import google as google_tts  # noqa: E402
+from api.tts import qwen as qwen_tts  # noqa: E402
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+WAV = b"RIFF" + b"\x01\x02" * 2048
+MP3 = b"ID3" + b"\xff\xfb" * 2048
+UPSTREAM_IMAGE_DATA = base64.b64encode(PNG).decode("ascii")
+
+UPSTREAM = {
+    "gemini": {"candidates": [{"content": {"parts": [{"text": "A knight of the north."}]}}]},
+    "imagen": {
+        "candidates": [
+            {
+                "content": {
+                    "parts": [
+                        {
+                            "inlineData": {
+                                "mimeType": "image/png",
+                                "data": UPSTREAM_IMAGE_DATA,
+                            }
+                        }
+                    ]
+                }
+            }
+        ]
+    },
+    "tts": {
+        "candidates": [
+            {
+                "content": {
+                    "parts": [
+                        {
+                            "inlineData": {
+                                "mimeType": "audio/wav",
+                                "data": base64.b64encode(WAV).decode("ascii"),
+                            }
+                        }
+                    ]
+                }
+            }
+        ]
+    },
+}
+
+COMPARED_HEADERS = (
+    response_cache.CACHE_HEADER,
+    tts_cache.CACHE_HEADER,
+    search_cache.CACHE_HEADER,
+    embedding_cache.CACHE_HEADER,
+    media.VOICE_ID_HEADER,
+)
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.content = json.dumps(body).encode("utf-8")
+        self.status_code = status_code
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Client Error", response=self)
+
+
+@pytest.fixture(autouse=True)
+def fake_upstream(monkeypatch):
+    def post(route, url, **kwargs):
+        return FakeResponse(UPSTREAM[route])
+
+    monkeypatch.setattr(upstream, "post", post)
+
+    async def stream_speech(text, voice, rate, pitch, volume):
+        yield MP3[:1024]
+        yield MP3[1024:]
+
+    monkeypatch.setattr(edge_tts, "stream_speech", stream_speech)
+    # Segment timings are wall-clock; pin them so both calls serialize alike.
+    monkeypatch.setattr(
+        longtext,
+        "_timing",
+        lambda index, segment, started: {"index": index, "chars": len(segment), "ms": 0.0},
+    )
+
+
+@pytest.fixture
+def reset_caches(monkeypatch, tmp_path):
+    # Both entry points must see the same cache state, so each call starts cold.
+    calls = iter(range(1000))
+
+    def reset():
+        monkeypatch.setenv("TTS_CACHE_DIR", str(tmp_path / f"tts-{next(calls)}"))
+        for module in (tts_cache, response_cache, search_cache, embedding_cache):
+            monkeypatch.setattr(module, "_cache", None)
+
+    return reset
+
+
+@pytest.fixture(scope="module")
+def indexed_character():
+    result = memory_index.handler(
+        {
+            "body": json.dumps(
+                {
+                    "character": {
+                        "id": "ann",
+                        "name": "Ann",
+                        "lore": "Ann is a knight of the north.\n\nShe distrusts the river folk.",
+                    }
+                }
+            ),
+            "headers": {},
+        },
+        None,
+    )
+    assert result["statusCode"] == 200, result["body"]
+    return "ann"
+
+
+def flask_post(path, body, headers):
+    response = proxy.app.test_client().post(path, data=body, headers=headers)
+    return response.status_code, response.data, response.headers
+
+
+def asgi_post(path, body, headers):
+    response = TestClient(proxy_asgi.app).post(path, content=body, headers=headers)
+    return response.status_code, response.content, response.headers
+
+
+def assert_identical(handler, path, body, headers, post, reset):
+    reset()
+    direct = handler(
+        {"body": body, "headers": dict(headers), "queryStringParameters": {}}, None
+    )
+    reset()
+    status, content, response_headers = post(path, body, headers)
+
+    if direct.get("isBase64Encoded"):
+        expected = base64.b64decode(direct["body"])
+    else:
+        expected = direct["body"].encode("utf-8")
+    assert status == direct["statusCode"]
+    assert content == expected
+    assert response_headers["Content-Type"] == direct["headers"]["Content-Type"]
+    assert response_headers["Content-Length"] == str(len(expected))
+    for name in COMPARED_HEADERS:
+        assert response_headers.get(name) == direct["headers"].get(name), name
+    return status, content, response_headers
+
+
+# Routes both proxies serve through the handler (proxy_asgi runs them in its thread pool)
+WRAPPED_CASES = [
+    ("imagen-json", imagen_generate.handler, "/api/imagen/generate", {"prompt": "Ann"}, {}),
+    (
+        "imagen-binary",
+        imagen_generate.handler,
+        "/api/imagen/generate",
+        {"prompt": "Ann"},
+        {"Accept": "image/*"},
+    ),
+    ("google-json", google_tts.handler, "/api/tts/google", {"text": "Hello."}, {}),
+    (
+        "google-binary",
+        google_tts.handler,
+        "/api/tts/google",
+        {"text": "Hello."},
+        {"Accept": "audio/*"},
+    ),
+    (
+        "google-segmented",
+        google_tts.handler,
+        "/api/tts/google",
+        {"text": "Hello. Goodbye.", "segmented": True},
+        {},
+    ),
+    ("imagen-missing-prompt", imagen_generate.handler, "/api/imagen/generate", {}, {}),
+    ("google-missing-text", google_tts.handler, "/api/tts/google", {}, {}),
+    (
+        "google-no-speech",
+        google_tts.handler,
+        "/api/tts/google",
+        {"text": " ... \n\n !", "segmented": True},
+        {},
+    ),
+    ("qwen-missing-text", qwen_tts.handler, "/api/tts/qwen", {"voice_id": "0" * 32}, {}),
+    (
+        "qwen-invalid-voice-id",
+        qwen_tts.handler,
+        "/api/tts/qwen",
+        {"text": "Hello.", "voice_id": "../../etc/passwd"},
+        {"Accept": "audio/wav"},
+    ),
+]
+
+# Routes proxy_asgi serves natively; only the Flask proxy goes through the handler
+FLASK_ONLY_CASES = [
+    ("gemini", gemini_generate.handler, "/api/gemini/generate", {"prompt": "Ann"}, {}),
+    ("gemini-missing-prompt", gemini_generate.handler, "/api/gemini/generate", {}, {}),
+    ("edge-json", edge_tts.handler, "/api/tts/edge", {"text": "Hello."}, {}),
+    ("edge-binary", edge_tts.handler, "/api/tts/edge", {"text": "Hello."}, {"Accept": "audio/*"}),
+    ("edge-missing-text", edge_tts.handler, "/api/tts/edge", {}, {}),
+    ("edge-no-speech", edge_tts.handler, "/api/tts/edge", {"text": "  ?!  "}, {}),
+]
+
+
+@pytest.mark.parametrize("post", [flask_post, asgi_post], ids=["flask", "asgi"])
+@pytest.mark.parametrize(
+    "handler,path,payload,headers", [case[1:] for case in WRAPPED_CASES],
+    ids=[case[0] for case in WRAPPED_CASES],
+)
+def test_wrapped_routes_match_handlers(handler, path, payload, headers, post, reset_caches):
+    assert_identical(handler, path, json.dumps(payload), headers, post, reset_caches)
+
+
+@pytest.mark.parametrize(
+    "handler,path,payload,headers", [case[1:] for case in FLASK_ONLY_CASES],
+    ids=[case[0] for case in FLASK_ONLY_CASES],
+)
+def test_flask_routes_match_handlers(handler, path, payload, headers, reset_caches):
+    assert_identical(handler, path, json.dumps(payload), headers, flask_post, reset_caches)
+
+
+def test_binary_body_is_decoded_once(reset_caches):
+    status, content, headers = assert_identical(
+        imagen_generate.handler,
+        "/api/imagen/generate",
+        json.dumps({"prompt": "Ann"}),
+        {"Accept": "image/png"},
+        flask_post,
+        reset_caches,
+    )
+    assert status == 200 and content == PNG and headers["Content-Type"] == "image/png"
+
+
+def test_binary_bodies_skip_the_base64_round_trip(monkeypatch):
+    def no_encoding(data):
+        raise AssertionError("binary body was base64-encoded again")
+
+    monkeypatch.setattr(base64, "b64encode", no_encoding)
+    body = json.dumps({"prompt": "Ann"})
+    headers = {"Accept": "image/png"}
+    # Serverless: the upstream base64 text is the body as it is.
+    direct = imagen_generate.handler({"body": body, "headers": headers}, None)
+    assert direct["isBase64Encoded"] and direct["body"] == UPSTREAM_IMAGE_DATA
+    assert direct["headers"]["Content-Length"] == str(len(PNG))
+    # Local proxies: decoded once to bytes, which response_parts passes through.
+    event = handler_adapter.make_event(body.encode("utf-8"), headers)
+    result = imagen_generate.handler(event, None)
+    assert not result["isBase64Encoded"] and result["body"] == PNG
+    assert handler_adapter.response_parts(result)[0] is result["body"]
+
+
+@pytest.mark.parametrize("post", [flask_post, asgi_post], ids=["flask", "asgi"])
+def test_memory_search_matches_handler(post, reset_caches, indexed_character):
+    payload = {"query": "knight", "character_id": indexed_character, "n_results": 2}
+    status, content, _ = assert_identical(
+        memory_search.handler, "/api/memory/search", json.dumps(payload), {}, post, reset_caches
+    )
+    assert status == 200 and json.loads(content)["results"]
+
+
+@pytest.mark.parametrize(
+    "handler,path",
+    [
+        (gemini_generate.handler, "/api/gemini/generate"),
+        (imagen_generate.handler, "/api/imagen/generate"),
+        (google_tts.handler, "/api/tts/google"),
+        (edge_tts.handler, "/api/tts/edge"),
+        (qwen_tts.handler, "/api/tts/qwen"),
+        (memory_search.handler, "/api/memory/search"),
+    ],
+)
+def test_invalid_json_is_a_400(handler, path, reset_caches):
+    status, content, _ = assert_identical(
+        handler, path, "notjson", {"Content-Type": "application/json"}, flask_post, reset_caches
+    )
+    assert status == 400 and json.loads(content) == {"error": "Invalid JSON body"}
+
+
+@pytest.mark.parametrize("post", [flask_post, asgi_post], ids=["flask", "asgi"])
+def test_upstream_error_matches_handler(post, reset_caches, monkeypatch):
+    monkeypatch.setattr(upstream, "post", lambda route, url, **kwargs: FakeResponse({}, 429))
+    status, _, _ = assert_identical(
+        imagen_generate.handler,
+        "/api/imagen/generate",
+        json.dumps({"prompt": "Ann"}),
+        {},
+        post,
+        reset_caches,
+    )
+    assert status == 500
+
+
+def test_edge_byte_cap_covers_stitched_clip(monkeypatch):
+    # Each segment fits under the cap on its own; together they do not.
+    monkeypatch.setattr(edge_tts, "EDGE_TTS_MAX_BYTES", len(MP3) + 1)
+    with pytest.raises(ValueError, match="exceeds"):
+        asyncio.run(
+            edge_tts.synthesize_segmented("One.\n\nTwo.", "en-US-GuyNeural", "+0%", "+0Hz", "+0%")
+        )
+
+
+def test_no_speech_text_is_a_400(reset_caches):
+    body = json.dumps({"text": "...", "segmented": True})
+    for post in (flask_post, asgi_post):
+        status, content, _ = post("/api/tts/edge", body, {})
+        assert status == 400 and json.loads(content) == {"error": "Text is required"}
@@ -0,0 +1,23 @@
+import pytest
+
+from api._lib.qwen_batcher import BatchScheduler
+
+
+def test_short_generate_fails_every_job():
+    # One waveform for two texts: both callers get an error instead of hanging.
+    scheduler = BatchScheduler(lambda texts, languages, prompts: (["wav"], 24000), 2, 200)
+    futures = [scheduler.enqueue(text, "English", []) for text in ("one", "two")]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="1 waveforms for 2 texts"):
+            future.result(timeout=5)
+    assert scheduler.stats()["errors"] == 2
+
+
+def test_each_job_gets_its_own_waveform():
+    scheduler = BatchScheduler(lambda texts, languages, prompts: (texts, 24000), 4, 50)
+    futures = [scheduler.enqueue(text, "English", []) for text in ("a", "b", "c")]
+    assert [future.result(timeout=5) for future in futures] == [
+        ("a", 24000),
+        ("b", 24000),
+        ("c", 24000),
+    ]
@@ -0,0 +1,41 @@
+import threading
+
+from api._lib.vector_store import NumpyCollection
+
+
+def test_concurrent_writers_do_not_overwrite_rows(tmp_path):
+    first = NumpyCollection(str(tmp_path))
+    second = NumpyCollection(str(tmp_path))
+    first.upsert(["seed"], [[1.0, 0.0]])
+    assert second.count() == 1
+
+    # Another process writes while the first handle is choosing its rows.
+    writer = threading.Thread(target=second.upsert, args=(["B"], [[0.0, 1.0]]))
+    rows_for_ids = first._rows_for_ids
+
+    def interleave(ids):
+        if writer.ident is None:
+            writer.start()
+            writer.join(timeout=0.5)
+        return rows_for_ids(ids)
+
+    first._rows_for_ids = interleave
+    first.upsert(["A"], [[1.0, 1.0]])
+    writer.join()
+
+    reopened = NumpyCollection(str(tmp_path))
+    result = reopened.get(include=["embeddings"])
+    vectors = dict(zip(result["ids"], result["embeddings"].tolist()))
+    assert vectors == {"seed": [1.0, 0.0], "A": [1.0, 1.0], "B": [0.0, 1.0]}
+
+
+def test_integer_character_id_matches_after_reopen(tmp_path):
+    collection = NumpyCollection(str(tmp_path))
+    collection.upsert(["a"], [[1.0, 0.0]], metadatas=[{"character_id": 5}])
+    assert collection.get(where={"character_id": 5})["ids"] == ["a"]
+    collection.close()
+
+    reopened = NumpyCollection(str(tmp_path))
+    assert reopened.get(where={"character_id": 5})["ids"] == ["a"]
+    assert reopened.get(where={"character_id": "5"})["ids"] == ["a"]
+    assert reopened.get()["metadatas"] == [{"character_id": 5}]